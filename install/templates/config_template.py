@@ -10,6 +10,10 @@ mysql: DatabaseConfig = DatabaseConfig(
     password = 'DBPASS',
     database = 'DBNAME',
     port     = 3306,
+    # Connection pool of each script process, shared by all its database handles.
+    # pool_size     = 5,
+    # max_overflow  = 10,
+    # pool_pre_ping = True,
 )
 
 # Uncomment this statement if your project uses AWS S3.
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""Benchmark the session and modality discovery of BidsReader on synthetic BIDS datasets"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from lib.bidsreader import BidsReader
+
+
+def write_synthetic_dataset(bids_dir, subject_count, session_count):
+    def write(path, content):
+        path = os.path.join(bids_dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(content)
+
+    write('dataset_description.json', json.dumps({'Name': 'Benchmark', 'BIDSVersion': '1.8.0'}))
+    write('participants.tsv', 'participant_id\n' + ''.join(f'sub-{i:04d}\n' for i in range(subject_count)))
+    for i in range(subject_count):
+        for j in range(session_count):
+            prefix = f'sub-{i:04d}/ses-V{j + 1}/eeg/sub-{i:04d}_ses-V{j + 1}'
+            for suffix in ('task-rest_eeg.edf', 'task-rest_eeg.json', 'task-rest_channels.tsv',
+                           'task-rest_events.tsv', 'electrodes.tsv'):
+                write(f'{prefix}_{suffix}', '{}' if suffix.endswith('.json') else '')
+
+
+def load_sessions_per_subject(bids_layout, participants_info):
+    # previous implementation: one layout query per subject and per session
+    cand_sessions = {}
+    for row in participants_info:
+        cand_sessions[row['participant_id']] = bids_layout.get_sessions(subject=row['participant_id'])
+
+    cand_session_modalities_list = []
+    for subject, visit_list in cand_sessions.items():
+        for visit in visit_list:
+            cand_session_modalities_list.append({
+                'bids_sub_id': subject,
+                'bids_ses_id': visit,
+                'modalities' : bids_layout.get_datatype(subject=subject, session=visit),
+            })
+
+    return cand_sessions, cand_session_modalities_list
+
+
+def load_sessions_single_pass(bids_reader):
+    session_datatypes = bids_reader.load_session_datatypes_from_bids()
+    return (
+        bids_reader.load_sessions_from_bids(session_datatypes),
+        bids_reader.load_modalities_from_bids(session_datatypes),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the session and modality discovery of BidsReader on synthetic BIDS datasets.')
+    parser.add_argument('--subjects', '-s', dest='subjects', type=int, nargs='+', default=[50, 100, 200, 400],
+                        help='numbers of subjects of the synthetic datasets')
+    parser.add_argument('--sessions', '-n', dest='sessions', type=int, default=2,
+                        help='number of sessions of each subject')
+
+    args = parser.parse_args()
+
+    print(f'{"subjects":>8} {"per subject (s)":>16} {"single pass (s)":>16} {"speedup":>8}')
+    for subject_count in args.subjects:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            bids_dir = os.path.join(tmp_dir, 'bids')
+            write_synthetic_dataset(bids_dir, subject_count, args.sessions)
+            bids_reader = BidsReader(bids_dir, False, False)
+
+            start = time.perf_counter()
+            per_subject = load_sessions_per_subject(bids_reader.bids_layout, bids_reader.participants_info)
+            per_subject_duration = time.perf_counter() - start
+
+            start = time.perf_counter()
+            single_pass = load_sessions_single_pass(bids_reader)
+            single_pass_duration = time.perf_counter() - start
+
+            # the sessions returned by the layout queries are not sorted
+            per_subject_sessions = {subject: sorted(sessions) for subject, sessions in per_subject[0].items()}
+            if per_subject_sessions != single_pass[0] or len(per_subject[1]) != len(single_pass[1]):
+                raise RuntimeError('the single pass discovery does not match the per subject discovery')
+
+            print(f'{subject_count:>8} {per_subject_duration:>16.3f} {single_pass_duration:>16.3f}'
+                  f' {per_subject_duration / single_pass_duration:>7.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""Benchmark the HED tag parsing of a large synthetic events.tsv file"""
+
+import argparse
+import random
+import time
+
+from lib.hed_schema import HedSchemaIndex
+from lib.physiological import Physiological
+
+
+def synthetic_schema_nodes(node_count):
+    return [{'ID': i + 1, 'Name': f'Tag-{i}'} for i in range(node_count)]
+
+
+def synthetic_hed_strings(string_count, node_count):
+    rng = random.Random(0)
+    hed_strings = []
+    for _ in range(string_count):
+        tags = [f'Tag-{rng.randrange(node_count)}' for _ in range(6)]
+        hed_strings.append(f'{tags[0]}, ({tags[1]}, {tags[2]}), (({tags[3]}, {tags[4]}), {tags[5]})')
+    return hed_strings
+
+
+def synthetic_events(event_count, hed_strings, trial_types):
+    rng = random.Random(0)
+    return [
+        {
+            'onset': str(i * 0.5),
+            'duration': '0.1',
+            'trial_type': rng.choice(trial_types),
+            'HED': rng.choice(hed_strings),
+        }
+        for i in range(event_count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the HED tag parsing of the events of a large synthetic events.tsv file.')
+    parser.add_argument('--events', '-e', dest='events', type=int, default=100000,
+                        help='number of events of the synthetic events.tsv file')
+    parser.add_argument('--nodes', '-n', dest='nodes', type=int, default=10000,
+                        help='number of nodes of the synthetic HED schema')
+    parser.add_argument('--hed-strings', '-s', dest='hed_strings', type=int, default=20,
+                        help='number of distinct HED strings of the events')
+
+    args = parser.parse_args()
+    nodes = synthetic_schema_nodes(args.nodes)
+    hed_strings = synthetic_hed_strings(args.hed_strings, args.nodes)
+    trial_types = ['go', 'stop', 'rest']
+    events = synthetic_events(args.events, hed_strings, trial_types)
+
+    start = time.perf_counter()
+    hed_union = HedSchemaIndex(nodes)
+    index_duration = time.perf_counter() - start
+
+    # the events.json of the dataset tags the 'go' trials with the first HED string
+    dataset_tag_dict = {
+        'TrialType': {'go': Physiological.build_hed_tag_groups(hed_union, hed_strings[0])}
+    }
+
+    print(f'{"mode":>10} {"time (s)":>9} {"events/s":>10}')
+    print(f'{"index":>10} {index_duration:>9.3f} {"":>10}')
+    for mode in ('uncached', 'cached'):
+        filtered_tag_groups = {}
+        hed_union.tag_groups.clear()
+        start = time.perf_counter()
+        for row in events:
+            if mode == 'uncached':
+                filtered_tag_groups.clear()
+                hed_union.tag_groups.clear()
+
+            Physiological.get_event_tag_groups(row, hed_union, dataset_tag_dict, {}, filtered_tag_groups)
+        duration = time.perf_counter() - start
+
+        print(f'{mode:>10} {duration:>9.3f} {len(events) / duration:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
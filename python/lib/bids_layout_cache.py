@@ -0,0 +1,243 @@
+"""Persistent index of the BIDS layout of a dataset, refreshed incrementally by subject"""
+
+import hashlib
+import json
+import os
+import types
+
+from bids import BIDSLayout, BIDSLayoutIndexer
+from bids.layout import Query
+from bids.layout.index import _regexfy
+from bids.layout.models import BIDSFile, Entity, FileAssociation, Tag
+from bids.layout.validation import validate_indexing_args
+from bids.utils import listify
+from sqlalchemy import and_, or_, select
+
+MANIFEST_FILE_NAME = 'manifest.json'
+
+
+def get_tree_signature(path):
+    """
+    Computes a signature of a directory tree from the relative path, size and
+    modification time of all its files and sub-directories. Any file added,
+    removed, renamed or modified in the tree changes the signature.
+
+    :param path: path to the directory
+     :type path: str
+
+    :return: hexadecimal signature of the directory tree
+     :rtype: str
+    """
+
+    signature = hashlib.blake2b(digest_size=16)
+    for dir_path, dir_names, file_names in os.walk(path):
+        dir_names.sort()
+        # the directory itself is stat-ed first, then its files
+        for name in ['', *sorted(file_names)]:
+            entry_path = os.path.join(dir_path, name)
+            stat = os.stat(entry_path)
+            relative_path = os.path.relpath(entry_path, path)
+            signature.update(f'{relative_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+
+    return signature.hexdigest()
+
+
+def get_dataset_manifest(bids_dir, ignored_dirs, validate):
+    """
+    Builds the manifest of a BIDS dataset, that is, a signature for each
+    subject directory and one for the rest of the dataset (top-level files,
+    phenotype, derivatives...). The ignored top-level directories are not
+    indexed and thus not part of the manifest.
+
+    :param bids_dir    : path to the BIDS dataset
+     :type bids_dir    : str
+    :param ignored_dirs: names of the top-level directories ignored by the layout
+     :type ignored_dirs: list
+    :param validate    : whether the layout is indexed with BIDS validation
+     :type validate    : bool
+
+    :return: manifest of the dataset
+     :rtype: dict
+    """
+
+    subjects  = {}
+    top_level = hashlib.blake2b(digest_size=16)
+    for entry in sorted(os.scandir(bids_dir), key=lambda entry: entry.name):
+        if entry.is_dir():
+            if entry.name.startswith('sub-'):
+                subjects[entry.name.removeprefix('sub-')] = get_tree_signature(entry.path)
+            elif entry.name not in ignored_dirs:
+                top_level.update(f'{entry.name}/\0{get_tree_signature(entry.path)}\n'.encode())
+        else:
+            stat = entry.stat()
+            top_level.update(f'{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode())
+
+    return {
+        'root'     : os.path.realpath(bids_dir),
+        'validate' : validate,
+        'top_level': top_level.hexdigest(),
+        'subjects' : subjects,
+    }
+
+
+class SubjectLayoutIndexer(BIDSLayoutIndexer):
+    """
+    BIDS layout indexer that re-indexes the directories of some subjects in a
+    layout loaded from its database, leaving the files of the other subjects
+    untouched. pybids has no public API to partially re-index a layout, so this
+    relies on the directory and metadata indexing steps of BIDSLayoutIndexer.
+
+    The metadata of the top-level files is indexed again along with the
+    metadata of the subjects since it is inherited by the subject files.
+    """
+
+    def __init__(self, subjects, **kwargs):
+        """
+        Constructor method for the SubjectLayoutIndexer class.
+
+        :param subjects: labels of the subjects to re-index, with or without a directory
+         :type subjects: list
+        :param kwargs  : arguments of BIDSLayoutIndexer (validate, ignore, force_index...)
+        """
+
+        super().__init__(**kwargs)
+        self.subjects = subjects
+
+    def __call__(self, layout):
+        self._layout = layout
+        self._config = list(layout.config.values())
+
+        ignore, force = validate_indexing_args(self.ignore, self.force_index, self._layout._root)
+        self._include_patterns = [_regexfy(pattern, root=self._layout._root) for pattern in listify(force)]
+        self._exclude_patterns = [_regexfy(pattern, root=self._layout._root) for pattern in listify(ignore)]
+
+        self.delete_subject_files()
+
+        all_bfs       = []
+        all_tag_dicts = []
+        indexed_subjects = []
+        for subject in self.subjects:
+            subject_dir = self._layout._root / f'sub-{subject}'
+            if not subject_dir.is_dir():
+                continue
+            bfs, tag_dicts = self._index_dir(subject_dir, self._config)
+            all_bfs       += bfs
+            all_tag_dicts += tag_dicts
+            indexed_subjects.append(subject)
+
+        self.session.bulk_save_objects(all_bfs)
+        self.session.bulk_insert_mappings(Tag, all_tag_dicts)
+        self.session.commit()
+
+        if self.index_metadata and indexed_subjects:
+            # the metadata entities found by the previous indexing are already in
+            # the database and must be reused rather than created again
+            entities = {entity.name: entity for entity in self.session.query(Entity)}
+            self._config = [*self._config, types.SimpleNamespace(entities=entities)]
+            # the derivatives are already added to the loaded layout but have their own index
+            self.filters = {'subject': [*indexed_subjects, Query.NONE], 'scope': 'self'}
+            self._index_metadata()
+
+    def delete_subject_files(self):
+        """
+        Deletes the files of the subjects to re-index from the layout database,
+        along with their tags and associations. The associations between
+        top-level files are also deleted since they are created again when
+        indexing the metadata.
+        """
+
+        root = str(self._layout._root)
+        subject_files = select(BIDSFile.path).where(or_(*(
+            BIDSFile.path.startswith(f'{root}/sub-{subject}/', autoescape=True) for subject in self.subjects
+        )))
+        top_level_files = select(BIDSFile.path).where(BIDSFile.path.not_in(
+            select(Tag.file_path).where(Tag.entity_name == 'subject')
+        ))
+
+        self.session.query(FileAssociation).where(or_(
+            FileAssociation.src.in_(subject_files),
+            FileAssociation.dst.in_(subject_files),
+            and_(FileAssociation.src.in_(top_level_files), FileAssociation.dst.in_(top_level_files)),
+        )).delete(synchronize_session=False)
+        self.session.query(Tag).where(Tag.file_path.in_(subject_files)).delete(synchronize_session=False)
+        self.session.query(BIDSFile).where(BIDSFile.path.in_(subject_files)).delete(synchronize_session=False)
+        self.session.commit()
+
+
+def load_cached_bids_layout(bids_dir, cache_dir, validate, ignore, force_index, verbose=False):
+    """
+    Loads the layout of a BIDS dataset from its index in the cache directory.
+    The dataset is compared to the manifest saved with the index: if only some
+    subject directories changed, these subjects are re-indexed, and if the
+    top-level files or derivatives changed, the whole dataset is indexed again.
+
+    :param bids_dir   : path to the BIDS dataset
+     :type bids_dir   : str
+    :param cache_dir  : directory in which the layout indexes are stored
+     :type cache_dir  : str
+    :param validate   : whether to index the dataset with BIDS validation
+     :type validate   : bool
+    :param ignore     : paths ignored by the layout, relative to the dataset root
+     :type ignore     : list
+    :param force_index: paths or regular expressions forcibly indexed by the layout
+     :type force_index: list
+    :param verbose    : whether to be verbose
+     :type verbose    : bool
+
+    :return: BIDS layout of the dataset
+     :rtype: BIDSLayout
+    """
+
+    # one index per dataset so that a single cache directory serves all the datasets
+    dataset_key   = hashlib.blake2b(os.path.realpath(bids_dir).encode(), digest_size=8).hexdigest()
+    database_path = os.path.join(cache_dir, dataset_key)
+    manifest_path = os.path.join(database_path, MANIFEST_FILE_NAME)
+
+    ignored_dirs = [path.strip('/') for path in ignore if isinstance(path, str)]
+    manifest = get_dataset_manifest(bids_dir, ignored_dirs, validate)
+    cached_manifest = None
+    if os.path.isfile(manifest_path):
+        with open(manifest_path) as manifest_file:
+            cached_manifest = json.load(manifest_file)
+
+    layout_args = dict(root=bids_dir, derivatives=True, validate=validate, database_path=database_path)
+    if manifest == cached_manifest:
+        if verbose:
+            print(f'\t=> Reusing the BIDS layout index in {database_path}')
+        return BIDSLayout(**layout_args)
+
+    changed_subjects = None
+    if cached_manifest and all(manifest[key] == cached_manifest[key] for key in ('root', 'validate', 'top_level')):
+        subjects = manifest['subjects'].keys() | cached_manifest['subjects'].keys()
+        changed_subjects = sorted(
+            subject for subject in subjects
+            if manifest['subjects'].get(subject) != cached_manifest['subjects'].get(subject)
+        )
+
+    # the index no longer matches its manifest until it is refreshed
+    if cached_manifest is not None:
+        os.remove(manifest_path)
+
+    bids_layout = None
+    if changed_subjects is not None:
+        if verbose:
+            print(f'\t=> Re-indexing {len(changed_subjects)} changed subjects in {database_path}')
+        try:
+            bids_layout = BIDSLayout(**layout_args)
+            indexer = SubjectLayoutIndexer(
+                changed_subjects, validate=validate, ignore=ignore, force_index=force_index
+            )
+            indexer(bids_layout)
+        except Exception as e:
+            print(f'WARNING: could not refresh the BIDS layout index, indexing the whole dataset: {e}')
+            bids_layout = None
+
+    if bids_layout is None:
+        if verbose:
+            print(f'\t=> Indexing the BIDS dataset in {database_path}')
+        bids_layout = BIDSLayout(**layout_args, reset_database=True, ignore=ignore, force_index=force_index)
+
+    with open(manifest_path, 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+
+    return bids_layout
@@ -5,9 +5,14 @@ import re
 import sys
 
 from bids import BIDSLayout
+from bids.layout.models import BIDSFile, Tag
+from bids.utils import natural_sort
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
 
 import lib.exitcode
 import lib.utilities as utilities
+from lib.bids_layout_cache import load_cached_bids_layout
 
 # import bids
 # BIDSLayoutIndexer is required for PyBIDS >= 0.12.1
@@ -33,7 +38,7 @@ class BidsReader:
         bids_reader = BidsReader(bids_dir)
     """
 
-    def __init__(self, bids_dir, verbose, validate = True):
+    def __init__(self, bids_dir, verbose, validate = True, cache_dir = None):
         """
         Constructor method for the BidsReader class.
 
@@ -43,10 +48,13 @@ class BidsReader:
          :type verbose : bool
         :param validate : boolean to validate the BIDS dataset
          :type validate : bool
+        :param cache_dir: directory in which to persist the BIDS layout index, if any
+         :type cache_dir: str
         """
 
         self.verbose     = verbose
         self.bids_dir    = bids_dir
+        self.cache_dir   = cache_dir
         self.bids_layout = self.load_bids_data(validate)
 
         # load dataset name and BIDS version
@@ -65,16 +73,16 @@ class BidsReader:
         # load BIDS candidates information
         self.participants_info = self.load_candidates_from_bids()
 
-        # load BIDS sessions information
-        self.cand_sessions_list = self.load_sessions_from_bids()
-
-        # load BIDS modality information
-        self.cand_session_modalities_list = self.load_modalities_from_bids()
+        # load BIDS sessions and modality information
+        session_datatypes = self.load_session_datatypes_from_bids()
+        self.cand_sessions_list = self.load_sessions_from_bids(session_datatypes)
+        self.cand_session_modalities_list = self.load_modalities_from_bids(session_datatypes)
 
     def load_bids_data(self, validate):
         """
         Loads the BIDS study using the BIDSLayout function (part of the pybids
-        package) and return the object.
+        package) and return the object. If a cache directory is set, the layout
+        index is persisted in it and only refreshed when the dataset changes.
 
         :return: bids structure
         """
@@ -99,13 +107,18 @@ class BidsReader:
         #        indexer=BIDSLayoutIndexer(ignore=exclude_arr, force_index=force_arr)
         #    )
         # else:
-        bids_layout = BIDSLayout(
-            root=self.bids_dir,
-            ignore=exclude_arr,
-            force_index=force_arr,
-            derivatives=True,
-            validate=validate
-        )
+        if self.cache_dir:
+            bids_layout = load_cached_bids_layout(
+                self.bids_dir, self.cache_dir, validate, exclude_arr, force_arr, self.verbose
+            )
+        else:
+            bids_layout = BIDSLayout(
+                root=self.bids_dir,
+                ignore=exclude_arr,
+                force_index=force_arr,
+                derivatives=True,
+                validate=validate
+            )
 
         if self.verbose:
             print('\t=> BIDS dataset loaded with BIDS layout\n')
@@ -184,11 +197,53 @@ class BidsReader:
         if self.verbose:
             print('\t=> Passed validation of the list of participants\n')
 
-    def load_sessions_from_bids(self):
+    def load_session_datatypes_from_bids(self):
+        """
+        Grep the datatypes of each subject and session of the BIDS layout and
+        its derivatives. Rather than querying the layout for each subject and
+        session, the (subject, session, datatype) triplets of all the files are
+        selected with a single query on the database of each layout.
+
+        :return: dictionary of the datatypes of each session (None if the files
+                 have no session) of each subject
+         :rtype: dict
+        """
+
+        subject_tag  = aliased(Tag)
+        session_tag  = aliased(Tag)
+        datatype_tag = aliased(Tag)
+
+        session_datatypes = {}
+        for layout in self.bids_layout._get_layouts_in_scope('all'):
+            query = layout.session.query(subject_tag._value, session_tag._value, datatype_tag._value) \
+                .select_from(BIDSFile) \
+                .join(subject_tag, and_(
+                    subject_tag.file_path == BIDSFile.path, subject_tag.entity_name == 'subject'
+                )) \
+                .outerjoin(session_tag, and_(
+                    session_tag.file_path == BIDSFile.path, session_tag.entity_name == 'session'
+                )) \
+                .outerjoin(datatype_tag, and_(
+                    datatype_tag.file_path == BIDSFile.path, datatype_tag.entity_name == 'datatype'
+                )) \
+                .filter(BIDSFile.is_dir.is_(False)) \
+                .distinct()
+
+            for subject, session, datatype in query:
+                datatypes = session_datatypes.setdefault(subject, {}).setdefault(session, set())
+                if datatype is not None:
+                    datatypes.add(datatype)
+
+        return session_datatypes
+
+    def load_sessions_from_bids(self, session_datatypes):
         """
         Grep the list of sessions for each candidate directly from the BIDS
         structure.
 
+        :param session_datatypes: datatypes of each session of each subject
+         :type session_datatypes: dict
+
         :return: dictionary with the list of sessions and candidates found in the
                  BIDS structure
          :rtype: dict
@@ -200,8 +255,10 @@ class BidsReader:
         cand_sessions = {}
 
         for row in self.participants_info:
-            ses = self.bids_layout.get_sessions(subject=row['participant_id'])
-            cand_sessions[row['participant_id']] = ses
+            sessions = session_datatypes.get(row['participant_id'], {}).keys()
+            cand_sessions[row['participant_id']] = natural_sort(
+                session for session in sessions if session is not None
+            )
 
         if self.verbose:
             print('\t=> List of sessions found:\n')
@@ -214,11 +271,14 @@ class BidsReader:
 
         return cand_sessions
 
-    def load_modalities_from_bids(self):
+    def load_modalities_from_bids(self, session_datatypes):
         """
         Grep the list of modalities available for each session and candidate directly
         from the BIDS structure.
 
+        :param session_datatypes: datatypes of each session of each subject
+         :type session_datatypes: dict
+
         :return: dictionary for candidate and session with list of modalities
          :rtype: dict
         """
@@ -231,14 +291,14 @@ class BidsReader:
         for subject, visit_list in self.cand_sessions_list.items():
             if visit_list:
                 for visit in visit_list:
-                    modalities = self.bids_layout.get_datatype(subject=subject, session=visit)
+                    modalities = natural_sort(session_datatypes[subject][visit])
                     cand_session_modalities_list.append({
                         'bids_sub_id': subject,
                         'bids_ses_id': visit,
                         'modalities' : modalities
                     })
             else:
-                modalities = self.bids_layout.get_datatype(subject=subject)
+                modalities = natural_sort(session_datatypes.get(subject, {}).get(None, set()))
                 cand_session_modalities_list.append({
                     'bids_sub_id': subject,
                     'bids_ses_id': None,
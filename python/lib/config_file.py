@@ -26,6 +26,23 @@ class DatabaseConfig:
     database: str
     port:     int = 3306  # Default database port.
 
+    pool_size: int = 5
+    """
+    Number of database connections kept open in the connection pool of a process.
+    """
+
+    max_overflow: int = 10
+    """
+    Number of database connections that can be opened in addition to the pooled connections when
+    all of them are in use.
+    """
+
+    pool_pre_ping: bool = True
+    """
+    Whether to check that a pooled connection is still alive before using it, which allows
+    long-running scripts to recover from connections closed by the database server.
+    """
+
 
 @dataclass
 class S3Config:
@@ -1,11 +1,14 @@
 """Allows LORIS database connectivity for LORIS-MRI python code base"""
 
 import sys
+from contextlib import contextmanager
 
 import MySQLdb
+from sqlalchemy.exc import SQLAlchemyError
 
 import lib.exitcode
 from lib.config_file import DatabaseConfig
+from lib.db.connect import get_shared_database_engine
 
 
 class Database:
@@ -32,6 +35,10 @@ class Database:
             "SELECT CandID FROM candidate"
         ) # args is optional in db.pselect
 
+        # to stream the rows of a large select without loading them all in memory
+        for row in db.pselect_iter("SELECT FileID, File FROM files"):
+            ...
+
         # to insert multiple rows
         db.insert(
             'media',
@@ -70,6 +77,7 @@ class Database:
         """
 
         self.verbose = verbose
+        self.config = config
 
         # grep database credentials
         self.db_name   = config.database
@@ -88,8 +96,11 @@ class Database:
     def connect(self):
         """
         Attempts to connect to the database using the connection parameters
-        passed at construction time. This method will throw a
-        DatabaseException if the connection could not be established.
+        passed at construction time. The connection is checked out from the
+        connection pool shared with the SQLAlchemy engine of the process, so
+        that the database handles of a script reuse a small set of connections.
+        This method will throw a DatabaseException if the connection could not
+        be established.
         """
 
         connect_statement = "\nConnecting to:" \
@@ -101,16 +112,11 @@ class Database:
             print(connect_statement)
 
         try:
-            self.con = MySQLdb.connect(
-                host=self.host_name,
-                user=self.user_name,
-                passwd=self.password,
-                port=self.port,
-                db=self.db_name,
-                autocommit=True,
-            )
-            # self.cnx.cursor = self.cnx.cursor(prepared=True)
-        except MySQLdb.Error as err:
+            self.pooled_con = get_shared_database_engine(self.config).raw_connection()
+            self.con = self.pooled_con.driver_connection
+            # the legacy queries expect every statement to be committed immediately
+            self.con.autocommit(True)
+        except (MySQLdb.Error, SQLAlchemyError) as err:
             raise Exception("Database connection failure: " + format(err))
 
     def pselect(self, query, args=None):
@@ -143,26 +149,83 @@ class Database:
 
         return results
 
-    def insert(self, table_name, column_names, values, get_last_id=False):
+    def pselect_iter(self, query, args=None, batch_size=1000):
+        """
+        Executes a select query on the database and yields the resulting rows
+        one by one. Unlike `pselect`, the rows are streamed from the database
+        using a server-side cursor and fetched in batches, so the memory usage
+        does not depend on the size of the result set.
+
+        The query is executed on a separate connection checked out from the
+        connection pool, so that other queries can be run on this database
+        handle while iterating over the rows.
+
+        :param query: select query to execute (containing the argument
+                      placeholders if any
+         :type query: str
+        :param args: arguments to replace the placeholders with
+         :type args: tuple
+        :param batch_size: number of rows fetched from the database at a time
+         :type batch_size: int
+
+        :return: iterator over dictionaries with MySQL column header name
+         :rtype: iterator of dict
+        """
+        if self.verbose:
+            print("\nExecuting query:\n\t" + query + "\n")
+            if args:
+                print("With arguments:\n\t"  + str(args) + "\n")
+
+        try:
+            pooled_con = get_shared_database_engine(self.config).raw_connection()
+        except (MySQLdb.Error, SQLAlchemyError) as err:
+            raise Exception("Database connection failure: " + format(err))
+
+        try:
+            cursor = pooled_con.driver_connection.cursor(MySQLdb.cursors.SSDictCursor)
+            try:
+                cursor.execute(query, args) if args else cursor.execute(query)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+
+                    yield from rows
+            finally:
+                # consumes the rows left on the server if the iteration stopped early
+                cursor.close()
+        except MySQLdb.Error as err:
+            raise Exception("Select query failure: " + format(err))
+        finally:
+            pooled_con.close()
+
+    def insert(self, table_name, column_names, values, get_last_id=False, ignore_duplicates=False):
         """
         Inserts records in a given database table with the specified column
         values. This method will raise an exception if the record cannot be
         inserted.
 
-        :param table_name  : name of the database table to insert into
-         :type table_name  : str
-        :param column_names: name of the table's columns to insert into
-         :type column_names: tuple
-        :param values      : list of values to insert into the table
-         :type values      : list
+        :param table_name       : name of the database table to insert into
+         :type table_name       : str
+        :param column_names     : name of the table's columns to insert into
+         :type column_names     : tuple
+        :param values           : list of values to insert into the table
+         :type values           : list
+        :param ignore_duplicates: whether to leave the existing row untouched when
+                                  a row violates a unique key of the table
+         :type ignore_duplicates: bool
 
         :return: the last ID that have been inserted into the database
          :rtype: int
         """
 
+        column_names = tuple(column_names)
         placeholders = ','.join(map(lambda x: '%s', column_names))
 
         query = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({placeholders})"
+        if ignore_duplicates:
+            # no-op update so that only duplicate key errors are silenced (unlike INSERT IGNORE)
+            query += f" ON DUPLICATE KEY UPDATE {column_names[0]} = {column_names[0]}"
 
         if self.verbose:
             print("\nExecuting query:\n\t" + query + "\n"
@@ -193,8 +256,9 @@ class Database:
 
         :param query: update query to be run
          :type query: str
-        :param args : arguments to replace the placeholders with
-         :type args : tuple
+        :param args : arguments to replace the placeholders with, or list of
+                      arguments to run the query once per element
+         :type args : tuple | list
         """
 
         if self.verbose:
@@ -203,10 +267,45 @@ class Database:
 
         try:
             cursor = self.con.cursor()
-            cursor.execute(query, args)
+            if isinstance(args, list):
+                # if args is a list, use cursor.executemany
+                # (to execute multiple updates at once)
+                cursor.executemany(query, args)
+            else:
+                cursor.execute(query, args)
         except MySQLdb.Error as err:
             raise Exception("Update query failure: " + format(err))
 
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager that runs the queries executed on this database handle
+        in a single transaction. The transaction is committed when the context
+        exits, or rolled back if an exception (including a script exit) is
+        raised in the context.
+
+        :Example:
+
+            with db.transaction():
+                db.insert(...)
+                db.update(...)
+        """
+
+        try:
+            self.con.autocommit(False)
+        except MySQLdb.Error as err:
+            raise Exception("Transaction start failure: " + format(err))
+
+        try:
+            yield
+            self.con.commit()
+        except BaseException:
+            self.con.rollback()
+            raise
+        finally:
+            # the legacy queries expect every statement to be committed immediately
+            self.con.autocommit(True)
+
     def grep_id_from_lookup_table(self, id_field_name, table_name, where_field_name,
                                   where_value, insert_if_not_found=None):
         """
@@ -255,15 +354,19 @@ class Database:
     def disconnect(self):
         """
         Terminates the connection previously instantiated to the database if a
-        connection was previously established.
+        connection was previously established. The connection is returned to
+        the connection pool of the process.
         """
 
-        if hasattr(self, 'cnx'):
+        if hasattr(self, 'con'):
             if self.verbose:
                 print("\nDisconnecting from the database")
 
             try:
-                self.con.close()
+                # the autocommit mode is turned off when the connection is returned to the pool
+                self.pooled_con.close()
             except MySQLdb.Error as err:
                 message = "Database disconnection failure: " + format(err)
                 raise Exception(message)
+
+            del self.con
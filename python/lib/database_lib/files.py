@@ -196,6 +196,24 @@ class Files:
 
         return self.db.pselect(query=query, args=(tarchive_id,))
 
+    def iter_files_inserted_for_tarchive_id(self, tarchive_id, fields=('*',)):
+        """
+        Iterate over the files that were inserted into the `files` table for a given `TarchiveID`
+        without loading all of them in memory.
+
+        :param tarchive_id: `TarchiveID` to restrict the query on
+         :type tarchive_id: int
+        :param fields: fields of the `files` table to select
+         :type fields: tuple
+
+        :return: iterator over the rows of the `files` table associated to the `TarchiveID`
+         :rtype: iterator
+        """
+
+        query = f"SELECT {', '.join(fields)} FROM files WHERE TarchiveSource = %s"
+
+        return self.db.pselect_iter(query=query, args=(tarchive_id,))
+
     def get_files_inserted_for_session_id(self, session_id):
         """
         Get the list of files that were inserted into the `files` table for a given `SessionID`.
@@ -75,20 +75,24 @@ class ParameterType:
 
         return bids_to_minc_mapping_dict
 
-    def insert_parameter_type(self, field_value_dict):
+    def insert_parameter_type(self, field_value_dict, ignore_duplicates=False):
         """
         Inserts a row into the parameter_type table based on fields/values dictionary provided to the function.
 
-        :param field_value_dict: dictionary where the parameter_type field name are keys and values to insert
-                                 are in the dictionary values
-         :type field_value_dict: dict
+        :param field_value_dict : dictionary where the parameter_type field name are keys and values to insert
+                                  are in the dictionary values
+         :type field_value_dict : dict
+        :param ignore_duplicates: whether to leave untouched a parameter type with the same name and source
+                                  inserted concurrently, in which case no ID is returned
+         :type ignore_duplicates: bool
         """
 
         return self.db.insert(
             table_name='parameter_type',
             column_names=field_value_dict.keys(),
             values=field_value_dict.values(),
-            get_last_id=True
+            get_last_id=True,
+            ignore_duplicates=ignore_duplicates
         )
 
     def get_parameter_type_category_id(self, category_name):
@@ -107,7 +111,7 @@ class ParameterType:
 
         return results[0]['ParameterTypeCategoryID'] if results else None
 
-    def insert_into_parameter_type_category_rel(self, param_category_id, param_type_id):
+    def insert_into_parameter_type_category_rel(self, param_category_id, param_type_id, ignore_duplicates=False):
         """
         Inserts a row into the parameter_type_category_rel table for a given ParameterTypeID
         and ParameterTypeCategoryID.
@@ -116,11 +120,14 @@ class ParameterType:
          :type param_category_id: int
         :param param_type_id: ParameterTypeID to use in the insert statement
          :type param_type_id: int
+        :param ignore_duplicates: whether to leave untouched the same relation inserted concurrently
+         :type ignore_duplicates: bool
         """
 
         self.db.insert(
             table_name='parameter_type_category_rel',
             column_names=('ParameterTypeCategoryID', 'ParameterTypeID'),
             values=(param_category_id, param_type_id),
-            get_last_id=False
+            get_last_id=False,
+            ignore_duplicates=ignore_duplicates
         )
@@ -142,7 +142,7 @@ class PhysiologicalCoordSystem:
          :rtype            : int | None
         """
         q_args = (coord_mod_id,)
-        q_extra = "SELECT DISTINCT PhysiologicalCoordSystemID " \
+        q_extra = "SELECT MIN(PhysiologicalCoordSystemID) AS PhysiologicalCoordSystemID " \
                   "FROM physiological_coord_system " \
                   "WHERE ModalityID = %s"
         # add name id
@@ -165,7 +165,7 @@ class PhysiologicalCoordSystem:
         return r_query[0]['PhysiologicalCoordSystemID'] if r_query else None
 
     def insert_coord_system(self, name_id: int, unit_id: int, type_id: int,
-                            mod_id: int, coord_file: str):
+                            mod_id: int, coord_file: str, ignore_duplicates: bool = False):
         """
         Inserts a new entry in the physiological_coord_system table.
         :param name_id     : coord system name id
@@ -178,6 +178,9 @@ class PhysiologicalCoordSystem:
          :type mod_id      : int
         :param coord_file  : path of the coord system file
          :type coord_file  : str
+        :param ignore_duplicates: whether to leave untouched a coordinate system
+                                  inserted concurrently, in which case no ID is returned
+         :type ignore_duplicates: bool
         :return            : The inserted coordinate system ID or None
          :rtype            : int
         """
@@ -197,7 +200,8 @@ class PhysiologicalCoordSystem:
                 mod_id,
                 coord_file
             ),
-            get_last_id=True
+            get_last_id=True,
+            ignore_duplicates=ignore_duplicates
         )
 
     def grep_or_insert_coord_system(self, name_id: int, unit_id: int, type_id: int,
@@ -219,7 +223,10 @@ class PhysiologicalCoordSystem:
         """
         coord_system_id = self.grep_coord_system(mod_id, name_id, unit_id, type_id)
         if coord_system_id is None:
-            coord_system_id = self.insert_coord_system(name_id, unit_id, type_id, mod_id, coord_file)
+            # the same coordinate system may be inserted concurrently by another import,
+            # the grep returns the one with the smallest ID to all the imports
+            self.insert_coord_system(name_id, unit_id, type_id, mod_id, coord_file, ignore_duplicates=True)
+            coord_system_id = self.grep_coord_system(mod_id, name_id, unit_id, type_id)
         return coord_system_id
 
     def insert_coord_system_electrodes_relation(self, physiological_file_id: int,
@@ -257,17 +264,20 @@ class PhysiologicalCoordSystem:
         :param point_ids       : dict of (point name,point_3d id) associated with the coordinate system ID
          :type point_ids       : Dict[str, int]
         """
-        values_to_insert = []
-        for name, pid in point_ids.items():
-            r = self.db.pselect(
-                query="SELECT * "
+        # the points already related to the coordinate system are selected at once
+        existing_point_ids = {
+            r['Point3DID'] for r in self.db.pselect(
+                query="SELECT Point3DID "
                 "FROM physiological_coord_system_point_3d_rel "
-                "WHERE PhysiologicalCoordSystemID = %s "
-                "AND Point3DID = %s ",
-                args=(coord_system_id, pid,)
+                "WHERE PhysiologicalCoordSystemID = %s ",
+                args=(coord_system_id,)
             )
-            if not r:
-                values_to_insert.append((coord_system_id, pid, name))
+        }
+        values_to_insert = [
+            (coord_system_id, pid, name)
+            for name, pid in point_ids.items()
+            if pid not in existing_point_ids
+        ]
         self.db.insert(
             table_name='physiological_coord_system_point_3d_rel',
             column_names=(
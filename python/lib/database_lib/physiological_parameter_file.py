@@ -40,3 +40,19 @@ class PhysiologicalParameterFile:
             values       = (physiological_file_id, project_id, parameter_type_id, value),
             get_last_id  = True
         )
+
+    def insert_many(self, values):
+        """
+        Inserts several entries in the physiological_parameter_file table with a
+        single statement.
+
+        :param values: list of (physiological file ID, project ID, parameter type
+                       ID, value) tuples
+         :type values: list
+        """
+
+        self.db.insert(
+            table_name   = self.table,
+            column_names = ('PhysiologicalFileID', 'ProjectID', 'ParameterTypeID', 'Value'),
+            values       = values
+        )
@@ -63,3 +63,45 @@ class PhysiologicalTaskEvent:
             values=values,
             get_last_id=True
         )
+
+    def insert_many(self, values):
+        """
+        Inserts several entries in the physiological_task_event table with a
+        single statement.
+
+        :param values: list of (physiological file ID, event file ID, onset,
+                       duration, event code, event value, event sample, event
+                       type, trial type, response time) tuples
+         :type values: list
+        """
+
+        self.db.insert(
+            table_name   = self.table,
+            column_names = (
+                'PhysiologicalFileID', 'EventFileID', 'Onset', 'Duration',
+                'EventCode', 'EventValue', 'EventSample', 'EventType',
+                'TrialType', 'ResponseTime'
+            ),
+            values       = values
+        )
+
+    def grep_ids_from_event_file_id(self, event_file_id):
+        """
+        Gets the IDs of the task events of an event file, in insertion order.
+
+        :param event_file_id: EventFileID from physiological_event_file table
+         :type event_file_id: int
+
+        :return: list of PhysiologicalTaskEventID
+         :rtype: list
+        """
+
+        results = self.db.pselect(
+            query="SELECT PhysiologicalTaskEventID "
+                  "FROM physiological_task_event "
+                  "WHERE EventFileID = %s "
+                  "ORDER BY PhysiologicalTaskEventID",
+            args=(event_file_id,)
+        )
+
+        return [result['PhysiologicalTaskEventID'] for result in results]
@@ -60,3 +60,60 @@ class PhysiologicalTaskEventHEDRel:
             values=values,
             get_last_id=True
         )
+
+    def insert_many(self, values):
+        """
+        Inserts several entries in the physiological_task_event_hed_rel table
+        with a single statement.
+
+        :param values: list of (task event ID, HED tag ID, tag value, has pairing,
+                       pair rel ID, additional members) tuples
+         :type values: list
+        """
+
+        self.db.insert(
+            table_name   = self.table,
+            column_names = (
+                'PhysiologicalTaskEventID', 'HEDTagID', 'TagValue',
+                'HasPairing', 'PairRelID', 'AdditionalMembers'
+            ),
+            values       = values
+        )
+
+    def grep_ids_from_event_file_id(self, event_file_id):
+        """
+        Gets the IDs of the HED tags of the task events of an event file, in
+        insertion order.
+
+        :param event_file_id: EventFileID from physiological_event_file table
+         :type event_file_id: int
+
+        :return: list of ID
+         :rtype: list
+        """
+
+        results = self.db.pselect(
+            query="SELECT rel.ID "
+                  "FROM physiological_task_event_hed_rel rel "
+                  "JOIN physiological_task_event event "
+                  "ON event.PhysiologicalTaskEventID = rel.PhysiologicalTaskEventID "
+                  "WHERE event.EventFileID = %s "
+                  "ORDER BY rel.ID",
+            args=(event_file_id,)
+        )
+
+        return [result['ID'] for result in results]
+
+    def update_pair_rel_ids(self, values):
+        """
+        Sets the pair rel ID of several entries of the
+        physiological_task_event_hed_rel table at once.
+
+        :param values: list of (pair rel ID, ID) tuples
+         :type values: list
+        """
+
+        self.db.update(
+            query="UPDATE physiological_task_event_hed_rel SET PairRelID = %s WHERE ID = %s",
+            args=values
+        )
@@ -49,3 +49,18 @@ class PhysiologicalTaskEventOpt:
             values=values,
             get_last_id=get_last_id
         )
+
+    def insert_many(self, values):
+        """
+        Inserts several entries in the physiological_task_event_opt table with a
+        single statement.
+
+        :param values: list of (task event ID, property name, property value) tuples
+         :type values: list
+        """
+
+        self.db.insert(
+            table_name   = self.table,
+            column_names = ('PhysiologicalTaskEventID', 'PropertyName', 'PropertyValue'),
+            values       = values
+        )
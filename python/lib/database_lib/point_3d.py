@@ -117,3 +117,61 @@ class Point3DDB:
         if p is None:
             p = self.insert_point_by_coordinates(x, y, z)
         return p
+
+    def grep_points_by_coordinates(self, coordinates: list[tuple]):
+        """
+        Grep the points in db matching a list of coordinates with a single query.
+        Missing coordinates (None) only match missing coordinates.
+        :param coordinates  : list of (x, y, z) coordinates
+         :type coordinates  : list[tuple]
+        :return: the point ID of each coordinates found in db
+         :rtype: dict[tuple, int]
+        """
+        if not coordinates:
+            return {}
+
+        # the coordinates are joined as a derived table, each with its index in the list
+        requested_points = " UNION ALL ".join(
+            ["SELECT %s AS PointIndex, %s AS X, %s AS Y, %s AS Z"] * len(coordinates)
+        )
+        args = tuple(
+            value
+            for point_index, (x, y, z) in enumerate(coordinates)
+            for value in (point_index, x, y, z)
+        )
+        cp = self.db.pselect(
+            query = "SELECT rp.PointIndex, MIN(p.Point3DID) AS Point3DID "
+                    "FROM point_3d p "
+                    f"JOIN ({requested_points}) rp "
+                    "ON p.X <=> rp.X AND p.Y <=> rp.Y AND p.Z <=> rp.Z "
+                    "GROUP BY rp.PointIndex",
+            args=args
+        )
+        return {coordinates[int(row['PointIndex'])]: row['Point3DID'] for row in cp}
+
+    def grep_or_insert_points(self, points: list[Point3D]):
+        """
+        Set-based version of grep_or_insert_point. The points are deduplicated by
+        coordinates, the existing ones are found with a single query and the
+        missing ones are inserted with a single statement.
+        :param points  : list of Point3D objects
+         :type points  : list[Point3D]
+        :return: a point with its ID for each point, in the same order
+         :rtype: list[Point3D]
+        """
+        coordinates = list(dict.fromkeys((p.x, p.y, p.z) for p in points))
+        point_ids = self.grep_points_by_coordinates(coordinates)
+
+        missing_coordinates = [c for c in coordinates if c not in point_ids]
+        if missing_coordinates:
+            # the same points may be inserted concurrently by another import, in which
+            # case the grep returns the point with the smallest ID to all the imports
+            self.db.insert(
+                table_name = 'point_3d',
+                column_names = ('X', 'Y', 'Z'),
+                values = missing_coordinates,
+                ignore_duplicates = True
+            )
+            point_ids.update(self.grep_points_by_coordinates(missing_coordinates))
+
+        return [Point3D(point_ids[p.x, p.y, p.z], p.x, p.y, p.z) for p in points]
@@ -1,7 +1,17 @@
-from sqlalchemy import URL, create_engine
+import threading
+from typing import Any
+
+from sqlalchemy import URL, Engine, create_engine, event
+from sqlalchemy.pool import ConnectionPoolEntry
 
 from lib.config_file import DatabaseConfig
 
+# Engines shared by the database handles of the current process, indexed by database host, port,
+# username and name.
+shared_engines: dict[tuple[str, int, str, str], Engine] = {}
+# Lock that prevents concurrent threads from each creating a shared engine, and thus a connection pool.
+shared_engines_lock = threading.Lock()
+
 
 def get_database_engine(config: DatabaseConfig):
     """
@@ -20,4 +30,40 @@ def get_database_engine(config: DatabaseConfig):
 
     # 'READ COMMITED' means that the records read in a session can be modified by other sessions
     # (such as subscripts or other scripts) during this session's lifetime.
-    return create_engine(url, isolation_level='READ COMMITTED')
+    return create_engine(
+        url,
+        isolation_level = 'READ COMMITTED',
+        pool_size       = config.pool_size,
+        max_overflow    = config.max_overflow,
+        pool_pre_ping   = config.pool_pre_ping,
+    )
+
+
+def get_shared_database_engine(config: DatabaseConfig) -> Engine:
+    """
+    Get the SQLAlchemy engine shared by all the database handles of the current process for the
+    provided credentials, creating it on the first call. Sharing the engine allows the SQLAlchemy
+    sessions and the legacy database handles of a process to use the same connection pool.
+    """
+
+    key = (config.host, config.port, config.username, config.database)
+    with shared_engines_lock:
+        if key not in shared_engines:
+            engine = get_database_engine(config)
+            event.listen(engine, 'checkin', disable_autocommit)
+            shared_engines[key] = engine
+
+        return shared_engines[key]
+
+
+def disable_autocommit(dbapi_connection: Any, connection_record: ConnectionPoolEntry):
+    """
+    Turn off the autocommit mode of a connection returned to the shared connection pool. The legacy
+    database handles turn it on, and the connection must not be in autocommit mode when it is
+    checked out again by an SQLAlchemy session, including if the handle that used the connection
+    was garbage collected without being disconnected.
+    """
+
+    # The connection is `None` if it was invalidated.
+    if dbapi_connection is not None:
+        dbapi_connection.autocommit(False)
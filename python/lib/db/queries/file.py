@@ -1,7 +1,9 @@
+from collections.abc import Iterable, Sequence
 from pathlib import Path
 
-from sqlalchemy import delete, select
+from sqlalchemy import delete, func, select
 from sqlalchemy.orm import Session as Database
+from sqlalchemy.orm.interfaces import LoaderOption
 
 from lib.db.models.file import DbFile
 from lib.db.models.file_parameter import DbFileParameter
@@ -28,17 +30,59 @@ def try_get_file_with_unique_combination(
     ).scalar_one_or_none()
 
 
-def try_get_file_with_id(db: Database, id: int) -> DbFile | None:
+def try_get_file_with_id(db: Database, id: int, options: Sequence[LoaderOption] = ()) -> DbFile | None:
     """
     Get an imaging file from the database using its ID, or return `None` if no imaging file is
-    found.
+    found. The loader options can be used to eagerly load the relationships used by the caller.
     """
 
     return db.execute(select(DbFile)
         .where(DbFile.id == id)
+        .options(*options)
     ).scalar_one_or_none()
 
 
+def get_files_with_ids(db: Database, ids: Iterable[int], options: Sequence[LoaderOption] = ()) -> Sequence[DbFile]:
+    """
+    Get the imaging files with the given IDs from the database using a single query. The loader
+    options can be used to eagerly load the relationships used by the caller.
+    """
+
+    return db.execute(select(DbFile)
+        .where(DbFile.id.in_(list(ids)))
+        .order_by(DbFile.id)
+        .options(*options)
+    ).scalars().unique().all()
+
+
+def get_files_with_dicom_archive_id(
+    db: Database,
+    dicom_archive_id: int,
+    options: Sequence[LoaderOption] = (),
+) -> Sequence[DbFile]:
+    """
+    Get the imaging files derived from a DICOM archive from the database. The loader options can be
+    used to eagerly load the relationships used by the caller.
+    """
+
+    return db.execute(select(DbFile)
+        .where(DbFile.dicom_archive_id == dicom_archive_id)
+        .order_by(DbFile.id)
+        .options(*options)
+    ).scalars().unique().all()
+
+
+def count_files_with_dicom_archive_id(db: Database, dicom_archive_id: int) -> int:
+    """
+    Count the imaging files derived from a DICOM archive in the database, without loading them.
+    """
+
+    return db.execute(select(func.count())
+        .select_from(DbFile)
+        .where(DbFile.dicom_archive_id == dicom_archive_id)
+    ).scalar_one()
+
+
 def try_get_file_with_path(db: Database, path: Path) -> DbFile | None:
     """
     Get an imaging file from the database using its path, or return `None` if no imaging file is
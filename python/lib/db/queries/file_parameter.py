@@ -1,5 +1,8 @@
+from collections.abc import Iterable, Sequence
+
 from sqlalchemy import delete, select
 from sqlalchemy.orm import Session as Database
+from sqlalchemy.orm import contains_eager
 
 from lib.db.models.file_parameter import DbFileParameter
 from lib.db.models.parameter_type import DbParameterType
@@ -40,3 +43,25 @@ def try_get_file_parameter_with_file_id_type_id(db: Database, file_id: int, type
         .where(DbFileParameter.type_id == type_id)
         .where(DbFileParameter.file_id == file_id)
     ).scalar_one_or_none()
+
+
+def get_file_parameters_with_file_ids(
+    db: Database,
+    file_ids: Iterable[int],
+    parameter_names: Iterable[str] | None = None,
+) -> Sequence[DbFileParameter]:
+    """
+    Get the parameters of several files from the database using a single query, optionally
+    restricted to some parameter names. The parameter types are loaded along with the parameters.
+    """
+
+    query = select(DbFileParameter) \
+        .join(DbFileParameter.type) \
+        .where(DbFileParameter.file_id.in_(list(file_ids))) \
+        .order_by(DbFileParameter.file_id, DbFileParameter.id) \
+        .options(contains_eager(DbFileParameter.type))
+
+    if parameter_names is not None:
+        query = query.where(DbParameterType.name.in_(list(parameter_names)))
+
+    return db.execute(query).scalars().all()
@@ -1,19 +1,28 @@
+from collections.abc import Sequence
 
 from sqlalchemy import select
 from sqlalchemy.orm import Session as Database
+from sqlalchemy.orm.interfaces import LoaderOption
 
 from lib.db.models.candidate import DbCandidate
 from lib.db.models.session import DbSession
 
 
-def try_get_session_with_cand_id_visit_label(db: Database, cand_id: int, visit_label: str) -> DbSession | None:
+def try_get_session_with_cand_id_visit_label(
+    db: Database,
+    cand_id: int,
+    visit_label: str,
+    options: Sequence[LoaderOption] = (),
+) -> DbSession | None:
     """
     Get a session from the database using its candidate CandID and visit label, or return `None`
-    if no session is found.
+    if no session is found. The loader options can be used to eagerly load the relationships used
+    by the caller.
     """
 
     return db.execute(select(DbSession)
         .join(DbSession.candidate)
         .where(DbSession.visit_label == visit_label)
         .where(DbCandidate.cand_id == cand_id)
-    ).scalar_one_or_none()
+        .options(*options)
+    ).unique().scalar_one_or_none()
@@ -6,6 +6,7 @@ import sys
 from pathlib import Path
 
 import lib.exitcode
+from lib.db.queries.file import count_files_with_dicom_archive_id
 from lib.dcm2bids_imaging_pipeline_lib.base_pipeline import BasePipeline
 from lib.logging import log_error_exit, log_verbose
 
@@ -409,12 +410,12 @@ class DicomArchiveLoaderPipeline(BasePipeline):
             - `SessionID`              => `SessionID` associated to the upload
         """
 
-        files_inserted_list = self.imaging_obj.files_db_obj.get_files_inserted_for_tarchive_id(self.dicom_archive.id)
-
         # Update the MRI upload.
         self.mri_upload.inserting = False
         self.mri_upload.insertion_complete = True
-        self.mri_upload.number_of_minc_inserted = len(files_inserted_list)
+        self.mri_upload.number_of_minc_inserted = count_files_with_dicom_archive_id(
+            self.env.db, self.dicom_archive.id
+        )
         self.mri_upload.number_of_minc_created = len(self.nifti_files_to_insert)
         self.mri_upload.session = self.session
         self.env.db.commit()
@@ -430,8 +431,10 @@ class DicomArchiveLoaderPipeline(BasePipeline):
             - path to the log file
         """
 
-        files_results = self.imaging_obj.files_db_obj.get_files_inserted_for_tarchive_id(self.dicom_archive.id)
-        files_inserted_list = [v["File"] for v in files_results] if files_results else None
+        files_results = self.imaging_obj.files_db_obj.iter_files_inserted_for_tarchive_id(
+            self.dicom_archive.id, ('File',)
+        )
+        files_inserted_list = [v["File"] for v in files_results] or None
         prot_viol_results = self.imaging_obj.mri_prot_viol_scan_db_obj.get_protocol_violations_for_tarchive_id(
             self.dicom_archive.id
         )
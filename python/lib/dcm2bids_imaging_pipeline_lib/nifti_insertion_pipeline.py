@@ -633,9 +633,9 @@ class NiftiInsertionPipeline(BasePipeline):
             'PhaseEncodingDirection': phase_enc_dir,
             'MriProtocolChecksGroupID': self.mri_protocol_group_id
         }
-        for violation_dict in violations_list:
-            info_to_insert_dict = base_info_dict | violation_dict
-            self.imaging_obj.insert_mri_violations_log(info_to_insert_dict)
+        self.imaging_obj.insert_mri_violations_logs([
+            base_info_dict | violation_dict for violation_dict in violations_list
+        ])
 
     def _register_into_files_and_parameter_file(self, nifti_rel_path):
         """
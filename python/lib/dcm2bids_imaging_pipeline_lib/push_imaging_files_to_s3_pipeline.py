@@ -2,7 +2,12 @@ import os
 import re
 import sys
 
+from sqlalchemy.orm import selectinload
+
 import lib.exitcode
+from lib.db.models.file import DbFile
+from lib.db.models.file_parameter import DbFileParameter
+from lib.db.queries.file import get_files_with_dicom_archive_id
 from lib.dcm2bids_imaging_pipeline_lib.base_pipeline import BasePipeline
 from lib.logging import log_error_exit
 from lib.util.fs import remove_empty_directories
@@ -94,17 +99,24 @@ class PushImagingFilesToS3Pipeline(BasePipeline):
         Get the list of files associated to the TarchiveID present in the files table.
         """
 
-        file_entries = self.imaging_obj.files_db_obj.get_files_inserted_for_tarchive_id(self.dicom_archive.id)
-        for file in file_entries:
-            if file['File'].startswith('s3://'):
+        # load the file parameters along with the files, they are used by
+        # `_get_list_of_files_from_parameter_file`
+        self.dicom_archive_files = get_files_with_dicom_archive_id(
+            self.env.db,
+            self.dicom_archive.id,
+            [selectinload(DbFile.parameters).joinedload(DbFileParameter.type)],
+        )
+
+        for file in self.dicom_archive_files:
+            if str(file.path).startswith('s3:'):
                 # skip since file already pushed to S3
                 continue
             self.files_to_push_list.append({
                 "table_name": "files",
                 "id_field_name": "FileID",
-                "id_field_value": file["FileID"],
+                "id_field_value": file.id,
                 "file_path_field_name": "File",
-                "original_file_path_field_value": file["File"]
+                "original_file_path_field_value": str(file.path)
             })
 
     def _get_list_of_files_from_parameter_file(self):
@@ -115,27 +127,27 @@ class PushImagingFilesToS3Pipeline(BasePipeline):
         file_ids = [v["id_field_value"] for v in self.files_to_push_list] if self.files_to_push_list else []
 
         files_info = []
-        for file_id in file_ids:
-            files_info.extend(self.imaging_obj.get_bids_files_info_from_parameter_file_for_file_id(file_id))
-            pic_entry_dict = self.imaging_obj.grep_parameter_value_from_file_id_and_parameter_name(
-                file_id, "check_pic_filename"
-            )
-            if pic_entry_dict:
-                # for the pic, we need to add the pic/ subdir to the Value
-                # otherwise, it will not be found on the filesystem
-                pic_entry_dict["Value"] = "pic/" + pic_entry_dict["Value"]
+        for file in self.dicom_archive_files:
+            if file.id not in file_ids:
+                continue
 
-            files_info.extend([pic_entry_dict])
+            for parameter in file.parameters:
+                if parameter.type.name in ["bids_json_file", "check_bval_filename", "check_bvec_filename"]:
+                    files_info.append((parameter.id, parameter.value))
+                elif parameter.type.name == "check_pic_filename":
+                    # for the pic, we need to add the pic/ subdir to the Value
+                    # otherwise, it will not be found on the filesystem
+                    files_info.append((parameter.id, f"pic/{parameter.value}"))
 
-        for file_entry in files_info:
-            if not file_entry:
+        for parameter_file_id, value in files_info:
+            if not value:
                 continue
             self.files_to_push_list.append({
                 "table_name": "parameter_file",
                 "id_field_name": "ParameterFileID",
-                "id_field_value": file_entry["ParameterFileID"],
+                "id_field_value": parameter_file_id,
                 "file_path_field_name": "Value",
-                "original_file_path_field_value": file_entry["Value"]
+                "original_file_path_field_value": value
             })
 
     def _get_list_of_files_from_mri_protocol_violated_scans(self):
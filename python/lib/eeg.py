@@ -13,9 +13,11 @@ from lib.database_lib.physiological_event_archive import PhysiologicalEventArchi
 from lib.database_lib.physiological_event_file import PhysiologicalEventFile
 from lib.database_lib.physiological_modality import PhysiologicalModality
 from lib.database_lib.physiological_output_type import PhysiologicalOutputType
+from lib.hed_schema import get_hed_schema_index
 from lib.physiological import Physiological
 from lib.scanstsv import ScansTSV
 from lib.session import Session
+from lib.util.archive import get_archive_hash
 from lib.util.crypto import compute_file_blake2b_hash
 
 
@@ -141,8 +143,8 @@ class Eeg:
         self.center_id       = self.loris_cand_info['RegistrationCenterID']
         self.project_id      = self.loris_cand_info['RegistrationProjectID']
 
-        hed_query = 'SELECT * FROM hed_schema_nodes WHERE 1'
-        self.hed_union = self.db.pselect(query=hed_query, args=())
+        # the HED schemas are only loaded for the first subject, session and modality of the process
+        self.hed_union = get_hed_schema_index(self.db)
 
         self.cohort_id   = None
         for row in bids_reader.participants_info:
@@ -891,7 +893,7 @@ class Eeg:
         # check if archive is on the filesystem
         (archive_rel_name, archive_full_path) = self.get_archive_paths(archive_rel_name)
         if os.path.isfile(archive_full_path):
-            blake2 = compute_file_blake2b_hash(archive_full_path)
+            blake2 = get_archive_hash(archive_full_path)
         else:
             blake2 = None
 
@@ -922,10 +924,9 @@ class Eeg:
         )
 
         # create the archive file
-        utilities.create_archive(files_to_archive, archive_full_path)
+        blake2 = utilities.create_archive(files_to_archive, archive_full_path, reproducible=True)
 
         # insert the archive file in physiological_archive
-        blake2 = compute_file_blake2b_hash(archive_full_path)
         archive_info = {
             'PhysiologicalFileID': eeg_file_id,
             'Blake2bHash'        : blake2,
@@ -944,7 +945,7 @@ class Eeg:
         # check if archive is on the filesystem
         (archive_rel_name, archive_full_path) = self.get_archive_paths(archive_rel_name)
         if os.path.isfile(archive_full_path):
-            blake2 = compute_file_blake2b_hash(archive_full_path)
+            blake2 = get_archive_hash(archive_full_path)
         else:
             blake2 = None
 
@@ -978,10 +979,9 @@ class Eeg:
         )
 
         # create the archive file
-        utilities.create_archive(files_to_archive, archive_full_path)
+        blake2 = utilities.create_archive(files_to_archive, archive_full_path, reproducible=True)
 
         # insert the archive into the physiological_annotation_archive table
-        blake2 = compute_file_blake2b_hash(archive_full_path)
         physiological_event_archive_obj.insert(eeg_file_id, blake2, archive_rel_name)
 
     def get_archive_paths(self, archive_rel_name):
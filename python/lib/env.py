@@ -1,10 +1,12 @@
+import time
 from collections.abc import Callable
-from dataclasses import dataclass
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, TextIO
 
 from sqlalchemy import Engine
 from sqlalchemy.orm import Session
 
+from lib.db.models.notification_spool import DbNotificationSpool
 from lib.db.models.notification_type import DbNotificationType
 from lib.db.queries.notification import try_get_notification_type_with_name
 
@@ -24,6 +26,10 @@ class Notifier:
     origin: str
     # Process ID, which is usually the MRI upload ID
     process_id: int
+    # Notifications that have not been committed to the database yet
+    pending_notifications: list[DbNotificationSpool] = field(default_factory=list[DbNotificationSpool])
+    # Monotonic time of the last commit of the pending notifications
+    last_flush_time: float = field(default_factory=time.monotonic)
 
 
 @dataclass
@@ -41,6 +47,8 @@ class Env:
     verbose: bool
     cleanups: list[Callable[[], None]]
     notifier: Notifier | None = None
+    # Handle of the log file, which is opened on the first write and kept open afterwards
+    log_file_handle: TextIO | None = None
 
     def add_cleanup(self, cleanup: Callable[[], None]):
         """
@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import Never
 
+from sqlalchemy.orm import joinedload
+
 from lib.config import get_patient_id_dicom_header_config
 from lib.config_file import SessionCandidateConfig, SessionConfig, SessionPhantomConfig
 from lib.db.models.candidate import DbCandidate
@@ -152,7 +154,13 @@ def get_candidate_session_info(
             f"No visit found for visit label '{session_config.visit_label}'."
         )
 
-    session = try_get_session_with_cand_id_visit_label(env.db, session_config.cand_id, session_config.visit_label)
+    # The session site and project are used by the callers and the scanner registration.
+    session = try_get_session_with_cand_id_visit_label(
+        env.db,
+        session_config.cand_id,
+        session_config.visit_label,
+        [joinedload(DbSession.site), joinedload(DbSession.project)],
+    )
     if session is None:
         visit_number = get_candidate_next_visit_number(candidate)
         create_session_info = get_candidate_create_session_info(env, session_config)
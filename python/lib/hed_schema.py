@@ -0,0 +1,77 @@
+"""Index of the HED schema nodes of the LORIS database, loaded once per process"""
+
+import threading
+
+
+class HedSchemaIndex:
+    """
+    Index of the union of the HED schemas of the database by tag name. It also
+    caches the tag groups built from each distinct HED string, since event
+    files repeat the same few HED strings for thousands of events.
+
+    :Example:
+
+        from lib.hed_schema import get_hed_schema_index
+
+        hed_union = get_hed_schema_index(db)
+        hed_tag = hed_union.get_node('Sensory-event')
+    """
+
+    def __init__(self, nodes):
+        """
+        Constructor method for the HedSchemaIndex class.
+
+        :param nodes: rows of the hed_schema_nodes table with their ID and Name
+         :type nodes: iterable of dict
+        """
+
+        self.nodes_by_name = {}
+        for node in nodes:
+            # a name defined in several schemas resolves to its first node
+            self.nodes_by_name.setdefault(node['Name'], node)
+
+        # tag groups built from each HED string, filled by Physiological.build_hed_tag_groups
+        self.tag_groups = {}
+
+    def __len__(self):
+        return len(self.nodes_by_name)
+
+    def get_node(self, name):
+        """
+        Gets the HED schema node of a tag name.
+
+        :param name: name of the tag (leaf node of the tag path)
+         :type name: str
+
+        :return: node with its ID and Name, or None if the name is not in the schemas
+         :rtype: dict | None
+        """
+
+        return self.nodes_by_name.get(name)
+
+
+_hed_schema_index = None
+_hed_schema_index_lock = threading.Lock()
+
+
+def get_hed_schema_index(db):
+    """
+    Gets the index of the HED schema nodes of the database. The nodes are only
+    selected from the database on the first call of the process, including
+    when several threads of the process ingest datasets concurrently.
+
+    :param db: database handle
+     :type db: Database
+
+    :return: index of the HED schema nodes
+     :rtype: HedSchemaIndex
+    """
+
+    global _hed_schema_index
+    with _hed_schema_index_lock:
+        if _hed_schema_index is None:
+            # only the tag IDs and names are used, the descriptions are not loaded
+            hed_query = 'SELECT ID, Name FROM hed_schema_nodes'
+            _hed_schema_index = HedSchemaIndex(db.pselect_iter(query=hed_query))
+
+    return _hed_schema_index
@@ -23,6 +23,7 @@ from lib.database_lib.mri_violations_log import MriViolationsLog
 from lib.database_lib.parameter_file import ParameterFile
 from lib.database_lib.parameter_type import ParameterType
 from lib.util.crypto import compute_file_blake2b_hash
+from lib.violation_registrar import ViolationRegistrar
 
 
 class Imaging:
@@ -75,6 +76,7 @@ class Imaging:
         self.mri_viol_log_db_obj = MriViolationsLog(db, verbose)
         self.param_type_db_obj = ParameterType(db, verbose)
         self.param_file_db_obj = ParameterFile(db, verbose)
+        self.violation_registrars = {}
 
     def determine_file_type(self, file):
         """
@@ -190,6 +192,23 @@ class Imaging:
         else:
             self.param_file_db_obj.insert_parameter_file(param_file_insert_info_dict)
 
+    def get_violation_registrar(self, tarchive_id):
+        """
+        Get the violation registrar of a DICOM archive, which is created on the first call for that
+        archive and reused afterwards so that the existing violations are only fetched once.
+
+        :param tarchive_id: TarchiveID of the archive the violations are registered for
+         :type tarchive_id: int
+
+        :return: violation registrar of the archive
+         :rtype: ViolationRegistrar
+        """
+
+        if tarchive_id not in self.violation_registrars:
+            self.violation_registrars[tarchive_id] = ViolationRegistrar(self.db, self.verbose, tarchive_id)
+
+        return self.violation_registrars[tarchive_id]
+
     def insert_mri_candidate_errors(self, patient_name, tarchive_id, scan_param, file_rel_path, reason):
         """
         Insert a row into MriCandidateErrors table.
@@ -206,28 +225,9 @@ class Imaging:
          :type reason: str
         """
 
-        series_uid = scan_param["SeriesUID"] if "SeriesUID" in scan_param.keys() else None
-        echo_time = scan_param["EchoTime"] if "EchoTime" in scan_param.keys() else None
-
-        existing_cand_errors = self.mri_cand_errors_db_obj.get_candidate_errors_for_tarchive_id(tarchive_id)
-
-        for row in existing_cand_errors:
-            if str(row['SeriesUID']) == str(series_uid) \
-                    and str(row['EchoTime']) == str(echo_time) \
-                    and str(row['PatientName']) == str(patient_name) \
-                    and str(row['Reason']) == str(reason):
-                return
-
-        info_to_insert_dict = {
-            "TimeRun": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "SeriesUID": series_uid,
-            "TarchiveID": tarchive_id,
-            "MincFile": file_rel_path,
-            "PatientName": patient_name,
-            "Reason": reason,
-            "EchoTime": echo_time
-        }
-        self.mri_cand_errors_db_obj.insert_mri_candidate_errors(info_to_insert_dict)
+        violation_registrar = self.get_violation_registrar(tarchive_id)
+        violation_registrar.add_candidate_error(patient_name, scan_param, file_rel_path, reason)
+        violation_registrar.flush()
 
     def insert_protocol_violated_scan(self, patient_name, cand_id, psc_id, tarchive_id, scan_param, file_rel_path,
                                       mri_protocol_group_id):
@@ -250,51 +250,14 @@ class Imaging:
          :type mri_protocol_group_id: int
         """
 
-        series_uid = scan_param["SeriesInstanceUID"] if "SeriesInstanceUID" in scan_param.keys() else None
-        image_type = str(scan_param["ImageType"]) if "ImageType" in scan_param.keys() else None
-        echo_time = str(scan_param["EchoTime"]) if "EchoTime" in scan_param.keys() else None
-        echo_number = repr(scan_param["EchoNumber"]) if "EchoNumber" in scan_param.keys() else None
-        phase_encoding_dir = scan_param["PhaseEncodingDirection"] \
-            if "PhaseEncodingDirection" in scan_param.keys() else None
-
-        # if there is already an entry for this violation in mri_protocol_violated_scans, do not insert anything
-        existing_prot_viol_scans = self.mri_prot_viol_scan_db_obj.get_protocol_violations_for_tarchive_id(tarchive_id)
-        for row in existing_prot_viol_scans:
-            if row['SeriesUID'] == series_uid \
-                    and row['PhaseEncodingDirection'] == phase_encoding_dir \
-                    and row['TE_range'] == echo_time \
-                    and row['EchoNumber'] == echo_number:
-                return
-
         candidate_obj = CandidateDB(self.db, self.verbose)
         candidate_id = candidate_obj.get_candidate_id(cand_id)
 
-        info_to_insert_dict = {
-            "CandidateID": candidate_id,
-            "PSCID": psc_id,
-            "TarchiveID": tarchive_id,
-            "time_run": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            "series_description": scan_param["SeriesDescription"] if "SeriesDescription" in scan_param.keys() else None,
-            "minc_location": file_rel_path,
-            "PatientName": patient_name,
-            "TR_range": scan_param["RepetitionTime"] if "RepetitionTime" in scan_param.keys() else None,
-            "TE_range": scan_param["EchoTime"] if "EchoTime" in scan_param.keys() else None,
-            "TI_range": scan_param["InversionTime"] if "InversionTime" in scan_param.keys() else None,
-            "slice_thickness_range": scan_param["SliceThickness"] if "SliceThickness" in scan_param.keys() else None,
-            "xspace_range": scan_param["xspace"] if "xspace" in scan_param.keys() else None,
-            "yspace_range": scan_param["yspace"] if "yspace" in scan_param.keys() else None,
-            "zspace_range": scan_param["zspace"] if "zspace" in scan_param.keys() else None,
-            "xstep_range": scan_param["xstep"] if "xstep" in scan_param.keys() else None,
-            "ystep_range": scan_param["ystep"] if "ystep" in scan_param.keys() else None,
-            "zstep_range": scan_param["zstep"] if "zstep" in scan_param.keys() else None,
-            "time_range": scan_param["time"] if "time" in scan_param.keys() else None,
-            "SeriesUID": series_uid,
-            "image_type": image_type,
-            "PhaseEncodingDirection": phase_encoding_dir,
-            "EchoNumber": echo_number,
-            "MriProtocolGroupID": mri_protocol_group_id if mri_protocol_group_id else None
-        }
-        self.mri_prot_viol_scan_db_obj.insert_protocol_violated_scans(info_to_insert_dict)
+        violation_registrar = self.get_violation_registrar(tarchive_id)
+        violation_registrar.add_protocol_violated_scan(
+            patient_name, candidate_id, psc_id, scan_param, file_rel_path, mri_protocol_group_id
+        )
+        violation_registrar.flush()
 
     def insert_mri_violations_log(self, info_to_insert_dict):
         """
@@ -304,35 +267,24 @@ class Imaging:
          :type info_to_insert_dict: dict
         """
 
-        series_uid = info_to_insert_dict["SeriesUID"]
-        echo_number = repr(info_to_insert_dict["EchoNumber"])
-        phase_encoding_dir = info_to_insert_dict["PhaseEncodingDirection"]
-        echo_time = info_to_insert_dict['EchoTime']
-        scan_type = info_to_insert_dict['MriScanTypeID']
-        severity = info_to_insert_dict['Severity']
-        header = info_to_insert_dict['Header']
-        value = info_to_insert_dict['Value']
-        valid_regex = info_to_insert_dict['ValidRegex']
-        valid_range = info_to_insert_dict['ValidRange']
-
-        # if there is already an entry for this violation in mri_violations_log, do not insert anything
-        existing_viol_logs = self.mri_viol_log_db_obj.get_violations_for_tarchive_id(
-            info_to_insert_dict['TarchiveID']
-        )
-        for row in existing_viol_logs:
-            if str(row['SeriesUID']) == str(series_uid) \
-                    and str(row['PhaseEncodingDirection']) == str(phase_encoding_dir) \
-                    and str(row['EchoNumber']) == str(echo_number) \
-                    and str(row['MriScanTypeID']) == str(scan_type) \
-                    and str(row['EchoTime']) == str(echo_time) \
-                    and str(row['Severity']) == str(severity) \
-                    and str(row['Header']) == str(header) \
-                    and str(row['Value']) == str(value) \
-                    and str(row['ValidRange']) == str(valid_range) \
-                    and str(row['ValidRegex']) == str(valid_regex):
-                return
-
-        self.mri_viol_log_db_obj.insert_violations_log(info_to_insert_dict)
+        self.insert_mri_violations_logs([info_to_insert_dict])
+
+    def insert_mri_violations_logs(self, info_to_insert_dicts):
+        """
+        Inserts into mri_violations_log table the entries determined by the information stored in
+        info_to_insert_dicts, skipping the entries that are already registered, using a single bulk
+        insert.
+
+        :param info_to_insert_dicts: list of dictionaries with the information to be inserted in mri_violations_log
+         :type info_to_insert_dicts: list
+        """
+
+        for info_to_insert_dict in info_to_insert_dicts:
+            violation_registrar = self.get_violation_registrar(info_to_insert_dict['TarchiveID'])
+            violation_registrar.add_violations_log(info_to_insert_dict)
+
+        for violation_registrar in self.violation_registrars.values():
+            violation_registrar.flush()
 
     @deprecated('Use `lib.imaging_lib.parameter.get_or_create_parameter_type` instead.')
     def get_parameter_type_id(self, parameter_name):
@@ -354,8 +306,10 @@ class Imaging:
             else self.param_type_db_obj.get_parameter_type_id(param_name=parameter_name)
 
         if not param_type_id:
-            # if no parameter type ID found, create an entry in parameter_type
-            param_type_id = self.param_type_db_obj.insert_parameter_type(
+            # if no parameter type ID found, create an entry in parameter_type. The same entry
+            # may be created concurrently by another import, so duplicates are ignored and the
+            # parameter type is grepped again
+            self.param_type_db_obj.insert_parameter_type(
                 {
                     'Name': parameter_name,
                     'Alias': None,
@@ -363,12 +317,16 @@ class Imaging:
                     'Description': f'{parameter_name} magically created by lib.imaging python class',
                     'SourceFrom': 'parameter_file',
                     'Queryable': 0
-                }
+                },
+                ignore_duplicates=True
             )
+            param_type_id = self.param_type_db_obj.get_parameter_type_id(param_name=parameter_name)
 
             # link the newly created parameter_type_id to parameter type category 'MRI Variables'
             category_id = self.param_type_db_obj.get_parameter_type_category_id('MRI Variables')
-            self.param_type_db_obj.insert_into_parameter_type_category_rel(category_id, param_type_id)
+            self.param_type_db_obj.insert_into_parameter_type_category_rel(
+                category_id, param_type_id, ignore_duplicates=True
+            )
 
         return param_type_id
 
@@ -882,7 +840,7 @@ class Imaging:
         """
 
         # get list files from a given tarchive ID
-        results = self.files_db_obj.get_files_inserted_for_tarchive_id(tarchive_id)
+        results = self.files_db_obj.iter_files_inserted_for_tarchive_id(tarchive_id, ('File',))
 
         files_list = []
         for entry in results:
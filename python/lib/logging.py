@@ -1,10 +1,17 @@
 import sys
+import time
 from datetime import datetime
 from typing import Never
 
 from lib.db.models.notification_spool import DbNotificationSpool
 from lib.env import Env
 
+# Number of pending notifications that triggers a commit to the database.
+NOTIFICATION_FLUSH_SIZE = 100
+
+# Number of seconds after which the pending notifications are committed to the database.
+NOTIFICATION_FLUSH_INTERVAL = 5.0
+
 
 def log(env: Env, message: str):
     """
@@ -57,22 +64,58 @@ def log_error_exit(env: Env, message: str, exit_code: int = -1) -> Never:
 
     log_error(env, message)
     env.run_cleanups()
+    flush_logs(env)
     sys.exit(exit_code)
 
 
 def write_to_log_file(env: Env, message: str):
     """
-    Write a message to the log file of the environment.
+    Write a message to the log file of the environment. The log file is opened on the first write
+    and kept open afterwards. It is line buffered so that each message reaches the file as soon as
+    it is logged, in the same order as the messages of the subprocesses that share this log file.
+    """
+
+    if env.log_file_handle is None:
+        env.log_file_handle = open(env.log_file, 'a', buffering=1)
+
+    env.log_file_handle.write(f"{message}\n")
+
+
+def flush_logs(env: Env):
+    """
+    Commit the pending notifications to the database and close the log file of the environment.
+    This function is called before the program exits.
     """
 
-    with open(env.log_file, 'a') as file:
-        file.write(f"{message}\n")
+    flush_notifications(env)
+
+    if env.log_file_handle is not None:
+        env.log_file_handle.close()
+        env.log_file_handle = None
+
+
+def flush_notifications(env: Env):
+    """
+    Commit the pending notifications of the environment to the database in a single transaction,
+    in the order in which they were logged.
+    """
+
+    if env.notifier is None:
+        return
+
+    if env.notifier.pending_notifications != []:
+        env.notifier.db.add_all(env.notifier.pending_notifications)
+        env.notifier.db.commit()
+        env.notifier.pending_notifications.clear()
+
+    env.notifier.last_flush_time = time.monotonic()
 
 
 def register_notification(env: Env, message: str, is_error: bool, is_verbose: bool):
     """
     Log a message in the database notifications if the notification information of the environment
-    have been initialized.
+    have been initialized. The notifications are committed to the database in batches, except for
+    the error notifications, which are committed immediately along with the pending notifications.
     """
 
     if env.notifier is None:
@@ -90,5 +133,11 @@ def register_notification(env: Env, message: str, is_error: bool, is_verbose: bo
         active       = True,
     )
 
-    env.notifier.db.add(notification)
-    env.notifier.db.commit()
+    env.notifier.pending_notifications.append(notification)
+
+    if (
+        is_error
+        or len(env.notifier.pending_notifications) >= NOTIFICATION_FLUSH_SIZE
+        or time.monotonic() - env.notifier.last_flush_time >= NOTIFICATION_FLUSH_INTERVAL
+    ):
+        flush_notifications(env)
@@ -1,3 +1,4 @@
+import atexit
 import os
 import sys
 from typing import Any, cast
@@ -6,10 +7,10 @@ from sqlalchemy.orm import Session
 
 import lib.exitcode
 from lib.config_file import DatabaseConfig
-from lib.db.connect import get_database_engine
+from lib.db.connect import get_shared_database_engine
 from lib.db.queries.config import try_get_config_with_setting_name
 from lib.env import Env
-from lib.logging import log_verbose, write_to_log_file
+from lib.logging import flush_logs, log_verbose, write_to_log_file
 from lib.lorisgetopt import LorisGetOpt
 
 
@@ -50,7 +51,7 @@ def make_env(
             '  (password hidden)'
         )
 
-    engine = get_database_engine(db_config)
+    engine = get_shared_database_engine(db_config)
     db = Session(engine)
 
     # Create the log file
@@ -77,6 +78,9 @@ def make_env(
         [],
     )
 
+    # Commit the buffered notifications and close the log file when the program exits.
+    atexit.register(flush_logs, env)
+
     log_file_header = get_log_file_header(env, script_options)
     write_to_log_file(env, log_file_header)
 
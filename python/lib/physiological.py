@@ -1,13 +1,16 @@
 """This class performs database queries for BIDS physiological dataset (EEG, MEG...)"""
 
+import itertools
 import os
 import re
-import subprocess
 import sys
 from dataclasses import dataclass
 from functools import reduce
 from pathlib import Path
 
+from loris_eeg_chunker.scripts.edf_to_chunks import write_edf_chunk_directory
+from loris_eeg_chunker.scripts.eeglab_to_chunks import write_eeglab_chunk_directory
+
 import lib.exitcode
 from lib.database_lib.bids_event_mapping import BidsEventMapping
 from lib.database_lib.config import Config
@@ -22,6 +25,15 @@ from lib.database_lib.physiological_task_event_opt import PhysiologicalTaskEvent
 from lib.database_lib.point_3d import Point3DDB
 from lib.point_3d import Point3D
 
+# LORIS-recognized events.tsv columns, by their lowercase name without underscores
+RECOGNIZED_EVENT_FIELDS = {
+    field.lower(): field for field in (
+        'Onset', 'Duration', 'TrialType',
+        'ResponseTime', 'EventCode',
+        'EventSample', 'EventType'
+    )
+}
+
 
 class Physiological:
     """
@@ -67,6 +79,9 @@ class Physiological:
         self.verbose = verbose
         self.config_db_obj = Config(self.db, self.verbose)
 
+        # EEGChunksPath config setting, fetched on the first chunking
+        self.chunk_root_dir_config = None
+
         self.physiological_event_file_obj                   = PhysiologicalEventFile(self.db, self.verbose)
         self.physiological_task_event                       = PhysiologicalTaskEvent(self.db, self.verbose)
         self.physiological_task_event_opt                   = PhysiologicalTaskEventOpt(self.db, self.verbose)
@@ -212,39 +227,42 @@ class Physiological:
          :rtype: int
         """
 
-        results = self.db.pselect(
-            query="SELECT ParameterTypeID "
-                  "FROM parameter_type "
-                  "WHERE Name = %s "
-                  "AND SourceFrom='physiological_parameter_file'",
-            args=(parameter_name,)
-        )
+        query = "SELECT ParameterTypeID " \
+                "FROM parameter_type " \
+                "WHERE Name = %s " \
+                "AND SourceFrom='physiological_parameter_file'"
 
+        results = self.db.pselect(query=query, args=(parameter_name,))
         if results:
             # if results, grep the parameter_type_id
-            parameter_type_id = results[0]['ParameterTypeID']
-        else:
-            # if no results, create an entry in parameter_type
-            col_names = [
-                'Name', 'Type', 'Description', 'SourceFrom', 'Queryable'
-            ]
-            parameter_desc = parameter_name + " magically created by lib.physiological python class"
-            source_from    = 'physiological_parameter_file'
-            values = [
-                parameter_name, 'text', parameter_desc, source_from, 0
-            ]
-            parameter_type_id = self.parameter_type_obj.insert_parameter_type(
-                dict(zip(col_names, values))
-            )
+            return results[0]['ParameterTypeID']
 
-            # link the parameter_type_id to a parameter type category
-            category_id = self.parameter_type_obj.get_parameter_type_category_id(
-                'Electrophysiology Variables'
-            )
-            self.parameter_type_obj.insert_into_parameter_type_category_rel(
-                category_id,
-                parameter_type_id
-            )
+        # if no results, create an entry in parameter_type. The same entry may be
+        # created concurrently by another import (of another subject for instance),
+        # so duplicates are ignored and the parameter type is grepped again
+        col_names = [
+            'Name', 'Type', 'Description', 'SourceFrom', 'Queryable'
+        ]
+        parameter_desc = parameter_name + " magically created by lib.physiological python class"
+        source_from    = 'physiological_parameter_file'
+        values = [
+            parameter_name, 'text', parameter_desc, source_from, 0
+        ]
+        self.parameter_type_obj.insert_parameter_type(
+            dict(zip(col_names, values)),
+            ignore_duplicates=True
+        )
+        parameter_type_id = self.db.pselect(query=query, args=(parameter_name,))[0]['ParameterTypeID']
+
+        # link the parameter_type_id to a parameter type category
+        category_id = self.parameter_type_obj.get_parameter_type_category_id(
+            'Electrophysiology Variables'
+        )
+        self.parameter_type_obj.insert_into_parameter_type_category_rel(
+            category_id,
+            parameter_type_id,
+            ignore_duplicates=True
+        )
 
         return parameter_type_id
 
@@ -345,59 +363,79 @@ class Physiological:
             'Impedance',
             'FilePath'
         )
-        electrode_ids = []
-        optional_fields = ('type', 'material', 'impedance')
-        for row in electrode_data:
-            for field in optional_fields:
-                if field not in row.keys():
-                    continue
-
-                if field == 'type':
-                    row['type_id'] = self.db.grep_id_from_lookup_table(
-                        id_field_name       = 'PhysiologicalElectrodeTypeID',
-                        table_name          = 'physiological_electrode_type',
-                        where_field_name    = 'ElectrodeType',
-                        where_value         = row['type'],
-                        insert_if_not_found = True
-                    )
-                if field == 'material':
-                    row['material_id'] = self.db.grep_id_from_lookup_table(
-                        id_field_name       = 'PhysiologicalElectrodeMaterialID',
-                        table_name          = 'physiological_electrode_material',
-                        where_field_name    = 'ElectrodeMaterial',
-                        where_value         = row['material'],
-                        insert_if_not_found = True
-                    )
 
-            # map the X, Y and Z 'n/a' values to NULL
-            x_value = None if row['x'] == 'n/a' else row['x']
-            y_value = None if row['y'] == 'n/a' else row['y']
-            z_value = None if row['z'] == 'n/a' else row['z']
-            p = Point3D(None, x_value, y_value, z_value)
-            point = self.point_3d_db.grep_or_insert_point(p)
+        with self.db.transaction():
+            # the electrode types and materials are looked up once per distinct value
+            type_ids = {
+                electrode_type: self.db.grep_id_from_lookup_table(
+                    id_field_name       = 'PhysiologicalElectrodeTypeID',
+                    table_name          = 'physiological_electrode_type',
+                    where_field_name    = 'ElectrodeType',
+                    where_value         = electrode_type,
+                    insert_if_not_found = True
+                )
+                for electrode_type in dict.fromkeys(row['type'] for row in electrode_data if 'type' in row)
+            }
+            material_ids = {
+                electrode_material: self.db.grep_id_from_lookup_table(
+                    id_field_name       = 'PhysiologicalElectrodeMaterialID',
+                    table_name          = 'physiological_electrode_material',
+                    where_field_name    = 'ElectrodeMaterial',
+                    where_value         = electrode_material,
+                    insert_if_not_found = True
+                )
+                for electrode_material in dict.fromkeys(
+                    row['material'] for row in electrode_data if 'material' in row
+                )
+            }
 
-            # insert into physiological_electrode table
-            values_tuple = (
-                row.get('type_id'),
-                row.get('material_id'),
-                row['name'],
-                point.id,
-                row.get('impedance'),
-                electrode_file
-            )
+            # map the X, Y and Z 'n/a' values to NULL, and get or insert all the points at once
+            points = self.point_3d_db.grep_or_insert_points([
+                Point3D(None, *(None if row[axis] == 'n/a' else row[axis] for axis in ('x', 'y', 'z')))
+                for row in electrode_data
+            ])
+
+            # the electrode file can be shared by several physiological files, so
+            # only the electrodes inserted below are selected back
+            last_electrode_id = self.db.pselect(
+                query = "SELECT COALESCE(MAX(PhysiologicalElectrodeID), 0) AS LastElectrodeID "
+                        "FROM physiological_electrode "
+                        "WHERE FilePath = %s",
+                args  = (electrode_file,)
+            )[0]['LastElectrodeID']
 
-            inserted_electrode_id = self.db.insert(
+            # insert into physiological_electrode table
+            self.db.insert(
                 table_name   = 'physiological_electrode',
                 column_names = electrode_fields,
-                values       = values_tuple,
-                get_last_id  = True
+                values       = [
+                    (
+                        type_ids.get(row.get('type')),
+                        material_ids.get(row.get('material')),
+                        row['name'],
+                        point.id,
+                        row.get('impedance'),
+                        electrode_file
+                    )
+                    for row, point in zip(electrode_data, points)
+                ]
+            )
+
+            electrode_ids = [
+                electrode['PhysiologicalElectrodeID'] for electrode in self.db.pselect(
+                    query = "SELECT PhysiologicalElectrodeID "
+                            "FROM physiological_electrode "
+                            "WHERE FilePath = %s AND PhysiologicalElectrodeID > %s "
+                            "ORDER BY PhysiologicalElectrodeID",
+                    args  = (electrode_file, last_electrode_id)
+                )
+            ]
+
+            # insert blake2b hash of electrode file into physiological_parameter_file
+            self.insert_physio_parameter_file(
+                physiological_file_id, 'electrode_file_blake2b_hash', blake2
             )
-            electrode_ids.append(inserted_electrode_id)
 
-        # insert blake2b hash of electrode file into physiological_parameter_file
-        self.insert_physio_parameter_file(
-            physiological_file_id, 'electrode_file_blake2b_hash', blake2
-        )
         return electrode_ids
 
     def insert_channel_file(self, channel_data, channel_file,
@@ -594,10 +632,8 @@ class Physiological:
         # insert ref points if found
         if is_ok_ref_coords:
             # insert ref points
-            point_ids = {}
-            for rk, rv in ref_points.items():
-                p = self.point_3d_db.grep_or_insert_point(rv)
-                point_ids[rk] = p.id
+            points = self.point_3d_db.grep_or_insert_points(list(ref_points.values()))
+            point_ids = {rk: p.id for rk, p in zip(ref_points.keys(), points)}
             # insert ref point/coord system relations
             self.physiological_coord_system_db.insert_coord_system_point_3d_relation(coord_system_id, point_ids)
 
@@ -638,7 +674,7 @@ class Physiological:
         :param project_wide             : ProjectID if true, otherwise PhysiologicalFileID
          :type project_wide             : bool
         :param hed_union                : Union of HED schemas
-         :type hed_union                : any
+         :type hed_union                : HedSchemaIndex
 
         :return: event file id
          :rtype: int
@@ -753,7 +789,7 @@ class Physiological:
         Assembles physiological event HED tags.
 
         :param hed_union            : Union of HED schemas
-         :type hed_union            : any
+         :type hed_union            : HedSchemaIndex
 
         :param hed_string           : HED string
          :type hed_string           : str
@@ -761,6 +797,11 @@ class Physiological:
         :return                     : List of HEDTagID groups
          :rtype                     : list[TagGroupMember]
         """
+        # the tag groups of a HED string are built once, event files repeating the same few strings
+        cached_tag_groups = hed_union.tag_groups.get(hed_string)
+        if cached_tag_groups is not None:
+            return cached_tag_groups
+
         # TODO: VALIDATE HED TAGS VIA SERVICE
         # hedDict = utilities.assemble_hed_service(data_dir, event_tsv, event_json)
 
@@ -809,6 +850,7 @@ class Physiological:
         if len(tag_group) > 0:
             tag_groups.append(tag_group)
 
+        hed_union.tag_groups[hed_string] = tag_groups
         return tag_groups
 
     def insert_hed_tag_group(self, hed_tag_group, target_id, property_name=None, property_value=None,
@@ -872,21 +914,14 @@ class Physiological:
         :rtype: dict
        """
         standardized_row = {}
-        recognized_event_fields = [
-            'Onset', 'Duration', 'TrialType',
-            'ResponseTime', 'EventCode',
-            'EventSample', 'EventType'
-        ]
         for column_name in row:
             column_value = row[column_name]
             if column_value is None:
                 continue
 
             stripped_name = column_name.replace('_', '')
-            try:
-                field_index = list(map(lambda f: f.lower(), recognized_event_fields)).index(stripped_name)
-                column = recognized_event_fields[field_index]
-            except ValueError:
+            column = RECOGNIZED_EVENT_FIELDS.get(stripped_name)
+            if column is None:
                 column = 'EventValue' if (column_name == 'value' or column_name == 'event_value') else column_name
             standardized_row[column] = column_value
 
@@ -929,13 +964,51 @@ class Physiological:
             tag_groups
         )
 
+    @staticmethod
+    def get_event_tag_groups(row, hed_union, dataset_tag_dict, file_tag_dict, filtered_tag_groups):
+        """
+        Gets the HED tag groups of an events.tsv row that are not inherited
+        from events.json. The result only depends on the HED string of the row
+        and on its values of the columns with inherited tags, so it is computed
+        once for each of these combinations.
+
+        :param row                  : A row item from the events.tsv
+         :type row                  : dict
+        :param hed_union            : Union of HED schemas
+         :type hed_union            : HedSchemaIndex
+        :param dataset_tag_dict     : Dict of dataset-inherited HED tags
+         :type dataset_tag_dict     : dict
+        :param file_tag_dict        : Dict of subject-inherited HED tags
+         :type file_tag_dict        : dict
+        :param filtered_tag_groups  : Tag groups already computed for the rows
+                                      of the same events.tsv
+         :type filtered_tag_groups  : dict
+
+        :return: List of tag groups not inherited from events.json
+         :rtype: list[list[TagGroupMember]
+        """
+        standardized_row = Physiological.standardize_row_columns(row)
+        filter_key = (row['HED'], *(
+            (column_name, standardized_row[column_name])
+            for column_name in dataset_tag_dict if column_name in standardized_row
+        ))
+        tag_groups_without_inherited = filtered_tag_groups.get(filter_key)
+        if tag_groups_without_inherited is None:
+            tag_groups = Physiological.build_hed_tag_groups(hed_union, row['HED'])
+            tag_groups_without_inherited = list(Physiological.filter_inherited_tags(
+                row, tag_groups, dataset_tag_dict, file_tag_dict
+            ))
+            filtered_tag_groups[filter_key] = tag_groups_without_inherited
+
+        return tag_groups_without_inherited
+
     @staticmethod
     def get_hed_tag_id_from_name(tag_string, hed_union):
         hed_tag_id = None
         if tag_string is not None:
             leaf_node = tag_string.split('/')[-1]  # LIMITED SUPPORT FOR NOW - NO VALUES OR DEFS
             if len(tag_string) > 0:
-                hed_tag = next(filter(lambda tag: tag['Name'] == leaf_node, list(hed_union)), None)
+                hed_tag = hed_union.get_node(leaf_node)
                 if not hed_tag:
                     print(f'ERROR: UNRECOGNIZED HED TAG: {tag_string}')
                     raise
@@ -968,16 +1041,9 @@ class Physiological:
         :param file_tag_dict        : Dict of subject-inherited HED tags
          :type file_tag_dict        : dict
         :param hed_union            : Union of HED schemas
-         :type hed_union            : any
+         :type hed_union            : HedSchemaIndex
         """
 
-        event_file_id = self.physiological_event_file_obj.insert(
-            physiological_file_id,
-            project_id,
-            'tsv',
-            event_file
-        )
-
         event_fields = (
             'PhysiologicalFileID', 'Onset',     'Duration',   'TrialType',
             'ResponseTime',        'EventCode', 'EventValue', 'EventSample',
@@ -992,17 +1058,24 @@ class Physiological:
         # all listed fields
         known_fields = {*event_fields, *optional_fields}
 
-        for row in event_data:
+        # parse the whole file before inserting anything, the rows being
+        # referenced by their position until their task event IDs are known
+        event_rows = []
+        opt_rows = []
+        hed_tag_groups = []
+        # tag groups not inherited from events.json, for each HED string and inherited column values
+        filtered_tag_groups = {}
+        for row_index, row in enumerate(event_data):
             # nullify not present optional cols
             for field in optional_fields:
                 if field not in row.keys():
                     row[field] = None
 
             # has additional fields?
-            additional_fields = {}
             for field in row:
                 if field not in known_fields and row[field].lower() != 'nan':
-                    additional_fields[field] = row[field]
+                    # each additional fields is a new entry
+                    opt_rows.append((row_index, field, row[field]))
 
             # get values of present optional cols
             onset = 0
@@ -1047,44 +1120,89 @@ class Physiological:
             if row['trial_type']:
                 trial_type = str(row['trial_type'])
 
-            # insert one event and get its db id
-            last_task_id = self.physiological_task_event.insert(
-                physiological_file_id=physiological_file_id,
-                event_file_id=event_file_id,
-                onset=onset,
-                duration=duration,
-                event_code=row['event_code'],
-                event_value=event_value,
-                event_sample=sample,
-                event_type=row['event_type'],
-                trial_type=trial_type,
-                response_time=response_time,
-            )
+            event_rows.append((
+                onset, duration, row['event_code'], event_value, sample,
+                row['event_type'], trial_type, response_time
+            ))
 
             # Insert HED tags after filtering out inherited tags from events.json, so that they are not "duplicated"
             if row['HED'] and len(row['HED']) > 0 and row['HED'] != 'n/a':
-                tag_groups = Physiological.build_hed_tag_groups(hed_union, row['HED'])
-                tag_groups_without_inherited = Physiological.filter_inherited_tags(
-                    row, tag_groups, dataset_tag_dict, file_tag_dict
+                tag_groups_without_inherited = Physiological.get_event_tag_groups(
+                    row, hed_union, dataset_tag_dict, file_tag_dict, filtered_tag_groups
                 )
                 for tag_group in tag_groups_without_inherited:
-                    self.insert_hed_tag_group(tag_group, last_task_id)
-
-            # if needed, process additional and unlisted
-            # fields and send them in secondary table
-            if additional_fields:
-                # each additional fields is a new entry
-                for add_field, add_value in additional_fields.items():
-                    self.physiological_task_event_opt.insert(
-                        target_id=last_task_id,
-                        property_name=add_field,
-                        property_value=add_value,
-                        get_last_id=False
-                    )
-        # insert blake2b hash of task event file into physiological_parameter_file
-        self.insert_physio_parameter_file(
-            physiological_file_id, 'event_file_blake2b_hash', blake2
-        )
+                    hed_tag_groups.append((row_index, tag_group))
+
+        # insert all the events, then their additional fields and HED tags
+        # with one statement per table, in a single transaction
+        with self.db.transaction():
+            event_file_id = self.physiological_event_file_obj.insert(
+                physiological_file_id,
+                project_id,
+                'tsv',
+                event_file
+            )
+
+            task_event_ids = []
+            if event_rows:
+                self.physiological_task_event.insert_many([
+                    (physiological_file_id, event_file_id, *event_row) for event_row in event_rows
+                ])
+
+                # the event file is new, so its task events are the ones just inserted
+                task_event_ids = self.physiological_task_event.grep_ids_from_event_file_id(event_file_id)
+
+            if opt_rows:
+                self.physiological_task_event_opt.insert_many([
+                    (task_event_ids[row_index], property_name, property_value)
+                    for row_index, property_name, property_value in opt_rows
+                ])
+
+            if hed_tag_groups:
+                self.insert_hed_tag_groups(hed_tag_groups, task_event_ids, event_file_id)
+
+            # insert blake2b hash of task event file into physiological_parameter_file
+            self.insert_physio_parameter_file(
+                physiological_file_id, 'event_file_blake2b_hash', blake2
+            )
+
+    def insert_hed_tag_groups(self, hed_tag_groups, task_event_ids, event_file_id):
+        """
+        Inserts the HED tag groups of the task events of an event file in
+        physiological_task_event_hed_rel. All the tags are inserted with a
+        single statement, then each tag of a group is linked to the previous
+        tag of that group with a single update statement.
+
+        :param hed_tag_groups: list of (event row index, list of TagGroupMember)
+         :type hed_tag_groups: list
+        :param task_event_ids: PhysiologicalTaskEventID of each event row
+         :type task_event_ids: list
+        :param event_file_id : EventFileID of the task events
+         :type event_file_id : int
+        """
+
+        self.physiological_task_event_hed_rel.insert_many([
+            (
+                task_event_ids[row_index],
+                hed_tag.hed_tag_id,
+                hed_tag.tag_value,
+                hed_tag.has_pairing,
+                None,
+                hed_tag.additional_members,
+            )
+            for row_index, hed_tag_group in hed_tag_groups
+            for hed_tag in hed_tag_group
+        ])
+
+        # the rel IDs follow the insertion order, a tag being paired with the previous tag of its group
+        hed_rel_ids = iter(self.physiological_task_event_hed_rel.grep_ids_from_event_file_id(event_file_id))
+        pair_rel_ids = []
+        for _, hed_tag_group in hed_tag_groups:
+            group_rel_ids = [next(hed_rel_ids) for _ in hed_tag_group]
+            pair_rel_ids.extend(itertools.pairwise(group_rel_ids))
+
+        if pair_rel_ids:
+            self.physiological_task_event_hed_rel.update_pair_rel_ids(pair_rel_ids)
 
     def grep_archive_info_from_file_id(self, physiological_file_id):
         """
@@ -1218,49 +1336,133 @@ class Physiological:
 
         # No chunks found
         if not chunk_path:
-            script    = None
             file_path = self.grep_file_path_from_file_id(physio_file_id)
-
-            chunk_root_dir_config = self.config_db_obj.get_config("EEGChunksPath")
-            chunk_root_dir = chunk_root_dir_config
-            file_path_parts = Path(file_path).parts
-            if chunk_root_dir_config:
-                chunk_root_dir = chunk_root_dir_config
-            else:
-                chunk_root_dir = os.path.join(data_dir, file_path_parts[0])
-
-            chunk_root_dir = os.path.join(chunk_root_dir, f'{file_path_parts[1]}_chunks')
-
-            full_file_path = os.path.join(data_dir, file_path)
-
-            # determine which script to run based on the file type
             file_type = self.grep_file_type_from_file_id(physio_file_id)
-            match file_type:
-                case 'set':
-                    script = 'eeglab-to-chunks'
-                case 'edf':
-                    script = 'edf-to-chunks'
 
-            command = script + ' ' + full_file_path + ' --destination ' + chunk_root_dir
-
-            # chunk the electrophysiology dataset if a command was determined above
+            # chunk the electrophysiology dataset
             try:
-                subprocess.call(
-                    command,
-                    shell = True,
-                    stdout = open(os.devnull, 'wb')
+                chunk_path = create_chunk_directory(
+                    file_type,
+                    os.path.join(data_dir, file_path),
+                    self.get_chunk_root_dir(file_path, data_dir)
                 )
-            except subprocess.CalledProcessError as err:
-                print(f'ERROR: {script} execution failure. Error was:\n {err}')
-                sys.exit(lib.exitcode.CHUNK_CREATION_FAILURE)
-            except OSError:
-                print('ERROR: ' + script + ' not found')
-                sys.exit(lib.exitcode.CHUNK_CREATION_FAILURE)
-
-            chunk_path = os.path.join(chunk_root_dir, os.path.splitext(os.path.basename(file_path))[0] + '.chunks')
-            if os.path.isdir(chunk_path):
+            except Exception as err:
+                print(f'ERROR: chunking failure for {file_path}. Error was:\n {err}')
+                return
+
+            if chunk_path and os.path.isdir(chunk_path):
                 self.insert_physio_parameter_file(
                     physiological_file_id = physio_file_id,
                     parameter_name = 'electrophysiology_chunked_dataset_path',
                     value = os.path.relpath(chunk_path, data_dir)
                 )
+
+    def get_chunk_root_dir(self, file_path, data_dir):
+        """
+        Get the directory in which the chunks of an electrophysiology dataset
+        are created, which is the EEGChunksPath config setting (or the first
+        directory of the file path in the data directory if not set) followed
+        by a <subject>_chunks directory.
+
+        :param file_path: path of the dataset relative to the data directory
+         :type file_path: str
+        :param data_dir : LORIS data directory (/data/%PROJECT%/data)
+         :type data_dir : str
+
+        :return: directory in which the chunk directory of the dataset is created
+         :rtype: str
+        """
+
+        if self.chunk_root_dir_config is None:
+            self.chunk_root_dir_config = self.config_db_obj.get_config("EEGChunksPath") or ''
+
+        file_path_parts = Path(file_path).parts
+        if self.chunk_root_dir_config:
+            chunk_root_dir = self.chunk_root_dir_config
+        else:
+            chunk_root_dir = os.path.join(data_dir, file_path_parts[0])
+
+        return os.path.join(chunk_root_dir, f'{file_path_parts[1]}_chunks')
+
+    def get_unchunked_physio_files(self, smallest_id, largest_id):
+        """
+        Get, in a single query, the physiological files with a PhysiologicalFileID
+        between smallest_id and largest_id that can be chunked (EDF and EEGLAB
+        files) and do not have an electrophysiology_chunked_dataset_path yet.
+
+        :param smallest_id: smallest PhysiologicalFileID to select
+         :type smallest_id: int
+        :param largest_id : largest PhysiologicalFileID to select
+         :type largest_id : int
+
+        :return: list of dictionaries with the PhysiologicalFileID, FilePath,
+                 FileType and ProjectID of the files to chunk
+         :rtype: list
+        """
+
+        query = "SELECT pf.PhysiologicalFileID, pf.FilePath, pf.FileType, s.ProjectID " \
+                "FROM physiological_file pf " \
+                "JOIN session s ON (s.ID = pf.SessionID) " \
+                "WHERE pf.PhysiologicalFileID BETWEEN %s AND %s " \
+                "AND pf.FileType IN ('set', 'edf') " \
+                "AND NOT EXISTS (" \
+                "SELECT 1 FROM physiological_parameter_file ppf " \
+                "JOIN parameter_type pt USING (ParameterTypeID) " \
+                "WHERE ppf.PhysiologicalFileID = pf.PhysiologicalFileID " \
+                "AND pt.Name = 'electrophysiology_chunked_dataset_path'" \
+                ") " \
+                "ORDER BY pf.PhysiologicalFileID"
+
+        return self.db.pselect(query=query, args=(smallest_id, largest_id))
+
+    def insert_chunked_dataset_paths(self, chunked_files, data_dir):
+        """
+        Register the chunk directories of several physiological files in the
+        physiological_parameter_file table with a single insert statement.
+
+        :param chunked_files: list of (PhysiologicalFileID, ProjectID, chunk
+                              directory path) tuples
+         :type chunked_files: list
+        :param data_dir     : LORIS data directory (/data/%PROJECT%/data)
+         :type data_dir     : str
+        """
+
+        if not chunked_files:
+            return
+
+        parameter_type_id = self.get_parameter_type_id('electrophysiology_chunked_dataset_path')
+        self.physiological_physiological_parameter_file.insert_many([
+            (physio_file_id, project_id, parameter_type_id, os.path.relpath(chunk_path, data_dir))
+            for physio_file_id, project_id, chunk_path in chunked_files
+        ])
+
+
+def create_chunk_directory(file_type, file_path, chunk_root_dir):
+    """
+    Chunk an EDF or EEGLAB electrophysiology dataset for visualization with the
+    LORIS EEG chunker, in the current process.
+
+    :param file_type     : type of the dataset ('edf' or 'set')
+     :type file_type     : str
+    :param file_path     : full path of the dataset
+     :type file_path     : str
+    :param chunk_root_dir: directory in which the chunk directory is created
+     :type chunk_root_dir: str
+
+    :return: path of the chunk directory, or None if the file type cannot be chunked
+     :rtype: str
+    """
+
+    match file_type:
+        case 'set':
+            write_chunk_directory = write_eeglab_chunk_directory
+        case 'edf':
+            write_chunk_directory = write_edf_chunk_directory
+        case _:
+            return None
+
+    # the progress of every channel is not printed since the datasets may be
+    # chunked concurrently
+    write_chunk_directory(file_path, destination=chunk_root_dir, verbose=False)
+
+    return os.path.join(chunk_root_dir, os.path.splitext(os.path.basename(file_path))[0] + '.chunks')
@@ -0,0 +1,211 @@
+import gzip
+import hashlib
+import json
+import os
+import tarfile
+import uuid
+from collections.abc import Sequence
+from typing import Any, BinaryIO
+
+from lib.util.crypto import compute_file_blake2b_hash
+
+# Modification time of the members of the reproducible archives (the Unix epoch).
+REPRODUCIBLE_MTIME = 0
+
+
+class HashingWriter:
+    """
+    Binary file writer that computes the BLAKE2b hash of the bytes written to the underlying file.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.hash = hashlib.blake2b()
+        self.offset = 0
+
+    def write(self, data: bytes) -> int:
+        self.hash.update(data)
+        self.offset += len(data)
+        return self.file.write(data)
+
+    def tell(self) -> int:
+        return self.offset
+
+    def flush(self):
+        self.file.flush()
+
+
+class HashingReader:
+    """
+    Binary file reader that computes the BLAKE2b hash of the bytes read from the underlying file.
+    """
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        self.hash = hashlib.blake2b()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file.read(size)
+        self.hash.update(data)
+        return data
+
+
+def get_archive_manifest_path(archive_path: str) -> str:
+    """
+    Get the path of the manifest of an archive, which lists the BLAKE2b hash of the archive and
+    of each of its members.
+    """
+
+    return archive_path + '.manifest.json'
+
+
+def write_archive(file_paths: Sequence[str], archive_path: str, reproducible: bool = False) -> str:
+    """
+    Write a tar.gz archive containing the given files under their base name, along with its
+    manifest, and return the BLAKE2b hash of the archive. The hashes are computed while the
+    archive is written, so neither the archive nor its members are read again.
+
+    In reproducible mode, the members are sorted by name and their modification time, owner and
+    permissions are normalized, so that the same files always produce the same archive.
+    """
+
+    if reproducible:
+        file_paths = sorted(file_paths, key=os.path.basename)
+
+    members: list[dict[str, Any]] = []
+
+    # The archive is written to a temporary file that replaces the previous archive, if any,
+    # once complete. The temporary file is created with the default permissions of the process.
+    tmp_path = f'{archive_path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'xb') as archive_file:
+            writer = HashingWriter(archive_file)
+            # The gzip header contains no file name and, in reproducible mode, a fixed timestamp.
+            with gzip.GzipFile(
+                filename='',
+                mode='wb',
+                fileobj=writer,
+                mtime=REPRODUCIBLE_MTIME if reproducible else None,
+            ) as gzip_file, tarfile.open(fileobj=gzip_file, mode='w') as tar:
+                for file_path in file_paths:
+                    stat = os.stat(file_path)
+                    tar_info = tar.gettarinfo(file_path, arcname=os.path.basename(file_path))
+                    if reproducible:
+                        tar_info.mtime = REPRODUCIBLE_MTIME
+                        tar_info.uid   = tar_info.gid   = 0
+                        tar_info.uname = tar_info.gname = ''
+                        tar_info.mode  = 0o644
+
+                    with open(file_path, 'rb') as file:
+                        reader = HashingReader(file)
+                        tar.addfile(tar_info, reader)
+
+                    members.append({
+                        'name':     tar_info.name,
+                        'blake2b':  reader.hash.hexdigest(),
+                        'size':     stat.st_size,
+                        'mtime_ns': stat.st_mtime_ns,
+                    })
+
+        os.replace(tmp_path, archive_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    archive_hash = writer.hash.hexdigest()
+    archive_stat = os.stat(archive_path)
+    manifest = {
+        'blake2b':  archive_hash,
+        'size':     archive_stat.st_size,
+        'mtime_ns': archive_stat.st_mtime_ns,
+        'members':  members,
+    }
+
+    write_archive_manifest(archive_path, manifest)
+    return archive_hash
+
+
+def write_archive_manifest(archive_path: str, manifest: dict[str, Any]):
+    """
+    Write the manifest of an archive, replacing its previous manifest, if any.
+    """
+
+    tmp_path = f'{get_archive_manifest_path(archive_path)}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'x') as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+
+        os.replace(tmp_path, get_archive_manifest_path(archive_path))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_archive_manifest(archive_path: str) -> dict[str, Any] | None:
+    """
+    Read the manifest of an archive, or return `None` if the archive has no manifest or was
+    modified since the manifest was written.
+    """
+
+    try:
+        with open(get_archive_manifest_path(archive_path)) as manifest_file:
+            manifest: dict[str, Any] = json.load(manifest_file)
+        archive_stat = os.stat(archive_path)
+    except (OSError, ValueError):
+        return None
+
+    if (archive_stat.st_size, archive_stat.st_mtime_ns) != (manifest['size'], manifest['mtime_ns']):
+        return None
+
+    return manifest
+
+
+def get_archive_hash(archive_path: str) -> str:
+    """
+    Get the BLAKE2b hash of an archive, from its manifest if it is up to date, or by reading the
+    archive otherwise.
+    """
+
+    manifest = read_archive_manifest(archive_path)
+    if manifest is not None:
+        return manifest['blake2b']
+
+    return compute_file_blake2b_hash(archive_path)
+
+
+def get_unchanged_archive_hash(file_paths: Sequence[str], archive_path: str) -> str | None:
+    """
+    Check whether an archive already contains the given files using its manifest, and return the
+    BLAKE2b hash of the archive if it does, or `None` otherwise. The files whose size and
+    modification time match their manifest entry are not read again, and the entries of the files
+    that were touched but not changed are updated so that these files are not read again either.
+    """
+
+    manifest = read_archive_manifest(archive_path)
+    if manifest is None:
+        return None
+
+    members: dict[str, dict[str, Any]] = {member['name']: member for member in manifest['members']}
+    if sorted(members) != sorted(os.path.basename(file_path) for file_path in file_paths):
+        return None
+
+    touched = False
+    for file_path in file_paths:
+        member = members[os.path.basename(file_path)]
+        stat = os.stat(file_path)
+        if (stat.st_size, stat.st_mtime_ns) == (member['size'], member['mtime_ns']):
+            continue
+
+        if compute_file_blake2b_hash(file_path) != member['blake2b']:
+            return None
+
+        member['size']     = stat.st_size
+        member['mtime_ns'] = stat.st_mtime_ns
+        touched = True
+
+    if touched:
+        write_archive_manifest(archive_path, manifest)
+
+    return manifest['blake2b']
@@ -0,0 +1,341 @@
+import io
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO
+
+import h5py
+import numpy as np
+
+# MAT-file version 5 data types.
+MI_INT8       = 1
+MI_UINT8      = 2
+MI_UINT16     = 4
+MI_INT32      = 5
+MI_MATRIX     = 14
+MI_COMPRESSED = 15
+MI_UTF8       = 16
+MI_UTF16      = 17
+
+# MAT-file version 5 array classes.
+MX_STRUCT_CLASS = 2
+MX_CHAR_CLASS   = 4
+
+# Number of bytes of a character for each data type that can store a character array (only ASCII
+# text is written, which has one byte per character in UTF-8).
+CHAR_WIDTHS = {MI_INT8: 1, MI_UINT8: 1, MI_UTF8: 1, MI_UINT16: 2, MI_UTF16: 2}
+
+
+@dataclass
+class MatElement:
+    """
+    Data element of a MAT-file version 5, whose data is either stored after its 8 bytes tag, or
+    in the last 4 bytes of its tag for the small data elements.
+    """
+
+    type: int
+    offset: int
+    data_offset: int
+    size: int
+
+    @property
+    def end(self) -> int:
+        """
+        Offset of the element following this element, data elements being aligned on 8 bytes.
+        """
+
+        if self.is_small:
+            return self.offset + 8
+
+        return self.data_offset + self.size + -self.size % 8
+
+    @property
+    def is_small(self) -> bool:
+        return self.data_offset == self.offset + 4
+
+
+@dataclass
+class MatMatrix:
+    """
+    Header of a matrix data element of a MAT-file version 5.
+    """
+
+    element: MatElement
+    array_class: int
+    dims_element: MatElement
+    dims: tuple[int, ...]
+    name: str
+    # Offset of the data of the matrix, which follows the header.
+    content_offset: int
+
+
+def patch_mat_file_strings(file_path: str, values: dict[str, str]) -> bool:
+    """
+    Replace in place the character arrays of a MAT-file with the given values, without reading or
+    writing the rest of the file. The values are indexed by variable name, or by
+    `<struct>.<field>` for the fields of a scalar structure variable. The variables that are not
+    in the file are ignored.
+
+    Return `True` if the file was patched, or `False` if a value cannot be written in place, in
+    which case the file is left untouched and must be rewritten entirely.
+    """
+
+    with open(file_path, 'rb') as file:
+        header = file.read(128)
+
+    match header[126:128]:
+        case b'IM':
+            endian = '<'
+        case b'MI':
+            endian = '>'
+        case _:
+            return False
+
+    match struct.unpack(f'{endian}H', header[124:126])[0]:
+        case 0x0100:
+            return patch_mat5_file_strings(file_path, values, endian)
+        case 0x0200:
+            return patch_hdf5_mat_file_strings(file_path, values)
+        case _:
+            return False
+
+
+def patch_mat5_file_strings(file_path: str, values: dict[str, str], endian: str) -> bool:
+    """
+    Replace in place the character arrays of a MAT-file version 5. The new characters must fit in
+    the space used by the old characters, which is aligned on 8 bytes.
+    """
+
+    patches: list[tuple[int, bytes]] = []
+    with open(file_path, 'r+b') as file:
+        file_size = file.seek(0, io.SEEK_END)
+        try:
+            offset = 128
+            while offset < file_size:
+                element = read_mat_element(file, offset, endian)
+                # The top-level data elements are not aligned.
+                offset = element.data_offset + element.size
+                if element.type == MI_COMPRESSED:
+                    # The compressed variables cannot be patched in place.
+                    name = read_compressed_mat_matrix_name(file, element, endian)
+                    if any(key.split('.')[0] == name for key in values):
+                        return False
+
+                    continue
+
+                if element.type != MI_MATRIX or element.size == 0:
+                    continue
+
+                matrix = read_mat_matrix(file, element, endian)
+                if matrix.name in values:
+                    char_patches = get_mat_char_patches(file, matrix, values[matrix.name], endian)
+                    if char_patches is None:
+                        return False
+
+                    patches += char_patches
+
+                field_values = {
+                    key.removeprefix(matrix.name + '.'): value
+                    for key, value in values.items() if key.startswith(matrix.name + '.')
+                }
+                if field_values:
+                    field_patches = get_mat_struct_patches(file, matrix, field_values, endian)
+                    if field_patches is None:
+                        return False
+
+                    patches += field_patches
+        except (struct.error, ValueError, zlib.error):
+            return False
+
+        # Only write the bytes that changed.
+        for patch_offset, data in patches:
+            file.seek(patch_offset)
+            if file.read(len(data)) != data:
+                file.seek(patch_offset)
+                file.write(data)
+
+    return True
+
+
+def get_mat_struct_patches(
+    file: BinaryIO,
+    matrix: MatMatrix,
+    values: dict[str, str],
+    endian: str,
+) -> list[tuple[int, bytes]] | None:
+    """
+    Get the patches that replace the character array fields of a scalar structure of a MAT-file
+    version 5, or `None` if a field cannot be patched.
+    """
+
+    if matrix.array_class != MX_STRUCT_CLASS or matrix.dims != (1, 1):
+        return None
+
+    field_name_length_element = read_mat_element(file, matrix.content_offset, endian)
+    field_names_element = read_mat_element(file, field_name_length_element.end, endian)
+    file.seek(field_name_length_element.data_offset)
+    field_name_length: int = struct.unpack(f'{endian}i', file.read(4))[0]
+    file.seek(field_names_element.data_offset)
+    field_names_data = file.read(field_names_element.size)
+    field_names = [
+        field_names_data[i:i + field_name_length].rstrip(b'\0').decode()
+        for i in range(0, len(field_names_data), field_name_length)
+    ]
+
+    patches: list[tuple[int, bytes]] = []
+    offset = field_names_element.end
+    for field_name in field_names:
+        element = read_mat_element(file, offset, endian)
+        offset = element.end
+        if field_name not in values:
+            continue
+
+        if element.type != MI_MATRIX or element.size == 0:
+            return None
+
+        field_patches = get_mat_char_patches(file, read_mat_matrix(file, element, endian), values[field_name], endian)
+        if field_patches is None:
+            return None
+
+        patches += field_patches
+
+    return patches
+
+
+def get_mat_char_patches(
+    file: BinaryIO,
+    matrix: MatMatrix,
+    value: str,
+    endian: str,
+) -> list[tuple[int, bytes]] | None:
+    """
+    Get the patches that replace the dimensions and characters of a character array of a MAT-file
+    version 5, or `None` if the new characters do not fit in the space of the old characters.
+    """
+
+    if matrix.array_class != MX_CHAR_CLASS or len(matrix.dims) != 2 or min(matrix.dims) > 1 \
+            or matrix.dims_element.size != 8 or not value or not value.isascii():
+        return None
+
+    data_element = read_mat_element(file, matrix.content_offset, endian)
+    if data_element.type not in CHAR_WIDTHS:
+        return None
+
+    if CHAR_WIDTHS[data_element.type] == 1:
+        data = value.encode('ascii')
+    else:
+        data = struct.pack(f'{endian}{len(value)}H', *map(ord, value))
+
+    # The characters are the last element of the matrix, the space available for them is the
+    # remainder of the matrix.
+    space = matrix.element.data_offset + matrix.element.size - data_element.offset
+    if 8 + len(data) + -len(data) % 8 == space:
+        data = struct.pack(f'{endian}II', data_element.type, len(data)) + data + bytes(-len(data) % 8)
+    elif space == 8 and len(data) <= 4:
+        data = struct.pack(f'{endian}I', len(data) << 16 | data_element.type) + data.ljust(4, b'\0')
+    else:
+        return None
+
+    # Keep the orientation of column character arrays.
+    dims = (len(value), 1) if matrix.dims[0] > 1 and matrix.dims[1] == 1 else (1, len(value))
+    return [
+        (matrix.dims_element.data_offset, struct.pack(f'{endian}2i', *dims)),
+        (data_element.offset, data),
+    ]
+
+
+def read_mat_element(file: BinaryIO, offset: int, endian: str) -> MatElement:
+    """
+    Read the tag of a data element of a MAT-file version 5.
+    """
+
+    file.seek(offset)
+    type, size = struct.unpack(f'{endian}2I', file.read(8))
+    # The tag of a small data element has its size in its upper 2 bytes.
+    if type >> 16:
+        return MatElement(type & 0xffff, offset, offset + 4, type >> 16)
+
+    return MatElement(type, offset, offset + 8, size)
+
+
+def read_mat_matrix(file: BinaryIO, element: MatElement, endian: str) -> MatMatrix:
+    """
+    Read the header of a matrix data element of a MAT-file version 5, which contains its array
+    flags, dimensions and name.
+    """
+
+    flags_element = read_mat_element(file, element.data_offset, endian)
+    dims_element  = read_mat_element(file, flags_element.end, endian)
+    name_element  = read_mat_element(file, dims_element.end, endian)
+    if name_element.end > element.data_offset + element.size:
+        raise ValueError('Invalid matrix header.')
+
+    file.seek(flags_element.data_offset)
+    flags: int = struct.unpack(f'{endian}I', file.read(4))[0]
+    file.seek(dims_element.data_offset)
+    dims: tuple[int, ...] = struct.unpack(f'{endian}{dims_element.size // 4}i', file.read(dims_element.size))
+    file.seek(name_element.data_offset)
+    name = file.read(name_element.size).decode()
+
+    return MatMatrix(element, flags & 0xff, dims_element, dims, name, name_element.end)
+
+
+def read_compressed_mat_matrix_name(file: BinaryIO, element: MatElement, endian: str) -> str:
+    """
+    Read the name of a compressed matrix of a MAT-file version 5, only decompressing the beginning
+    of the matrix.
+    """
+
+    file.seek(element.data_offset)
+    header = zlib.decompressobj().decompress(file.read(min(element.size, 1024)), 1024)
+    header_file = io.BytesIO(header)
+    matrix_element = read_mat_element(header_file, 0, endian)
+    # The header is truncated, so the size of the matrix is set to the size of the header.
+    matrix_element.size = min(matrix_element.size, len(header) - matrix_element.data_offset)
+    return read_mat_matrix(header_file, matrix_element, endian).name
+
+
+def patch_hdf5_mat_file_strings(file_path: str, values: dict[str, str]) -> bool:
+    """
+    Replace in place the character arrays of a MAT-file version 7.3, which is an HDF5 file. A
+    character array whose length changes is replaced by a new dataset.
+    """
+
+    try:
+        file = h5py.File(file_path, 'r+')
+    except OSError:
+        # The header claims a version 7.3 but the file is not an HDF5 file.
+        return False
+
+    with file:
+        datasets: list[tuple[str, h5py.Dataset, str]] = []
+        for key, value in values.items():
+            path = key.replace('.', '/')
+            if path not in file:
+                continue
+
+            dataset = file[path]
+            if not isinstance(dataset, h5py.Dataset) or not value or not value.isascii():
+                return False
+
+            matlab_class = dataset.attrs.get('MATLAB_class')  # type: ignore
+            if matlab_class != b'char' or 'MATLAB_empty' in dataset.attrs:
+                return False
+
+            datasets.append((path, dataset, value))
+
+        for path, dataset, value in datasets:
+            # MATLAB stores the characters as a column of UTF-16 code units.
+            data = np.array([[ord(char)] for char in value], dtype=np.uint16)
+            if dataset.shape == data.shape:  # type: ignore
+                if not np.array_equal(dataset[()], data):  # type: ignore
+                    dataset[...] = data
+
+                continue
+
+            attrs = dict(dataset.attrs)  # type: ignore
+            del file[path]
+            dataset = file.create_dataset(path, data=data)  # type: ignore
+            dataset.attrs.update(attrs)  # type: ignore
+
+    return True
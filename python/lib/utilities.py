@@ -7,7 +7,6 @@ import os
 import re
 import shutil
 import sys
-import tarfile
 import tempfile
 from datetime import datetime
 
@@ -18,7 +17,9 @@ import scipy.io
 from typing_extensions import deprecated
 
 import lib.exitcode
+import lib.util.archive
 import lib.util.crypto
+import lib.util.matlab
 
 
 def read_tsv_file(tsv_file):
@@ -140,23 +141,35 @@ def create_dir(dir_name, verbose):
     return dir_name
 
 
-def create_archive(files_to_archive, archive_path):
+def create_archive(files_to_archive, archive_path, reproducible=False):
     """
-    Creates an archive with the files listed in the files_to_archive tuple.
+    Creates an archive with the files listed in the files_to_archive tuple, along
+    with a manifest of the hashes of the archive and its members, and returns the
+    blake2b hash of the archive. If the archive already exists and its manifest
+    shows that it contains the same files, it is neither rebuilt nor read again.
 
     :param files_to_archive: list of files to include in the archive
      :type files_to_archive: tuple
     :param archive_path: full path of archive
      :type archive_path: str
+    :param reproducible: whether to normalize the archive so that the same files
+                         always produce the same archive
+     :type reproducible: bool
+
+    :return: blake2b hash of the archive
+     :rtype: str
     """
 
-    # if the archive does not already exists, create it
-    if not os.path.isfile(archive_path):
-        tar = tarfile.open(archive_path, "w:gz")
-        for file in files_to_archive:
-            filename = os.path.basename(file)
-            tar.add(file, arcname=filename, recursive=False)
-        tar.close()
+    if os.path.isfile(archive_path):
+        blake2 = lib.util.archive.get_unchanged_archive_hash(files_to_archive, archive_path)
+        if blake2:
+            return blake2
+
+        # archives created without a manifest are left as they are
+        if not os.path.isfile(lib.util.archive.get_archive_manifest_path(archive_path)):
+            return lib.util.crypto.compute_file_blake2b_hash(archive_path)
+
+    return lib.util.archive.write_archive(files_to_archive, archive_path, reproducible)
 
 
 def update_set_file_path_info(set_file, with_fdt_file):
@@ -176,6 +189,21 @@ def update_set_file_path_info(set_file, with_fdt_file):
     set_file_name = numpy.array(basename + ".set")
     fdt_file_name = numpy.array(basename + ".fdt")
 
+    # patch the EEG paths in place if they fit in the .set file, which avoids
+    # reading and writing the whole file when it contains the EEG data
+    path_info = {
+        'filename'    : basename + ".set",
+        'setname'     : basename,
+        'EEG.filename': basename + ".set",
+    }
+    if with_fdt_file:
+        path_info['datfile']     = basename + ".fdt"
+        path_info['EEG.data']    = basename + ".fdt"
+        path_info['EEG.datfile'] = basename + ".fdt"
+
+    if lib.util.matlab.patch_mat_file_strings(set_file, path_info):
+        return True
+
     try:
         # read the .set EEG file using scipy
         dataset = scipy.io.loadmat(set_file)
@@ -187,6 +215,8 @@ def update_set_file_path_info(set_file, with_fdt_file):
             dataset['setname'] = numpy.array(basename)
         if 'EEG' in dataset.keys():
             dataset['EEG'][0][0][1] = set_file_name
+        if with_fdt_file and 'datfile' in dataset.keys():
+            dataset['datfile'] = fdt_file_name
         if with_fdt_file and 'EEG' in dataset.keys():
             dataset['EEG'][0][0][15] = fdt_file_name
             dataset['EEG'][0][0][40] = fdt_file_name
@@ -0,0 +1,272 @@
+"""This class collects the protocol violations of a DICOM archive and registers them in bulk"""
+
+import datetime
+
+from lib.database_lib.mri_candidate_errors import MriCandidateErrors
+from lib.database_lib.mri_protocol_violated_scans import MriProtocolViolatedScans
+from lib.database_lib.mri_violations_log import MriViolationsLog
+
+# Fields used to determine whether two rows describe the same violation, for each violation table.
+CANDIDATE_ERROR_KEY_FIELDS = ('SeriesUID', 'EchoTime', 'PatientName', 'Reason')
+PROTOCOL_VIOLATED_SCAN_KEY_FIELDS = ('SeriesUID', 'PhaseEncodingDirection', 'TE_range', 'EchoNumber')
+VIOLATIONS_LOG_KEY_FIELDS = (
+    'SeriesUID', 'PhaseEncodingDirection', 'EchoNumber', 'MriScanTypeID', 'EchoTime',
+    'Severity', 'Header', 'Value', 'ValidRange', 'ValidRegex',
+)
+
+
+class ViolationRegistrar:
+    """
+    This class collects the violations found for the files of a DICOM archive (candidate errors,
+    protocol violated scans and violations log), removes the duplicates in memory and writes them
+    in the database with one bulk insert per table.
+
+    The violations already registered in the database for the archive are fetched once per table
+    (on the first violation added to that table) instead of once per violation.
+
+    :Example:
+
+        from lib.violation_registrar import ViolationRegistrar
+        from lib.database import Database
+
+        # database connection
+        db = Database(config.mysql, verbose)
+        db.connect()
+
+        violation_registrar = ViolationRegistrar(db, verbose, tarchive_id)
+
+        violation_registrar.add_violations_log(info_to_insert_dict)
+        ...
+
+        # write all the pending violations in the database
+        violation_registrar.flush()
+    """
+
+    def __init__(self, db, verbose, tarchive_id):
+        """
+        Constructor method for the ViolationRegistrar class.
+
+        :param db         : Database class object
+         :type db         : object
+        :param verbose    : whether to be verbose
+         :type verbose    : bool
+        :param tarchive_id: TarchiveID of the archive the violations are registered for
+         :type tarchive_id: int
+        """
+
+        self.db = db
+        self.verbose = verbose
+        self.tarchive_id = tarchive_id
+
+        self.mri_cand_errors_db_obj = MriCandidateErrors(db, verbose)
+        self.mri_prot_viol_scan_db_obj = MriProtocolViolatedScans(db, verbose)
+        self.mri_viol_log_db_obj = MriViolationsLog(db, verbose)
+
+        # keys of the violations already present in the database or pending insertion, per table
+        # (None until the existing rows of the table have been fetched)
+        self.candidate_error_keys = None
+        self.protocol_violated_scan_keys = None
+        self.violations_log_keys = None
+
+        # rows waiting to be inserted, per table
+        self.pending_candidate_errors = []
+        self.pending_protocol_violated_scans = []
+        self.pending_violations_logs = []
+
+    @staticmethod
+    def get_violation_key(row, key_fields):
+        """
+        Get the hashable key identifying a violation row. Values are compared as strings to match
+        the values read from the database with the values obtained from the scan parameters.
+
+        :param row: dictionary with the violation table fields as keys
+         :type row: dict
+        :param key_fields: fields used to identify the violation
+         :type key_fields: tuple
+
+        :return: key of the violation
+         :rtype: tuple
+        """
+
+        return tuple(None if row.get(field) is None else str(row[field]) for field in key_fields)
+
+    def add_candidate_error(self, patient_name, scan_param, file_rel_path, reason):
+        """
+        Add a candidate error to be inserted into the MRICandidateErrors table, unless the same
+        error was already registered for the archive.
+
+        :param patient_name: PatientName associated to the file to insert
+         :type patient_name: str
+        :param scan_param: parameters of the image to insert
+         :type scan_param: dict
+        :param file_rel_path: relative path to the file in trashbin
+         :type file_rel_path: str
+        :param reason: reason for the candidate mismatch error
+         :type reason: str
+
+        :return: whether the error was added (False if it is a duplicate)
+         :rtype: bool
+        """
+
+        if self.candidate_error_keys is None:
+            existing_rows = self.mri_cand_errors_db_obj.get_candidate_errors_for_tarchive_id(self.tarchive_id)
+            self.candidate_error_keys = {
+                self.get_violation_key(row, CANDIDATE_ERROR_KEY_FIELDS) for row in existing_rows
+            }
+
+        info_to_insert_dict = {
+            "TimeRun": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "SeriesUID": scan_param.get("SeriesUID"),
+            "TarchiveID": self.tarchive_id,
+            "MincFile": file_rel_path,
+            "PatientName": patient_name,
+            "Reason": reason,
+            "EchoTime": scan_param.get("EchoTime"),
+        }
+
+        return self._add_row(
+            info_to_insert_dict,
+            CANDIDATE_ERROR_KEY_FIELDS,
+            self.candidate_error_keys,
+            self.pending_candidate_errors,
+        )
+
+    def add_protocol_violated_scan(self, patient_name, candidate_id, psc_id, scan_param, file_rel_path,
+                                   mri_protocol_group_id):
+        """
+        Add a scan to be inserted into the mri_protocol_violated_scans table, unless the same scan
+        was already registered for the archive.
+
+        :param patient_name: PatientName associated to the file to insert
+         :type patient_name: str
+        :param candidate_id: candidate ID (not CandID) associated to the file to insert
+         :type candidate_id: int
+        :param psc_id: PSCID associated to the file to insert
+         :type psc_id: str
+        :param scan_param: parameters of the image to insert
+         :type scan_param: dict
+        :param file_rel_path: relative path to the file in trashbin
+         :type file_rel_path: str
+        :param mri_protocol_group_id: MRIProtocolGroupID of the scan
+         :type mri_protocol_group_id: int
+
+        :return: whether the scan was added (False if it is a duplicate)
+         :rtype: bool
+        """
+
+        if self.protocol_violated_scan_keys is None:
+            existing_rows = self.mri_prot_viol_scan_db_obj.get_protocol_violations_for_tarchive_id(self.tarchive_id)
+            self.protocol_violated_scan_keys = {
+                self.get_violation_key(row, PROTOCOL_VIOLATED_SCAN_KEY_FIELDS) for row in existing_rows
+            }
+
+        image_type = str(scan_param["ImageType"]) if "ImageType" in scan_param.keys() else None
+        echo_number = repr(scan_param["EchoNumber"]) if "EchoNumber" in scan_param.keys() else None
+
+        info_to_insert_dict = {
+            "CandidateID": candidate_id,
+            "PSCID": psc_id,
+            "TarchiveID": self.tarchive_id,
+            "time_run": datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "series_description": scan_param.get("SeriesDescription"),
+            "minc_location": file_rel_path,
+            "PatientName": patient_name,
+            "TR_range": scan_param.get("RepetitionTime"),
+            "TE_range": scan_param.get("EchoTime"),
+            "TI_range": scan_param.get("InversionTime"),
+            "slice_thickness_range": scan_param.get("SliceThickness"),
+            "xspace_range": scan_param.get("xspace"),
+            "yspace_range": scan_param.get("yspace"),
+            "zspace_range": scan_param.get("zspace"),
+            "xstep_range": scan_param.get("xstep"),
+            "ystep_range": scan_param.get("ystep"),
+            "zstep_range": scan_param.get("zstep"),
+            "time_range": scan_param.get("time"),
+            "SeriesUID": scan_param.get("SeriesInstanceUID"),
+            "image_type": image_type,
+            "PhaseEncodingDirection": scan_param.get("PhaseEncodingDirection"),
+            "EchoNumber": echo_number,
+            "MriProtocolGroupID": mri_protocol_group_id if mri_protocol_group_id else None
+        }
+
+        return self._add_row(
+            info_to_insert_dict,
+            PROTOCOL_VIOLATED_SCAN_KEY_FIELDS,
+            self.protocol_violated_scan_keys,
+            self.pending_protocol_violated_scans,
+        )
+
+    def add_violations_log(self, info_to_insert_dict):
+        """
+        Add a violation to be inserted into the mri_violations_log table, unless the same violation
+        was already registered for the archive.
+
+        :param info_to_insert_dict: dictionary with the information to be inserted in mri_violations_log
+         :type info_to_insert_dict: dict
+
+        :return: whether the violation was added (False if it is a duplicate)
+         :rtype: bool
+        """
+
+        if self.violations_log_keys is None:
+            existing_rows = self.mri_viol_log_db_obj.get_violations_for_tarchive_id(self.tarchive_id)
+            self.violations_log_keys = {
+                self.get_violation_key(row, VIOLATIONS_LOG_KEY_FIELDS) for row in existing_rows
+            }
+
+        return self._add_row(
+            info_to_insert_dict,
+            VIOLATIONS_LOG_KEY_FIELDS,
+            self.violations_log_keys,
+            self.pending_violations_logs,
+        )
+
+    def flush(self):
+        """
+        Insert all the pending violations into the database, using one bulk insert per table.
+        """
+
+        self._insert_rows("MRICandidateErrors", self.pending_candidate_errors)
+        self._insert_rows("mri_protocol_violated_scans", self.pending_protocol_violated_scans)
+        self._insert_rows("mri_violations_log", self.pending_violations_logs)
+
+    def _add_row(self, row, key_fields, known_keys, pending_rows):
+        """
+        Add a row to a list of pending rows if its key is not already known.
+
+        :return: whether the row was added
+         :rtype: bool
+        """
+
+        key = self.get_violation_key(row, key_fields)
+        if key in known_keys:
+            return False
+
+        known_keys.add(key)
+        pending_rows.append(row)
+        return True
+
+    def _insert_rows(self, table_name, pending_rows):
+        """
+        Insert a list of pending rows into a table and clear that list. The rows are grouped by
+        set of columns since each bulk insert statement uses a single column list.
+
+        :param table_name: name of the table to insert into
+         :type table_name: str
+        :param pending_rows: list of dictionaries with table fields as keys
+         :type pending_rows: list
+        """
+
+        rows_by_columns = {}
+        for row in pending_rows:
+            rows_by_columns.setdefault(tuple(row.keys()), []).append(tuple(row.values()))
+
+        for column_names, values in rows_by_columns.items():
+            self.db.insert(
+                table_name=table_name,
+                column_names=column_names,
+                values=values,
+                ignore_duplicates=True,
+            )
+
+        pending_rows.clear()
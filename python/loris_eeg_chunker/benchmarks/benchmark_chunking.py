@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import argparse
+import contextlib
+import io
+import time
+import tracemalloc
+
+import mne
+import numpy as np
+
+from loris_eeg_chunker.chunking import mne_file_to_chunks
+
+
+def synthetic_recording(channel_count, seconds, sfreq):
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((channel_count, int(seconds * sfreq))) * 1e-5
+    info = mne.create_info([f'EEG{i:03}' for i in range(channel_count)], sfreq, 'eeg')
+    return mne.io.RawArray(data, info, verbose=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the in-memory chunking of synthetic multi-channel recordings.')
+    parser.add_argument('--channels', '-c', dest='channels', type=int, nargs='+', default=[128, 256, 512],
+                        help='channel counts of the synthetic recordings')
+    parser.add_argument('--seconds', '-t', dest='seconds', type=float, default=60,
+                        help='duration of the synthetic recordings in seconds')
+    parser.add_argument('--sfreq', '-f', dest='sfreq', type=float, default=1000,
+                        help='sampling frequency of the synthetic recordings')
+    parser.add_argument('--chunk-size', '-s', dest='chunk_size', type=int, default=5000,
+                        help='1 dimensional chunk size')
+
+    args = parser.parse_args()
+    print(f'{"channels":>8} {"time (s)":>8} {"peak MiB":>9}')
+    for channel_count in args.channels:
+        recording = synthetic_recording(channel_count, args.seconds, args.sfreq)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            mne_file_to_chunks(None, args.chunk_size, lambda path: recording, recording.ch_names[0], None)
+        duration = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f'{channel_count:>8} {duration:>8.2f} {peak / 2**20:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,9 +6,16 @@ import sys
 from collections import OrderedDict
 
 import numpy as np
-from scipy import signal
 
+from loris_eeg_chunker.edf import EdfReader
+from loris_eeg_chunker.encoding import (
+    encode_quantized_chunk,
+    float_encoding,
+    quantization_from_range,
+    quantized_encoding,
+)
 from loris_eeg_chunker.protocol_buffers import chunk_pb2 as chunk_pb
+from loris_eeg_chunker.resampling import decimate
 
 
 def pad_values(values, chunk_size):
@@ -40,23 +47,44 @@ def create_chunks_from_values_lists(values_lists, chunk_size):
     return chunks_lists
 
 
-def downsample_channel(channel, chunk_size, downsampling):
+def downsampled_size(size, chunk_size, downsampling):
     if downsampling == 0:
-        return channel
-    down = chunk_size**downsampling
-    downsampled_size = channel.shape[-1] / down
+        return size
+    downsampled_size = int(size / chunk_size**downsampling)
     if downsampled_size <= chunk_size * 2:
         downsampled_size = chunk_size * 2
-    return signal.resample(channel, downsampled_size, axis=-1)
+    return downsampled_size
+
+
+def downsampled_sizes(size, chunk_size):
+    # Distinct sizes of the downsampling levels, from the finest to the coarsest, as created by
+    # create_downsampled_values_lists.
+    downsamplings = math.ceil(math.log(size) / math.log(chunk_size))
+    sizes = []
+    for downsampling in range(downsamplings):
+        level_size = downsampled_size(size, chunk_size, downsampling)
+        if level_size not in sizes:
+            sizes.append(level_size)
+    return sizes
+
+
+def decimate_channel(channel, size):
+    # Anti-aliased decimation by the largest integer factor that does not go below the requested
+    # size, using a polyphase filter whose cost is linear in the signal length. The remaining
+    # factor, lower than 2, is applied with a windowed sinc on the already decimated signal. The
+    # streaming chunker applies the same filters window by window.
+    return decimate(channel, size)
 
 
 def create_downsampled_values_lists(channel, chunk_size):
     downsamplings = math.ceil(math.log(channel.shape[-1]) / math.log(chunk_size))
-    downsamplings = range(downsamplings - 1, -1, -1)
-    downsampled_channels = [
-        downsample_channel(channel, chunk_size, downsampling)
-        for downsampling in downsamplings
-    ]
+    # Build the levels as a cascade from the finest to the coarsest, each level being decimated from
+    # the previous one rather than from the original signal.
+    downsampled_channels = [channel]
+    for downsampling in range(1, downsamplings):
+        size = downsampled_size(channel.shape[-1], chunk_size, downsampling)
+        downsampled_channels.append(decimate_channel(downsampled_channels[-1], size))
+    downsampled_channels.reverse()
     sizes = set()
     unique_sized = []
     for channel in downsampled_channels:
@@ -93,7 +121,10 @@ def write_index_json(
     downsamplings,
     valid_samples_in_last_chunk,
     shapes,
-    trace_types={}
+    trace_types={},
+    container='tree',
+    encoding=None,
+    verbose=True
 ):
     json_dict = OrderedDict([
         ('timeInterval', list(time_interval)),
@@ -103,6 +134,8 @@ def write_index_json(
         ('downsamplings', downsamplings),
         ('shapes', shapes),
         ('traceTypes', trace_types),
+        ('container', container),
+        ('encoding', encoding or float_encoding()),
         ('channelMetadata', channel_metadata)
     ])
     create_path_dirs(chunk_dir)
@@ -117,6 +150,12 @@ def write_index_json(
             if json_dict['downsamplings'] != data['downsamplings']:
                 sys.exit("Downsamplings does not match the one found in index.json.")
 
+            if json_dict['container'] != data.get('container', 'tree'):
+                sys.exit("Chunk container does not match the one found in index.json.")
+
+            if json_dict['encoding'] != data.get('encoding', float_encoding()):
+                sys.exit("Chunk encoding does not match the one found in index.json.")
+
             indices = [channelMetadata['index'] for channelMetadata in json_dict['channelMetadata']]
             json_dict['channelMetadata'].extend(
                 channelMetadata for channelMetadata in data['channelMetadata']
@@ -129,8 +168,9 @@ def write_index_json(
             if data['seriesRange'][1] > json_dict['seriesRange'][1]:
                 json_dict['seriesRange'][1] = data['seriesRange'][1]
     except Exception as e:
-        print(e)
-        print('Unable to read an existing index.json file. A new one will be created.')
+        if verbose:
+            print(e)
+            print('Unable to read an existing index.json file. A new one will be created.')
 
     with open(os.path.join(chunk_dir, 'index.json'), 'w+') as index_json:
         json.dump(json_dict, index_json, indent=2, separators=(',', ': '))
@@ -143,7 +183,15 @@ def encode_chunk(chunk, index, downsampling):
     return encoded.SerializeToString()
 
 
-def write_chunks(chunk_dir, channel_chunks_list, channel_index):
+def encode_channel_chunk(chunk, index, downsampling, encoding=None, quantization=None):
+    if encoding is None or encoding['type'] == 'float':
+        return encode_chunk(chunk, index, downsampling)
+
+    scale, offset = quantization
+    return encode_quantized_chunk(chunk, scale, offset, encoding['bits'], encoding['compression'])
+
+
+def write_chunks(chunk_dir, channel_chunks_list, channel_indices, encoding=None, quantizations=None):
     for downsampling, channels in enumerate(channel_chunks_list):
         for channel_offset, channel in enumerate(channels):
             for trace_index, trace in enumerate(channel):
@@ -151,82 +199,205 @@ def write_chunks(chunk_dir, channel_chunks_list, channel_index):
                     chunk_dir,
                     'raw',
                     str(downsampling),
-                    str(channel_index + channel_offset),
+                    str(channel_indices[channel_offset]),
                     str(trace_index)
                 )
                 create_path_dirs(trace_path)
                 for chunk_index, chunk in enumerate(trace):
                     chunk_path = os.path.join(
                         trace_path, str(chunk_index)) + '.buf'
-                    encoded_chunk = encode_chunk(
-                        chunk, chunk_index, downsampling)
+                    encoded_chunk = encode_channel_chunk(
+                        chunk, chunk_index, downsampling, encoding,
+                        quantizations[channel_offset] if quantizations else None)
                     with open(chunk_path, 'w+b') as chunk_file:
                         chunk_file.write(encoded_chunk)
 
 
-def mne_file_to_chunks(path, chunk_size, loader, from_channel_name, channel_count):
+def packed_chunk_path(chunk_dir, downsampling, channel_index):
+    return os.path.join(chunk_dir, 'raw', str(downsampling), str(channel_index) + '.pack')
+
+
+def write_packed_chunks(chunk_dir, channel_chunks_list, channel_indices, encoding=None, quantizations=None):
+    # Write the encoded chunks of each (downsampling, channel) back to back in a single file instead
+    # of one file per chunk, and return the byte offsets of the chunks in these files, indexed by
+    # channel offset and downsampling. The chunks of the traces of a channel are written one trace
+    # after the other.
+    chunk_offsets = []
+    for downsampling, channels in enumerate(channel_chunks_list):
+        create_path_dirs(os.path.join(chunk_dir, 'raw', str(downsampling)))
+        for channel_offset, channel in enumerate(channels):
+            if downsampling == 0:
+                chunk_offsets.append([])
+
+            offsets = [0]
+            quantization = quantizations[channel_offset] if quantizations else None
+            chunk_path = packed_chunk_path(chunk_dir, downsampling, channel_indices[channel_offset])
+            with open(chunk_path, 'w+b') as chunk_file:
+                for trace in channel:
+                    for chunk_index, chunk in enumerate(trace):
+                        encoded_chunk = encode_channel_chunk(chunk, chunk_index, downsampling, encoding, quantization)
+                        chunk_file.write(encoded_chunk)
+                        offsets.append(offsets[-1] + len(encoded_chunk))
+
+            chunk_offsets[channel_offset].append(offsets)
+
+    return chunk_offsets
+
+
+def select_channels(channel_names, from_channel_name, channel_count):
+    if not from_channel_name:
+        return []
+
+    from_channel_index = channel_names.index(from_channel_name)
+    if channel_count and from_channel_index + channel_count < len(channel_names):
+        return channel_names[from_channel_index:from_channel_index + channel_count]
+
+    return channel_names[from_channel_index:]
+
+
+def source_quantizations(parsed, channel_names):
+    # EDF and BDF samples are 16 and 24 bits integers scaled linearly per channel, so quantizing with
+    # the scale and offset of the file gives back the original integers. Returns the number of bits
+    # and the scale and offset of each channel, or None if the file is not read with the native EDF
+    # reader, which is the only one exposing the scaling of the file.
+    if not isinstance(parsed, EdfReader):
+        return None
+
+    return parsed.sample_size * 8, [
+        tuple(float(value) for value in parsed.scaling(channel_name)) for channel_name in channel_names
+    ]
+
+
+def level_ranges(channel_chunks_list):
+    # Range of the samples of each channel over all the downsampling levels, which is wider than the
+    # range of the original samples since the anti-aliasing filters overshoot at sharp transitions.
+    if not channel_chunks_list:
+        return []
+
+    channel_count = len(channel_chunks_list[0])
+    levels = [chunks.reshape(channel_count, -1) for chunks in channel_chunks_list]
+    channel_mins = np.amin([np.amin(level, axis=1) for level in levels], axis=0)
+    channel_maxs = np.amax([np.amax(level, axis=1) for level in levels], axis=0)
+    return [(float(channel_min), float(channel_max)) for channel_min, channel_max in zip(channel_mins, channel_maxs)]
+
+
+def channel_encoding(parsed, channel_names, channel_ranges, quantization_bits=None, compression=None,
+                     lossless=False):
+    # Returns the encoding of the chunks and the quantization (scale and offset) of each channel.
+    if lossless:
+        source = source_quantizations(parsed, channel_names)
+        if source is None:
+            raise ValueError("Lossless encoding requires an EDF or BDF file read with the native EDF reader")
+
+        bits, quantizations = source
+        return quantized_encoding(bits, compression), quantizations
+
+    if quantization_bits is None:
+        if compression is not None:
+            raise ValueError("Chunk compression requires a quantized encoding")
+
+        return None, None
+
+    encoding = quantized_encoding(quantization_bits, compression)
+    return encoding, [
+        quantization_from_range(channel_min, channel_max, quantization_bits)
+        for channel_min, channel_max in channel_ranges
+    ]
+
+
+def mne_file_to_chunks(path, chunk_size, loader, from_channel_name, channel_count, dtype=np.float32, verbose=True):
     parsed = loader(path)
-    time_interval = (parsed.times[0], parsed.times[-1])
+    time_interval = (0.0, (parsed.n_times - 1) / parsed.info['sfreq'])
     channel_names = parsed.info["ch_names"]
     channel_ranges = []
     signal_range = [np.inf, -np.inf]
     channel_chunks_list = []
-    selected_channels = []
     valid_samples_in_last_chunk = []
-
-    if from_channel_name:
-        from_channel_index = channel_names.index(from_channel_name)
-        if channel_count and from_channel_index + channel_count < len(channel_names):
-            selected_channels = channel_names[from_channel_index:from_channel_index + channel_count]
-        else:
-            selected_channels = channel_names[from_channel_index:]
-
-    for i, channel_name in enumerate(selected_channels):
-        print("Processing channel " + channel_name)
-        channel = parsed.get_data(channel_name)
-        channel_min = np.amin(channel)
-        channel_max = np.amax(channel)
+    selected_channels = select_channels(channel_names, from_channel_name, channel_count)
+
+    # Read all the selected channels in a single pass over the file rather than once per channel.
+    # The samples are kept in float32, which is the precision of the encoded float chunks.
+    channels = parsed.get_data(selected_channels) if selected_channels else np.empty((0, 0))
+    channel_mins = np.amin(channels, axis=-1, initial=np.inf)
+    channel_maxs = np.amax(channels, axis=-1, initial=-np.inf)
+    channels = channels.astype(dtype)
+    for i, (channel_name, channel) in enumerate(zip(selected_channels, channels)):
+        if verbose:
+            print("Processing channel " + channel_name)
+        channel_min = float(channel_mins[i])
+        channel_max = float(channel_maxs[i])
         channel_ranges.append((channel_min, channel_max))
         signal_range = [min(channel_min, signal_range[0]), max(channel_max, signal_range[1])]
 
-        channel = np.expand_dims(channel, axis=-2)
+        channel = channel.reshape(1, 1, -1)
         downsampled_values_lists = create_downsampled_values_lists(channel, chunk_size)
         chunks = create_chunks_from_values_lists(downsampled_values_lists, chunk_size)
 
         if not channel_chunks_list:
-            channel_chunks_list = chunks
-            # Assuming all channels have the same recording length as first channel
+            # Allocate the chunks of all the channels once the chunk shapes are known, assuming all
+            # channels have the same recording length as first channel
+            channel_chunks_list = [
+                np.empty((len(selected_channels), *chunk.shape[1:]), dtype=dtype)
+                for chunk in chunks
+            ]
             valid_samples_in_last_chunk = [
                 num_values % chunk_size or chunk_size   # chunk size if 0
                 for num_values in map(lambda values: len(values[0][0]), downsampled_values_lists)
             ]
-        else:
-            for j, chunk in enumerate(chunks):
-                channel_chunks_list[j] = np.append(channel_chunks_list[j], chunk, axis=0)
+
+        for j, chunk in enumerate(chunks):
+            channel_chunks_list[j][i] = chunk[0]
 
     return channel_chunks_list, time_interval, signal_range, channel_names, channel_ranges, valid_samples_in_last_chunk
 
 
 def write_chunk_directory(path, chunk_size, loader, from_channel_index=0, from_channel_name=None,
-                          channel_count=None, downsamplings=None, prefix=None, destination=None):
+                          channel_count=None, downsamplings=None, prefix=None, destination=None, packed=False,
+                          channel_indices=None, quantization_bits=None, compression=None, lossless=False,
+                          verbose=True):
 
     chunk_dir = chunk_dir_path(path, prefix=prefix, destination=destination)
+    parsed = loader(path)
+    # Lossless chunks of 24 bits BDF samples need more precision than float32.
+    dtype = np.float64 if lossless else np.float32
     channel_chunks_list, time_interval, signal_range, \
         channel_names, channel_ranges, valid_samples_in_last_chunk = \
-        mne_file_to_chunks(path, chunk_size, loader, from_channel_name, channel_count)
+        mne_file_to_chunks(path, chunk_size, lambda path: parsed, from_channel_name, channel_count, dtype, verbose)
 
     if downsamplings is not None:
         channel_chunks_list = channel_chunks_list[:downsamplings]
 
+    if channel_indices is None:
+        channel_indices = [from_channel_index + i for i in range(len(channel_ranges))]
+
+    encoding, quantizations = channel_encoding(
+        parsed,
+        select_channels(channel_names, from_channel_name, channel_count),
+        level_ranges(channel_chunks_list),
+        quantization_bits,
+        compression,
+        lossless
+    )
+
     channel_metadata = [
         {
             'name': channel_names[i],
             'seriesRange': channel_ranges[i],
-            'index': from_channel_index + i
+            'index': channel_indices[i]
         }
         for i in range(len(channel_ranges))
     ]
 
+    if quantizations:
+        for i, (scale, offset) in enumerate(quantizations):
+            channel_metadata[i]['scale'] = scale
+            channel_metadata[i]['offset'] = offset
+
+    if packed:
+        chunk_offsets = write_packed_chunks(chunk_dir, channel_chunks_list, channel_indices, encoding, quantizations)
+        for i, offsets in enumerate(chunk_offsets):
+            channel_metadata[i]['chunkOffsets'] = offsets
+
     write_index_json(
         chunk_dir,
         time_interval,
@@ -235,6 +406,11 @@ def write_chunk_directory(path, chunk_size, loader, from_channel_index=0, from_c
         chunk_size,
         valid_samples_in_last_chunk,
         list(range(len(channel_chunks_list))),
-        [list(downsampled.shape) for downsampled in channel_chunks_list]
+        [list(downsampled.shape) for downsampled in channel_chunks_list],
+        container='packed' if packed else 'tree',
+        encoding=encoding,
+        verbose=verbose
     )
-    write_chunks(chunk_dir, channel_chunks_list, from_channel_index)
+
+    if not packed:
+        write_chunks(chunk_dir, channel_chunks_list, channel_indices, encoding, quantizations)
@@ -0,0 +1,176 @@
+import os
+
+import numpy as np
+
+ANNOTATION_CHANNEL_NAMES = ('EDF Annotations', 'BDF Annotations')
+
+# Channel names detected as stim channels, as done by MNE with stim_channel='auto'.
+STIM_CHANNEL_NAMES = ('STATUS', 'TRIGGER')
+
+# Mask of the trigger bits of the stim channels, whose values are digital values, as done by MNE.
+STIM_CHANNEL_MASK = 2 ** 17 - 1
+
+# Scaling of the physical dimensions to SI units, as done by MNE.
+UNIT_SCALINGS = {'V': 1.0, 'mV': 1e-3, 'uV': 1e-6, '\u00b5V': 1e-6, 'nV': 1e-9}
+
+
+class UnsupportedEdfError(Exception):
+    pass
+
+
+def is_stim_channel(channel_name):
+    return channel_name.upper() in STIM_CHANNEL_NAMES
+
+
+class EdfReader:
+    """
+    Reader of the continuous EDF, EDF+ and BDF files whose data channels have the same sampling
+    rate. The data records are memory-mapped, so a subset of channels on a sample range is read
+    by gathering its samples from the records that contain that range, and scaled to physical
+    values in one vectorized operation.
+
+    The reader exposes the subset of the MNE Raw interface used by the chunker (info, ch_names,
+    n_times and get_data). An UnsupportedEdfError is raised for the files it cannot read, which
+    are then read with MNE.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as edf_file:
+            header = edf_file.read(256)
+            if len(header) < 256:
+                raise UnsupportedEdfError(f"'{path}' is not an EDF file")
+
+            self.sample_size = 3 if header[0] == 0xFF and header[1:8] == b'BIOSEMI' else 2
+            reserved = header[192:236].decode('latin-1').strip()
+            if reserved.startswith('EDF+D') or reserved.startswith('BDF+D'):
+                raise UnsupportedEdfError(f"'{path}' is a discontinuous EDF+ file")
+
+            try:
+                header_size = int(header[184:192])
+                record_count = int(header[236:244])
+                record_duration = float(header[244:252])
+                signal_count = int(header[252:256])
+            except ValueError:
+                raise UnsupportedEdfError(f"'{path}' has an invalid EDF header")
+
+            signal_header = edf_file.read(signal_count * 256)
+            if len(signal_header) < signal_count * 256:
+                raise UnsupportedEdfError(f"'{path}' has a truncated EDF header")
+
+        def fields(offset, width):
+            start = offset * signal_count
+            return [
+                signal_header[start + i * width:start + (i + 1) * width].decode('latin-1').strip()
+                for i in range(signal_count)
+            ]
+
+        labels = fields(0, 16)
+        units = fields(96, 8)
+        try:
+            physical_mins = np.array(fields(104, 8), dtype=float)
+            physical_maxs = np.array(fields(112, 8), dtype=float)
+            digital_mins = np.array(fields(120, 8), dtype=float)
+            digital_maxs = np.array(fields(128, 8), dtype=float)
+            sample_counts = np.array(fields(216, 8), dtype=int)
+        except ValueError:
+            raise UnsupportedEdfError(f"'{path}' has an invalid EDF signal header")
+
+        # Position of the samples of each signal in a data record.
+        record_offsets = np.concatenate(([0], np.cumsum(sample_counts)))
+        record_size = int(record_offsets[-1])
+
+        data_signals = [i for i, label in enumerate(labels) if label not in ANNOTATION_CHANNEL_NAMES]
+        if not data_signals or record_duration <= 0:
+            raise UnsupportedEdfError(f"'{path}' has no data channels")
+
+        samples_per_record = {int(sample_counts[i]) for i in data_signals}
+        if len(samples_per_record) != 1:
+            raise UnsupportedEdfError(f"'{path}' has channels with different sampling rates")
+
+        self.ch_names = [labels[i] for i in data_signals]
+        if len(set(self.ch_names)) != len(self.ch_names):
+            raise UnsupportedEdfError(f"'{path}' has duplicate channel names")
+
+        # The number of records can be missing (-1) or wrong in the header of truncated files.
+        file_record_count = (os.path.getsize(path) - header_size) // (record_size * self.sample_size)
+        record_count = file_record_count if record_count < 0 else min(record_count, file_record_count)
+
+        self.samples_per_record = samples_per_record.pop()
+        self.n_times = record_count * self.samples_per_record
+        self.info = {
+            'ch_names': self.ch_names,
+            'sfreq': self.samples_per_record / record_duration,
+        }
+
+        self.record_offsets = {labels[i]: int(record_offsets[i]) for i in data_signals}
+        self.digital_mins = {labels[i]: digital_mins[i] for i in data_signals}
+        self.digital_maxs = {labels[i]: digital_maxs[i] for i in data_signals}
+        self.physical_mins = {labels[i]: physical_mins[i] for i in data_signals}
+        self.physical_maxs = {labels[i]: physical_maxs[i] for i in data_signals}
+        self.unit_scalings = {labels[i]: UNIT_SCALINGS.get(units[i], 1.0) for i in data_signals}
+        self.stim_channels = {labels[i] for i in data_signals if is_stim_channel(labels[i])}
+
+        if self.sample_size == 2:
+            self.records = np.memmap(path, dtype='<i2', mode='r', offset=header_size,
+                                     shape=(record_count, record_size))
+        else:
+            self.records = np.memmap(path, dtype=np.uint8, mode='r', offset=header_size,
+                                     shape=(record_count, record_size * 3))
+
+    def pick(self, channel_names):
+        # Reader restricted to a subset of the channels, sharing the memory-mapped records.
+        picked = object.__new__(EdfReader)
+        picked.__dict__.update(self.__dict__)
+        picked.ch_names = list(channel_names)
+        picked.info = {**self.info, 'ch_names': picked.ch_names}
+        return picked
+
+    def scaling(self, channel_name):
+        # Gain and offset such that physical value = digital value * gain + offset, in SI units.
+        # The values of the stim channels are not scaled.
+        if channel_name in self.stim_channels:
+            return 1.0, 0.0
+
+        digital_range = self.digital_maxs[channel_name] - self.digital_mins[channel_name]
+        gain = (self.physical_maxs[channel_name] - self.physical_mins[channel_name]) / digital_range
+        offset = self.physical_mins[channel_name] - self.digital_mins[channel_name] * gain
+        unit_scaling = self.unit_scalings[channel_name]
+        return gain * unit_scaling, offset * unit_scaling
+
+    def get_data(self, picks=None, start=0, stop=None):
+        channel_names = self.ch_names if picks is None else [picks] if isinstance(picks, str) else list(picks)
+        stop = self.n_times if stop is None else min(stop, self.n_times)
+        if stop <= start:
+            return np.empty((len(channel_names), 0))
+
+        first_record = start // self.samples_per_record
+        last_record = -(-stop // self.samples_per_record)
+        records = self.records[first_record:last_record]
+
+        # Gather the samples of the channels from the records in a single indexing operation.
+        columns = np.concatenate([
+            np.arange(self.record_offsets[name], self.record_offsets[name] + self.samples_per_record)
+            for name in channel_names
+        ])
+
+        if self.sample_size == 2:
+            digital = records[:, columns]
+        else:
+            bytes_columns = (columns[:, np.newaxis] * 3 + np.arange(3)).ravel()
+            samples = records[:, bytes_columns].reshape(len(records), len(columns), 3).astype(np.int32)
+            digital = samples[..., 0] | (samples[..., 1] << 8) | (samples[..., 2] << 16)
+            digital = np.where(digital >= 1 << 23, digital - (1 << 24), digital)
+
+        digital = digital.reshape(len(records), len(channel_names), self.samples_per_record)
+        digital = digital.transpose(1, 0, 2).reshape(len(channel_names), -1)
+        first_sample = first_record * self.samples_per_record
+        digital = digital[:, start - first_sample:stop - first_sample]
+
+        gains, offsets = np.array([self.scaling(name) for name in channel_names]).reshape(-1, 2).T
+        data = digital * gains[:, np.newaxis] + offsets[:, np.newaxis]
+        for row, name in enumerate(channel_names):
+            if name in self.stim_channels:
+                data[row] = np.bitwise_and(digital[row].astype(int), STIM_CHANNEL_MASK)
+
+        return data
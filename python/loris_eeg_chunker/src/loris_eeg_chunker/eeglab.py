@@ -0,0 +1,95 @@
+import os
+
+import mne.io.eeglab.eeglab as mne_eeglab
+import numpy as np
+
+# EEGLAB samples are stored in microvolts.
+CAL = mne_eeglab.CAL
+
+
+class UnsupportedEeglabError(Exception):
+    """
+    Error raised for the datasets the native reader cannot read, which carries the header of the
+    dataset so that it is not loaded again to read the dataset with MNE.
+    """
+
+    def __init__(self, message, header):
+        super().__init__(message)
+        self.header = header
+
+
+class EeglabHeader:
+    """
+    Header of an EEGLAB dataset, which is the EEG structure of its .set file without the samples,
+    and the MNE info built from it.
+    """
+
+    def __init__(self, path):
+        self.eeg = mne_eeglab._check_load_mat(path, None)
+        self.info = mne_eeglab._get_info(self.eeg, eog=(), montage_units='auto')[0]
+
+    @property
+    def ch_names(self):
+        return list(self.info['ch_names'])
+
+
+class EeglabReader:
+    """
+    Reader of the continuous EEGLAB datasets whose samples are stored in a separate .fdt file. The
+    .fdt file is a float32 matrix of the samples of all the channels, sample after sample, which is
+    memory-mapped using the number of channels, number of samples and sampling rate of the .set
+    header, so that only the time span that is read is loaded from the disk.
+
+    The reader exposes the subset of the MNE Raw interface used by the chunker (info, ch_names,
+    n_times and get_data). An UnsupportedEeglabError is raised for the datasets it cannot read,
+    which are then read with MNE.
+    """
+
+    def __init__(self, path, header=None):
+        self.path = path
+        self.header = header if header is not None else EeglabHeader(path)
+        eeg = self.header.eeg
+        if eeg.trials != 1:
+            raise UnsupportedEeglabError(f"'{path}' is an epoched EEGLAB dataset", self.header)
+
+        if not isinstance(eeg.data, str):
+            raise UnsupportedEeglabError(f"'{path}' stores its samples in the .set file", self.header)
+
+        data_path = mne_eeglab._check_eeglab_fname(path, eeg.data)
+        if os.path.realpath(data_path) == os.path.realpath(path):
+            raise UnsupportedEeglabError(f"'{path}' stores its samples in the .set file", self.header)
+
+        channel_count = int(eeg.nbchan)
+        self.n_times = int(eeg.pnts)
+        if os.path.getsize(data_path) < channel_count * self.n_times * 4:
+            raise UnsupportedEeglabError(
+                f"'{data_path}' is smaller than the size given in the .set header", self.header)
+
+        self.ch_names = self.header.ch_names
+        if len(set(self.ch_names)) != len(self.ch_names):
+            raise UnsupportedEeglabError(f"'{path}' has duplicate channel names", self.header)
+
+        self.info = {
+            'ch_names': self.ch_names,
+            'sfreq': float(self.header.info['sfreq']),
+        }
+
+        self.channel_offsets = {channel_name: i for i, channel_name in enumerate(self.ch_names)}
+        self.samples = np.memmap(data_path, dtype='<f4', mode='r', shape=(self.n_times, channel_count))
+
+    def pick(self, channel_names):
+        # Reader restricted to a subset of the channels, sharing the memory-mapped samples.
+        picked = object.__new__(EeglabReader)
+        picked.__dict__.update(self.__dict__)
+        picked.ch_names = list(channel_names)
+        picked.info = {**self.info, 'ch_names': picked.ch_names}
+        return picked
+
+    def get_data(self, picks=None, start=0, stop=None):
+        channel_names = self.ch_names if picks is None else [picks] if isinstance(picks, str) else list(picks)
+        stop = self.n_times if stop is None else min(stop, self.n_times)
+        if stop <= start:
+            return np.empty((len(channel_names), 0))
+
+        columns = [self.channel_offsets[channel_name] for channel_name in channel_names]
+        return self.samples[start:stop, columns].T.astype(np.float64) * CAL
@@ -0,0 +1,74 @@
+import zlib
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIONS = ('zlib', 'zstd')
+
+
+def float_encoding():
+    return {'type': 'float'}
+
+
+def quantized_encoding(bits, compression=None):
+    if not 2 <= bits <= 32:
+        raise ValueError("Quantization bits must be between 2 and 32")
+
+    if compression is not None and compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown chunk compression '{compression}'")
+
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError("The zstandard package is required for the zstd chunk compression")
+
+    return {'type': 'quantized', 'bits': bits, 'compression': compression}
+
+
+def quantized_dtype(bits):
+    if bits <= 8:
+        return np.dtype('i1')
+    if bits <= 16:
+        return np.dtype('<i2')
+    return np.dtype('<i4')
+
+
+def quantization_from_range(channel_min, channel_max, bits):
+    # Scale and offset such that the channel range is mapped to the symmetric range of signed
+    # integers of the given number of bits, a sample value being quantized * scale + offset.
+    offset = (channel_min + channel_max) / 2
+    scale = (channel_max - channel_min) / (2 ** bits - 2) or 1.0
+    return float(scale), float(offset)
+
+
+def compress(data, compression):
+    match compression:
+        case None:
+            return data
+        case 'zlib':
+            return zlib.compress(data)
+        case 'zstd':
+            return zstandard.ZstdCompressor().compress(data)
+
+
+def decompress(data, compression):
+    match compression:
+        case None:
+            return data
+        case 'zlib':
+            return zlib.decompress(data)
+        case 'zstd':
+            return zstandard.ZstdDecompressor().decompress(data)
+
+
+def encode_quantized_chunk(chunk, scale, offset, bits, compression=None):
+    limit = 2 ** (bits - 1)
+    quantized = np.clip(np.rint((chunk - offset) / scale), -limit, limit - 1)
+    return compress(quantized.astype(quantized_dtype(bits)).tobytes(), compression)
+
+
+def decode_quantized_chunk(data, scale, offset, bits, compression=None):
+    quantized = np.frombuffer(decompress(data, compression), dtype=quantized_dtype(bits))
+    return (quantized * scale + offset).astype(np.float32)
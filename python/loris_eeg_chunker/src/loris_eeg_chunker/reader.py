@@ -0,0 +1,230 @@
+import json
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from loris_eeg_chunker.chunking import packed_chunk_path
+from loris_eeg_chunker.encoding import decode_quantized_chunk, float_encoding
+from loris_eeg_chunker.protocol_buffers import chunk_pb2 as chunk_pb
+
+
+def decode_chunk(data, encoding=None, quantization=None):
+    if encoding is not None and encoding['type'] == 'quantized':
+        scale, offset = quantization
+        return decode_quantized_chunk(data, scale, offset, encoding['bits'], encoding['compression'])
+
+    chunk = chunk_pb.FloatChunk()
+    chunk.ParseFromString(data)
+    return np.array(chunk.samples, dtype=np.float32)
+
+
+def channel_quantizations(index):
+    return {
+        channel['index']: (channel['scale'], channel['offset'])
+        for channel in index['channelMetadata'] if 'scale' in channel
+    }
+
+
+def read_index_json(chunk_dir):
+    with open(os.path.join(chunk_dir, 'index.json')) as index_file:
+        return json.load(index_file)
+
+
+class PackedChunkReader:
+    """
+    Reader for a chunk directory written with the packed container, which serves each chunk with a
+    single positioned read in the file of its (downsampling, channel).
+
+    The file descriptors are kept open until the reader is closed.
+    """
+
+    def __init__(self, chunk_dir):
+        self.chunk_dir = chunk_dir
+        self.index = read_index_json(chunk_dir)
+        if self.index.get('container', 'tree') != 'packed':
+            raise ValueError(f"Chunk directory '{chunk_dir}' does not use the packed container.")
+
+        self.chunk_offsets = {
+            channel['index']: channel['chunkOffsets'] for channel in self.index['channelMetadata']
+        }
+
+        self.encoding = self.index.get('encoding', float_encoding())
+        self.quantizations = channel_quantizations(self.index)
+
+        self.file_descriptors = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for file_descriptor in self.file_descriptors.values():
+            os.close(file_descriptor)
+
+        self.file_descriptors.clear()
+
+    def read_chunk_bytes(self, downsampling, channel_index, chunk_index):
+        offsets = self.chunk_offsets[channel_index][downsampling]
+        if not 0 <= chunk_index < len(offsets) - 1:
+            raise IndexError(f"Chunk index {chunk_index} out of range for downsampling {downsampling}.")
+
+        key = (downsampling, channel_index)
+        file_descriptor = self.file_descriptors.get(key)
+        if file_descriptor is None:
+            file_descriptor = os.open(packed_chunk_path(self.chunk_dir, downsampling, channel_index), os.O_RDONLY)
+            self.file_descriptors[key] = file_descriptor
+
+        start = offsets[chunk_index]
+        return os.pread(file_descriptor, offsets[chunk_index + 1] - start, start)
+
+    def read_chunk(self, downsampling, channel_index, chunk_index):
+        return decode_chunk(
+            self.read_chunk_bytes(downsampling, channel_index, chunk_index),
+            self.encoding,
+            self.quantizations.get(channel_index)
+        )
+
+
+class ChunkDirectoryReader:
+    """
+    Random-access reader of the samples of a chunk directory, for both containers and encodings.
+
+    A query for a time window is served from the finest downsampling level that has at most the
+    requested number of points in the window (or the coarsest level if none has), and only the
+    chunks that overlap the window are read and decoded. The decoded chunks are kept in a least
+    recently used cache, so that the overlapping windows of successive queries are not decoded again.
+    """
+
+    def __init__(self, chunk_dir, cache_size=256):
+        self.chunk_dir = chunk_dir
+        self.index = read_index_json(chunk_dir)
+        self.chunk_size = self.index['chunkSize']
+        self.time_interval = self.index['timeInterval']
+
+        # The number of valid samples in the last chunk of each level is stored under the
+        # 'downsamplings' key of index.json, and the levels are ordered from the coarsest.
+        self.level_sizes = [
+            (shape[2] - 1) * self.chunk_size + valid_samples
+            for shape, valid_samples in zip(self.index['shapes'], self.index['downsamplings'])
+        ]
+
+        self.channel_indices = {channel['name']: channel['index'] for channel in self.index['channelMetadata']}
+        self.encoding = self.index.get('encoding', float_encoding())
+        self.quantizations = channel_quantizations(self.index)
+
+        self.packed_reader = None
+        if self.index.get('container', 'tree') == 'packed':
+            self.packed_reader = PackedChunkReader(chunk_dir)
+
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.packed_reader is not None:
+            self.packed_reader.close()
+
+        self.cache.clear()
+
+    def channel_index(self, channel):
+        # Channels are given either by name or by index in the chunk directory.
+        if isinstance(channel, str):
+            if channel not in self.channel_indices:
+                raise ValueError(f"Unknown channel '{channel}' in chunk directory '{self.chunk_dir}'.")
+
+            return self.channel_indices[channel]
+
+        return channel
+
+    def read_chunk(self, downsampling, channel_index, chunk_index):
+        key = (downsampling, channel_index, chunk_index)
+        chunk = self.cache.get(key)
+        if chunk is not None:
+            self.cache.move_to_end(key)
+            return chunk
+
+        if self.packed_reader is not None:
+            chunk = self.packed_reader.read_chunk(downsampling, channel_index, chunk_index)
+        else:
+            chunk_path = os.path.join(
+                self.chunk_dir, 'raw', str(downsampling), str(channel_index), '0', str(chunk_index)
+            ) + '.buf'
+            with open(chunk_path, 'rb') as chunk_file:
+                chunk = decode_chunk(chunk_file.read(), self.encoding, self.quantizations.get(channel_index))
+
+        self.cache[key] = chunk
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+        return chunk
+
+    def level_step(self, downsampling):
+        # Time between two samples of a level, the samples being evenly spaced over the time interval.
+        first_time, last_time = self.time_interval
+        level_size = self.level_sizes[downsampling]
+        return (last_time - first_time) / (level_size - 1) if level_size > 1 else 0.0
+
+    def sample_range(self, downsampling, t_start, t_end):
+        first_time, last_time = self.time_interval
+        t_start = max(t_start, first_time)
+        t_end = min(t_end, last_time)
+        if t_end < t_start:
+            return 0, 0
+
+        step = self.level_step(downsampling)
+        if step == 0:
+            return 0, 1
+
+        # The tolerance keeps the samples located exactly on the window bounds despite rounding.
+        start = math.ceil((t_start - first_time) / step - 1e-9)
+        stop = math.floor((t_end - first_time) / step + 1e-9) + 1
+        return start, min(stop, self.level_sizes[downsampling])
+
+    def window(self, t_start, t_end, max_points):
+        # Returns the downsampling level used for a time window and the range of its samples in the
+        # window, the levels being ordered from the coarsest.
+        window = None
+        for downsampling in range(len(self.level_sizes)):
+            start, stop = self.sample_range(downsampling, t_start, t_end)
+            if window is not None and stop - start > max_points:
+                break
+
+            window = downsampling, start, stop
+
+        return window
+
+    def times(self, t_start, t_end, max_points):
+        # Times of the samples returned by query for the same window.
+        downsampling, start, stop = self.window(t_start, t_end, max_points)
+        return self.time_interval[0] + np.arange(start, stop) * self.level_step(downsampling)
+
+    def query(self, channels, t_start, t_end, max_points):
+        # Returns the samples of the channels in the time window as an array of shape
+        # (channels, points), reading only the chunks that overlap the window.
+        downsampling, start, stop = self.window(t_start, t_end, max_points)
+        channel_indices = [self.channel_index(channel) for channel in channels]
+        samples = np.empty((len(channel_indices), stop - start), dtype=np.float32)
+        if stop <= start:
+            return samples
+
+        first_chunk = start // self.chunk_size
+        last_chunk = (stop - 1) // self.chunk_size
+        for i, channel_index in enumerate(channel_indices):
+            for chunk_index in range(first_chunk, last_chunk + 1):
+                chunk_start = chunk_index * self.chunk_size
+                chunk = self.read_chunk(downsampling, channel_index, chunk_index)
+                window_start = max(start, chunk_start)
+                window_stop = min(stop, chunk_start + self.chunk_size)
+                samples[i, window_start - start:window_stop - start] = \
+                    chunk[window_start - chunk_start:window_stop - chunk_start]
+
+        return samples
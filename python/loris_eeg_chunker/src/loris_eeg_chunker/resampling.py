@@ -0,0 +1,186 @@
+import math
+
+import numpy as np
+from scipy import signal
+
+# Shape parameter of the Kaiser window of the anti-aliasing filters, which is the default of
+# signal.resample_poly.
+KAISER_BETA = 5.0
+
+# Number of zero crossings of the windowed sinc on each side of its center.
+SINC_ZERO_CROSSINGS = 10
+
+# Number of output samples computed at once by the windowed sinc resampler, which bounds the memory
+# used to gather the input samples of each output sample.
+SINC_BLOCK_SIZE = 4096
+
+
+class PolyphaseDecimator:
+    """
+    Streaming decimation of a signal by an integer factor, which produces the same samples as
+    signal.resample_poly(values, 1, factor) on the whole signal. The input samples still needed by
+    the filter are carried between calls, so that the output does not depend on how the input is
+    split in windows.
+    """
+
+    def __init__(self, input_size, factor):
+        self.factor = factor
+        self.output_size = math.ceil(input_size / factor)
+        # Same filter as signal.resample_poly, centered on the input sample of each output sample.
+        self.half_length = 10 * factor
+        self.filter = signal.firwin(2 * self.half_length + 1, 1 / factor, window=('kaiser', KAISER_BETA))
+        self.buffer = None
+        self.output_count = 0
+
+    def push(self, values):
+        return self.decimate(values, False)
+
+    def flush(self):
+        return self.decimate(None, True)
+
+    def decimate(self, values, final):
+        if self.buffer is None:
+            if values is None:
+                return np.empty((0,))
+
+            # The signal is padded with zeros before its start, like in signal.resample_poly.
+            self.buffer = np.zeros((*values.shape[:-1], self.half_length), dtype=values.dtype)
+
+        parts = [self.buffer]
+        if values is not None:
+            parts.append(values)
+        if final:
+            # And after its end.
+            parts.append(np.zeros((*self.buffer.shape[:-1], self.half_length + self.factor), self.buffer.dtype))
+        buffer = np.concatenate(parts, axis=-1)
+
+        # The buffer starts half a filter before the input sample of the next output sample, so the
+        # decimated convolution has its first complete output at 2 * half_length / factor.
+        first_output = 2 * self.half_length // self.factor
+        output_count = max((buffer.shape[-1] - 1) // self.factor + 1 - first_output, 0)
+        output_count = min(output_count, self.output_size - self.output_count)
+        outputs = signal.upfirdn(self.filter.astype(buffer.dtype), buffer, 1, self.factor, axis=-1)
+        outputs = outputs[..., first_output:first_output + output_count]
+
+        self.output_count += output_count
+        self.buffer = buffer[..., output_count * self.factor:]
+        return outputs
+
+
+class SincResampler:
+    """
+    Streaming resampling of a signal of known size to another size by interpolation with a Kaiser
+    windowed sinc, whose cutoff frequency is the Nyquist frequency of the smallest of the two sizes.
+    Like PolyphaseDecimator, the signal is padded with zeros and the input samples still needed by
+    the filter are carried between calls.
+    """
+
+    def __init__(self, input_size, output_size):
+        self.ratio = input_size / output_size
+        self.output_size = output_size
+        self.cutoff = min(1.0, 1 / self.ratio)
+        # Half width of the windowed sinc in input samples.
+        self.half_width = SINC_ZERO_CROSSINGS / self.cutoff
+        self.tap_offsets = np.arange(-math.ceil(self.half_width), math.ceil(self.half_width) + 2)
+        self.buffer = None
+        # Index in the signal of the first sample of the buffer.
+        self.buffer_start = -len(self.tap_offsets)
+        self.output_count = 0
+
+    def push(self, values):
+        return self.resample(values, False)
+
+    def flush(self):
+        return self.resample(None, True)
+
+    def resample(self, values, final):
+        if self.buffer is None:
+            if values is None:
+                return np.empty((0,))
+
+            self.buffer = np.zeros((*values.shape[:-1], len(self.tap_offsets)), dtype=values.dtype)
+
+        parts = [self.buffer]
+        if values is not None:
+            parts.append(values)
+        if final:
+            parts.append(np.zeros((*self.buffer.shape[:-1], len(self.tap_offsets)), self.buffer.dtype))
+        buffer = np.concatenate(parts, axis=-1)
+
+        # Output samples are only produced once all the input samples of their filter are known,
+        # unless the input is complete.
+        if final:
+            output_end = self.output_size
+        else:
+            input_end = self.buffer_start + buffer.shape[-1] - self.tap_offsets[-1]
+            output_end = min(max(math.ceil(input_end / self.ratio), self.output_count), self.output_size)
+
+        outputs = []
+        for block_start in range(self.output_count, output_end, SINC_BLOCK_SIZE):
+            positions = np.arange(block_start, min(block_start + SINC_BLOCK_SIZE, output_end)) * self.ratio
+            taps = np.floor(positions).astype(int)[:, np.newaxis] + self.tap_offsets
+            distances = positions[:, np.newaxis] - taps
+            weights = np.sinc(self.cutoff * distances) * np.i0(
+                KAISER_BETA * np.sqrt(np.clip(1 - (distances / self.half_width) ** 2, 0, None))
+            ) * (np.abs(distances) <= self.half_width)
+            # The weights are normalized so that a constant signal is left unchanged.
+            weights /= weights.sum(axis=-1, keepdims=True)
+            block = np.einsum('...ot,ot->...o', buffer[..., taps - self.buffer_start], weights)
+            outputs.append(block.astype(buffer.dtype))
+
+        self.output_count = output_end
+        if self.output_count < self.output_size:
+            # Keep the input samples from the first tap of the next output sample.
+            next_start = math.floor(self.output_count * self.ratio) + self.tap_offsets[0]
+            buffer = buffer[..., max(next_start - self.buffer_start, 0):]
+            self.buffer_start = max(next_start, self.buffer_start)
+
+        self.buffer = buffer
+        if not outputs:
+            return buffer[..., :0]
+
+        return np.concatenate(outputs, axis=-1)
+
+
+class DecimationStage:
+    """
+    Streaming decimation of a signal of known size to a smaller (or, for very short signals, larger)
+    size, by the largest integer factor that does not go below the output size with a polyphase
+    filter, and by the remaining factor, lower than 2, with a windowed sinc. This is the same
+    decimation as chunking.decimate_channel, the filter state being carried between calls.
+    """
+
+    def __init__(self, input_size, output_size):
+        self.resamplers = []
+        factor = input_size // output_size
+        if factor > 1:
+            self.resamplers.append(PolyphaseDecimator(input_size, factor))
+            input_size = math.ceil(input_size / factor)
+        if input_size != output_size:
+            self.resamplers.append(SincResampler(input_size, output_size))
+
+    def push(self, values):
+        for resampler in self.resamplers:
+            values = resampler.push(values)
+        return values
+
+    def flush(self):
+        values = None
+        for resampler in self.resamplers:
+            if values is None:
+                values = resampler.flush()
+            else:
+                values = np.concatenate((resampler.push(values), resampler.flush()), axis=-1)
+        return values
+
+
+def decimate(values, size):
+    """
+    Decimate a whole signal to the given size, see DecimationStage.
+    """
+
+    if values.shape[-1] == size:
+        return values
+
+    stage = DecimationStage(values.shape[-1], size)
+    return np.concatenate((stage.push(values), stage.flush()), axis=-1)
@@ -2,17 +2,25 @@
 
 import argparse
 import sys
+from functools import partial
 
 import mne.io
 import mne.io.edf.edf as mne_edf
 
 from loris_eeg_chunker.chunking import write_chunk_directory
+from loris_eeg_chunker.edf import EdfReader, UnsupportedEdfError, is_stim_channel
+from loris_eeg_chunker.encoding import COMPRESSIONS
+from loris_eeg_chunker.streaming import write_streamed_chunk_directory
 
 
 def load_channels(exclude):
     return lambda path : mne.io.read_raw_edf(path, exclude=exclude, preload=False)
 
 
+def load_picked_channels(edf_reader, channel_names):
+    return lambda path : edf_reader.pick(channel_names)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Convert .edf files to chunks for browser based visualisation.')
@@ -30,9 +38,86 @@ def main():
                         help='optional destination for all the chunk directories')
     parser.add_argument('--prefix', '-p', dest="prefix", type=str,
                         help='optional prefixing parent folder name each directory of chunks gets placed under')
+    parser.add_argument('--channel-block', '-b', dest='channel_block', type=int, default=1,
+                        help='Number of channels read and chunked together in a single pass over the file, '
+                             'which bounds the memory used')
+    parser.add_argument('--max-seconds', '-m', dest='max_seconds', type=float,
+                        help='stream the file in windows of at most this number of seconds of signal '
+                             'instead of loading whole channels in memory')
+    parser.add_argument('--packed', dest='packed', action='store_true',
+                        help='write the chunks of each downsampling level and channel back to back in a single file')
+    parser.add_argument('--quantize-bits', '-q', dest='quantization_bits', type=int,
+                        help='store the samples as integers of this number of bits (2 to 32) with a scale and an '
+                             'offset per channel instead of 32 bits floats')
+    parser.add_argument('--lossless', dest='lossless', action='store_true',
+                        help='store the integer samples of EDF and BDF files with the scale and offset of the file, '
+                             'which preserves the original samples')
+    parser.add_argument('--compression', dest='compression', choices=COMPRESSIONS,
+                        help='compress the quantized chunks')
 
     args = parser.parse_args()
+    if args.channel_index < 0:
+        sys.exit("Channel index must be a positive integer")
+
+    if args.channel_count and args.channel_count < 0:
+        sys.exit("Channel count must be a positive integer")
+
+    if args.channel_block < 1:
+        sys.exit("Channel block must be a positive integer")
+
+    if args.max_seconds is not None and args.max_seconds <= 0:
+        sys.exit("Max seconds must be a positive number")
+
+    if args.compression and args.quantization_bits is None and not args.lossless:
+        sys.exit("Compression requires --quantize-bits or --lossless")
+
     for path in args.files:
+        try:
+            write_edf_chunk_directory(
+                path,
+                chunk_size=args.chunk_size,
+                channel_index=args.channel_index,
+                channel_count=args.channel_count,
+                channel_block=args.channel_block,
+                destination=args.destination,
+                prefix=args.prefix,
+                packed=args.packed,
+                quantization_bits=args.quantization_bits,
+                compression=args.compression,
+                lossless=args.lossless,
+                max_seconds=args.max_seconds
+            )
+        except ValueError as error:
+            sys.exit(str(error))
+
+
+def write_edf_chunk_directory(path, chunk_size=5000, channel_index=0, channel_count=None, channel_block=1,
+                              destination=None, prefix=None, packed=False, quantization_bits=None,
+                              compression=None, lossless=False, max_seconds=None, verbose=True):
+    if max_seconds is None:
+        write = write_chunk_directory
+    else:
+        write = partial(write_streamed_chunk_directory, max_seconds=max_seconds)
+
+    write = partial(write, quantization_bits=quantization_bits, compression=compression, lossless=lossless,
+                    verbose=verbose)
+
+    # read the file with the native memory-mapped reader if possible, and with MNE otherwise
+    try:
+        edf_reader = EdfReader(path)
+    except UnsupportedEdfError as error:
+        # the samples of the files read with MNE are not scaled back to their original integers
+        if lossless:
+            raise ValueError(f'{error}, it cannot be chunked losslessly')
+
+        if verbose:
+            print(f'{error}, the file is read with MNE')
+        edf_reader = None
+
+    if edf_reader is not None:
+        channel_names = edf_reader.ch_names
+        stim_channel_idxs = [i for i, channel_name in enumerate(channel_names) if is_stim_channel(channel_name)]
+    else:
         _, edf_info, _ = mne_edf._get_info(
             path,
             stim_channel='auto',
@@ -43,25 +128,23 @@ def main():
             file_type=mne_edf.FileType.EDF,
         )
         channel_names = edf_info['ch_names']
+        stim_channel_idxs = edf_info['stim_channel_idxs']
 
-        if args.channel_index < 0:
-            sys.exit("Channel index must be a positive integer")
+    if channel_index >= len(channel_names):
+        raise ValueError("Channel index exceeds the number of channels")
 
-        if args.channel_index >= len(channel_names):
-            sys.exit("Channel index exceeds the number of channels")
+    if channel_index in stim_channel_idxs:
+        return
 
-        if args.channel_count and args.channel_count < 0:
-            sys.exit("Channel count must be a positive integer")
-
-        if args.channel_index in edf_info['stim_channel_idxs']:
-            continue
-
-        if not args.channel_count:
-            args.channel_count = len(channel_names) - args.channel_index
-
-        for i in range(args.channel_count):
-            channel_index = args.channel_index + i
+    if not channel_count:
+        channel_count = len(channel_names) - channel_index
 
+    channel_indices = []
+    for channel_index in range(channel_index, channel_index + channel_count):
+        if edf_reader is not None:
+            if is_stim_channel(channel_names[channel_index]):
+                continue
+        else:
             # check if channel_index is a stim channel
             # to avoid a bug in mne.io.edf.edf
             # (see issue https://github.com/mne-tools/mne-python/issues/9811)
@@ -71,22 +154,36 @@ def main():
             if len(stim_channel_idxs) == 1:
                 continue
 
-            print(f'Creating chunk for channel {i} for {path}')
+        channel_indices.append(channel_index)
+
+    for i in range(0, len(channel_indices), channel_block):
+        block_indices = channel_indices[i:i + channel_block]
+        block_names = [channel_names[channel_index] for channel_index in block_indices]
 
+        if verbose:
+            print(f'Creating chunks for channels {block_indices[0]} to {block_indices[-1]} for {path}')
+
+        if edf_reader is not None:
+            # the native reader only reads the samples of the channels of the current block
+            loader = load_picked_channels(edf_reader, block_names)
+        else:
             # excluding channels in the loader reduce the time required to read the file
             # and avoid memory issues
-            # we only load the channel at index channel_index+i
-            exclude = channel_names[:channel_index] + channel_names[channel_index + 1:]
-            write_chunk_directory(
-                path=path,
-                loader=load_channels(exclude),
-                from_channel_index=channel_index,
-                from_channel_name=channel_names[channel_index],
-                channel_count=1,
-                chunk_size=args.chunk_size,
-                destination=args.destination,
-                prefix=args.prefix
-            )
+            # we only load the channels of the current block, which are read in a single pass
+            exclude = [channel_name for channel_name in channel_names if channel_name not in block_names]
+            loader = load_channels(exclude)
+
+        write(
+            path=path,
+            loader=loader,
+            from_channel_name=block_names[0],
+            channel_count=len(block_names),
+            channel_indices=block_indices,
+            chunk_size=chunk_size,
+            destination=destination,
+            prefix=prefix,
+            packed=packed
+        )
 
 
 if __name__ == '__main__':
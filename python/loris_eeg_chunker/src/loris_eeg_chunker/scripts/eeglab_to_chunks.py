@@ -2,17 +2,24 @@
 
 import argparse
 import sys
+from functools import partial
 
 import mne.io
-import mne.io.eeglab.eeglab as mne_eeglab
 
 from loris_eeg_chunker.chunking import write_chunk_directory
+from loris_eeg_chunker.eeglab import EeglabReader, UnsupportedEeglabError
+from loris_eeg_chunker.encoding import COMPRESSIONS
+from loris_eeg_chunker.streaming import write_streamed_chunk_directory
 
 
 def load_channels(path):
     return mne.io.read_raw_eeglab(path, preload=False)
 
 
+def load_picked_channels(eeglab_reader, channel_names):
+    return lambda path : eeglab_reader.pick(channel_names)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Convert .set files to chunks for browser based visualisation.')
@@ -30,32 +37,117 @@ def main():
                         help='optional destination for all the chunk directories')
     parser.add_argument('--prefix', '-p', dest="prefix", type=str,
                         help='optional prefixing parent folder name each directory of chunks gets placed under')
+    parser.add_argument('--channel-block', '-b', dest='channel_block', type=int, default=1,
+                        help='Number of channels read and chunked together in a single pass over the file, '
+                             'which bounds the memory used')
+    parser.add_argument('--max-seconds', '-m', dest='max_seconds', type=float,
+                        help='stream the file in windows of at most this number of seconds of signal '
+                             'instead of loading whole channels in memory')
+    parser.add_argument('--packed', dest='packed', action='store_true',
+                        help='write the chunks of each downsampling level and channel back to back in a single file')
+    parser.add_argument('--quantize-bits', '-q', dest='quantization_bits', type=int,
+                        help='store the samples as integers of this number of bits (2 to 32) with a scale and an '
+                             'offset per channel instead of 32 bits floats')
+    parser.add_argument('--compression', dest='compression', choices=COMPRESSIONS,
+                        help='compress the quantized chunks')
 
     args = parser.parse_args()
+    if args.channel_index < 0:
+        sys.exit("Channel index must be a positive integer")
+
+    if args.channel_count and args.channel_count < 0:
+        sys.exit("Channel count must be a positive integer")
+
+    if args.channel_block < 1:
+        sys.exit("Channel block must be a positive integer")
+
+    if args.max_seconds is not None and args.max_seconds <= 0:
+        sys.exit("Max seconds must be a positive number")
+
+    if args.compression and args.quantization_bits is None:
+        sys.exit("Compression requires --quantize-bits")
+
     for path in args.files:
-        eeg = mne_eeglab._check_load_mat(path, None)
-        eeglab_info = mne_eeglab._get_info(eeg, eog=(), montage_units="auto")
-        channel_names = eeglab_info[0]['ch_names']
+        try:
+            write_eeglab_chunk_directory(
+                path,
+                chunk_size=args.chunk_size,
+                channel_index=args.channel_index,
+                channel_count=args.channel_count,
+                channel_block=args.channel_block,
+                destination=args.destination,
+                prefix=args.prefix,
+                packed=args.packed,
+                quantization_bits=args.quantization_bits,
+                compression=args.compression,
+                max_seconds=args.max_seconds
+            )
+        except ValueError as error:
+            sys.exit(str(error))
 
-        if args.channel_index < 0:
-            sys.exit("Channel index must be a positive integer")
 
-        if args.channel_index >= len(channel_names):
-            sys.exit("Channel index exceeds the number of channels")
+def write_eeglab_chunk_directory(path, chunk_size=5000, channel_index=0, channel_count=None, channel_block=1,
+                                 destination=None, prefix=None, packed=False, quantization_bits=None,
+                                 compression=None, max_seconds=None, verbose=True):
+    if max_seconds is None:
+        write = write_chunk_directory
+    else:
+        write = partial(write_streamed_chunk_directory, max_seconds=max_seconds)
 
-        if args.channel_count and args.channel_count < 0:
-            sys.exit("Channel count must be a positive integer")
+    write = partial(write, quantization_bits=quantization_bits, compression=compression, verbose=verbose)
 
-        print(f'Creating chunks for {path}')
-        write_chunk_directory(
+    # read the .fdt file of the dataset with the native memory-mapped reader if possible, and the
+    # whole dataset with MNE otherwise
+    try:
+        eeglab_reader = EeglabReader(path)
+        channel_names = eeglab_reader.ch_names
+    except UnsupportedEeglabError as error:
+        if verbose:
+            print(f'{error}, the file is read with MNE')
+        eeglab_reader = None
+        # the header loaded by the native reader gives the channel names
+        channel_names = error.header.ch_names
+
+    if channel_index >= len(channel_names):
+        raise ValueError("Channel index exceeds the number of channels")
+
+    if eeglab_reader is None:
+        if verbose:
+            print(f'Creating chunks for {path}')
+        write(
             path=path,
-            from_channel_index=args.channel_index,
-            from_channel_name=channel_names[args.channel_index],
-            channel_count=args.channel_count,
+            from_channel_index=channel_index,
+            from_channel_name=channel_names[channel_index],
+            channel_count=channel_count,
             loader=load_channels,
-            chunk_size=args.chunk_size,
-            destination=args.destination,
-            prefix=args.prefix
+            chunk_size=chunk_size,
+            destination=destination,
+            prefix=prefix,
+            packed=packed
+        )
+        return
+
+    if not channel_count:
+        channel_count = len(channel_names) - channel_index
+
+    channel_indices = list(range(channel_index, min(channel_index + channel_count, len(channel_names))))
+    for i in range(0, len(channel_indices), channel_block):
+        # the native reader only reads the samples of the channels of the current block
+        block_indices = channel_indices[i:i + channel_block]
+        block_names = [channel_names[channel_index] for channel_index in block_indices]
+
+        if verbose:
+            print(f'Creating chunks for channels {block_indices[0]} to {block_indices[-1]} for {path}')
+        write(
+            path=path,
+            loader=load_picked_channels(eeglab_reader, block_names),
+            from_channel_name=block_names[0],
+            channel_count=len(block_names),
+            channel_indices=block_indices,
+            chunk_size=chunk_size,
+            destination=destination,
+            prefix=prefix,
+            packed=packed
         )
 
 
@@ -0,0 +1,219 @@
+import itertools
+import os
+
+import numpy as np
+
+from loris_eeg_chunker.chunking import (
+    channel_encoding,
+    chunk_dir_path,
+    create_path_dirs,
+    downsampled_sizes,
+    encode_channel_chunk,
+    packed_chunk_path,
+    select_channels,
+    write_index_json,
+)
+from loris_eeg_chunker.resampling import DecimationStage
+
+
+class ChunkWriter:
+    """
+    Split the samples of a downsampling level in chunks and write each chunk as soon as it is
+    complete, using either the chunk tree or the packed container.
+    """
+
+    def __init__(self, chunk_dir, downsampling, chunk_size, channel_indices, packed, encoding=None,
+                 quantizations=None):
+        self.chunk_dir = chunk_dir
+        self.downsampling = downsampling
+        self.chunk_size = chunk_size
+        self.channel_indices = channel_indices
+        self.packed = packed
+        self.encoding = encoding
+        self.quantizations = quantizations
+        self.buffer = np.empty((len(channel_indices), 0), dtype=np.float32)
+        self.chunk_count = 0
+        self.chunk_offsets = [[0] for _ in channel_indices]
+
+        if packed:
+            create_path_dirs(os.path.join(chunk_dir, 'raw', str(downsampling)))
+            for channel_index in channel_indices:
+                open(packed_chunk_path(chunk_dir, downsampling, channel_index), 'wb').close()
+        else:
+            for channel_index in channel_indices:
+                create_path_dirs(os.path.join(chunk_dir, 'raw', str(downsampling), str(channel_index), '0'))
+
+    def push(self, values):
+        self.buffer = np.concatenate((self.buffer, values), axis=-1)
+        chunk_count = self.buffer.shape[-1] // self.chunk_size
+        for i in range(chunk_count):
+            self.write_chunk(self.buffer[:, i * self.chunk_size:(i + 1) * self.chunk_size])
+        self.buffer = self.buffer[:, chunk_count * self.chunk_size:]
+
+    def flush(self):
+        if self.buffer.shape[-1]:
+            padding = self.chunk_size - self.buffer.shape[-1]
+            self.write_chunk(np.pad(self.buffer, [(0, 0), (0, padding)], 'edge'))
+            self.buffer = self.buffer[:, :0]
+
+    def write_chunk(self, chunk):
+        for channel_offset, channel_index in enumerate(self.channel_indices):
+            encoded_chunk = encode_channel_chunk(
+                chunk[channel_offset],
+                self.chunk_count,
+                self.downsampling,
+                self.encoding,
+                self.quantizations[channel_offset] if self.quantizations else None
+            )
+            if self.packed:
+                chunk_path = packed_chunk_path(self.chunk_dir, self.downsampling, channel_index)
+                offsets = self.chunk_offsets[channel_offset]
+                offsets.append(offsets[-1] + len(encoded_chunk))
+                mode = 'ab'
+            else:
+                chunk_path = os.path.join(
+                    self.chunk_dir, 'raw', str(self.downsampling), str(channel_index), '0', str(self.chunk_count)
+                ) + '.buf'
+                mode = 'wb'
+
+            with open(chunk_path, mode) as chunk_file:
+                chunk_file.write(encoded_chunk)
+
+        self.chunk_count += 1
+
+
+def read_level_ranges(parsed, channel_names, window_size, sizes, levels):
+    # Range of the samples of each channel over the written downsampling levels, which is wider than
+    # the range of the original samples since the anti-aliasing filters overshoot at sharp
+    # transitions. The levels are decimated as in write_streamed_chunk_directory, without being
+    # written.
+    channel_mins = np.full(len(channel_names), np.inf)
+    channel_maxs = np.full(len(channel_names), -np.inf)
+    stages = [
+        DecimationStage(input_size, output_size)
+        for input_size, output_size in itertools.pairwise(sizes)
+    ]
+
+    def update(level, values):
+        nonlocal channel_mins, channel_maxs
+        if len(sizes) - 1 - level < levels and values.shape[-1]:
+            channel_mins = np.minimum(channel_mins, values.min(axis=-1))
+            channel_maxs = np.maximum(channel_maxs, values.max(axis=-1))
+
+    for start in range(0, parsed.n_times, window_size):
+        values = parsed.get_data(channel_names, start=start, stop=min(start + window_size, parsed.n_times))
+        values = values.astype(np.float32)
+        for i in range(len(sizes)):
+            update(i, values)
+            if i < len(stages):
+                values = stages[i].push(values)
+
+    values = np.empty((len(channel_names), 0), dtype=np.float32)
+    for i in range(len(sizes)):
+        update(i, values)
+        if i < len(stages):
+            values = np.concatenate((stages[i].push(values), stages[i].flush()), axis=-1)
+
+    return [(float(channel_min), float(channel_max)) for channel_min, channel_max in zip(channel_mins, channel_maxs)]
+
+
+def write_streamed_chunk_directory(path, chunk_size, loader, from_channel_index=0, from_channel_name=None,
+                                   channel_count=None, downsamplings=None, prefix=None, destination=None,
+                                   packed=False, channel_indices=None, quantization_bits=None, compression=None,
+                                   lossless=False, max_seconds=60, verbose=True):
+    # Same as write_chunk_directory, but the signal is read in windows of at most max_seconds and the
+    # chunks of all the downsampling levels are written as the windows are processed, so that the
+    # memory used does not depend on the length of the recording.
+    chunk_dir = chunk_dir_path(path, prefix=prefix, destination=destination)
+    parsed = loader(path)
+    selected_channels = select_channels(parsed.info['ch_names'], from_channel_name, channel_count)
+    if channel_indices is None:
+        channel_indices = [from_channel_index + i for i in range(len(selected_channels))]
+
+    size = int(parsed.n_times)
+    sfreq = parsed.info['sfreq']
+    window_size = max(int(max_seconds * sfreq), 1)
+
+    # Sizes from the finest to the coarsest level, levels on disk being numbered from the coarsest.
+    sizes = downsampled_sizes(size, chunk_size)
+    levels = len(sizes) if downsamplings is None else min(downsamplings, len(sizes))
+
+    # The quantization of the chunks of a range-based encoding depends on the ranges of the levels,
+    # which are only known after a first pass over the file.
+    channel_ranges = None
+    if quantization_bits is not None and not lossless:
+        channel_ranges = read_level_ranges(parsed, selected_channels, window_size, sizes, levels)
+
+    encoding, quantizations = channel_encoding(
+        parsed, selected_channels, channel_ranges, quantization_bits, compression, lossless
+    )
+
+    # Lossless chunks of 24 bits BDF samples need more precision than float32.
+    dtype = np.float64 if lossless else np.float32
+    writers = [
+        ChunkWriter(chunk_dir, len(sizes) - 1 - i, chunk_size, channel_indices, packed, encoding, quantizations)
+        if len(sizes) - 1 - i < levels else None
+        for i in range(len(sizes))
+    ]
+
+    stages = [
+        DecimationStage(input_size, output_size)
+        for input_size, output_size in itertools.pairwise(sizes)
+    ]
+
+    channel_mins = np.full(len(selected_channels), np.inf)
+    channel_maxs = np.full(len(selected_channels), -np.inf)
+    for start in range(0, size, window_size):
+        if verbose:
+            print(f'Processing samples {start} to {min(start + window_size, size)} of {size}')
+        values = parsed.get_data(selected_channels, start=start, stop=min(start + window_size, size))
+        channel_mins = np.minimum(channel_mins, values.min(axis=-1))
+        channel_maxs = np.maximum(channel_maxs, values.max(axis=-1))
+        values = values.astype(dtype)
+        for i, writer in enumerate(writers):
+            if writer is not None:
+                writer.push(values)
+            if i < len(stages):
+                values = stages[i].push(values)
+
+    # Write the incomplete chunks and flush the decimation stages, from the finest to the coarsest.
+    values = np.empty((len(selected_channels), 0), dtype=np.float32)
+    for i, writer in enumerate(writers):
+        if writer is not None:
+            writer.push(values)
+            writer.flush()
+        if i < len(stages):
+            values = np.concatenate((stages[i].push(values), stages[i].flush()), axis=-1)
+
+    channel_metadata = [
+        {
+            'name': selected_channels[i],
+            'seriesRange': (channel_mins[i], channel_maxs[i]),
+            'index': channel_indices[i]
+        }
+        for i in range(len(selected_channels))
+    ]
+
+    if quantizations:
+        for i, (scale, offset) in enumerate(quantizations):
+            channel_metadata[i]['scale'] = scale
+            channel_metadata[i]['offset'] = offset
+
+    coarse_writers = [writer for writer in reversed(writers) if writer is not None]
+    if packed:
+        for i, metadata in enumerate(channel_metadata):
+            metadata['chunkOffsets'] = [writer.chunk_offsets[i] for writer in coarse_writers]
+
+    write_index_json(
+        chunk_dir,
+        (0.0, (size - 1) / sfreq),
+        [float(np.min(channel_mins)), float(np.max(channel_maxs))],
+        channel_metadata,
+        chunk_size,
+        [level_size % chunk_size or chunk_size for level_size in reversed(sizes)],
+        list(range(len(coarse_writers))),
+        [[len(selected_channels), 1, writer.chunk_count, chunk_size] for writer in coarse_writers],
+        container='packed' if packed else 'tree',
+        encoding=encoding,
+        verbose=verbose
+    )
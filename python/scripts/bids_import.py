@@ -4,9 +4,14 @@
 
 import getopt
 import json
+import multiprocessing
 import os
 import re
+import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import lib.exitcode
 import lib.physiological
@@ -17,6 +22,7 @@ from lib.config_file import load_config
 from lib.database import Database
 from lib.database_lib.config import Config
 from lib.eeg import Eeg
+from lib.hed_schema import get_hed_schema_index
 from lib.mri import Mri
 from lib.session import Session
 from lib.util.crypto import compute_file_blake2b_hash
@@ -32,12 +38,14 @@ def main():
     type             = None
     profile          = None
     nocopy           = False
+    layout_cache_dir = None
+    jobs             = 1
 
     long_options = [
         "help",             "profile=",      "directory=",
         "createcandidate",  "createsession", "idsvalidation",
         "nobidsvalidation", "nocopy",        "type=",
-        "verbose"
+        "layoutcache=",     "jobs=",         "verbose"
     ]
     usage        = (
         '\n'
@@ -54,11 +62,13 @@ def main():
         '\t-t, --type             : raw | derivative. Specify the dataset type.'
                                     'If not set, the pipeline will look for both raw and derivative files.\n'
                                     'Required if no dataset_description.json is found.\n'
+        '\t-l, --layoutcache      : directory in which to persist the BIDS layout index between runs (optional)\n'
+        '\t-j, --jobs             : number of subjects imported in parallel (default: 1)\n'
         '\t-v, --verbose          : be verbose\n'
     )
 
     try:
-        opts, _ = getopt.getopt(sys.argv[1:], 'hp:d:csinat:v', long_options)
+        opts, _ = getopt.getopt(sys.argv[1:], 'hp:d:csinat:l:j:v', long_options)
     except getopt.GetoptError:
         print(usage)
         sys.exit(lib.exitcode.GETOPT_FAILURE)
@@ -85,10 +95,17 @@ def main():
             nocopy = True
         elif opt in ('-t', '--type'):
             type = arg
+        elif opt in ('-l', '--layoutcache'):
+            layout_cache_dir = arg
+        elif opt in ('-j', '--jobs'):
+            try:
+                jobs = int(arg)
+            except ValueError:
+                jobs = 0
 
     # input error checking and load config_file file
     config_file = load_config(profile)
-    input_error_checking(bids_dir, usage)
+    input_error_checking(bids_dir, jobs, usage)
 
     dataset_json = bids_dir + "/dataset_description.json"
     if not os.path.isfile(dataset_json) and not type:
@@ -121,16 +138,20 @@ def main():
         nobidsvalidation,
         type,
         nocopy,
-        db
+        db,
+        layout_cache_dir,
+        jobs
     )
 
 
-def input_error_checking(bids_dir, usage):
+def input_error_checking(bids_dir, jobs, usage):
     """
     Checks whether the required inputs are set and that paths are valid.
 
     :param bids_dir: path to the BIDS directory to parse and insert into LORIS
      :type bids_dir: str
+    :param jobs    : number of subjects to import in parallel
+     :type jobs    : int
     :param usage   : script usage to be displayed when encountering an error
      :type usage   : st
     """
@@ -149,10 +170,17 @@ def input_error_checking(bids_dir, usage):
         print(usage)
         sys.exit(lib.exitcode.INVALID_PATH)
 
+    if jobs < 1:
+        message = '\n\tERROR: the value for --jobs option must be a positive integer'
+        print(message)
+        print(usage)
+        sys.exit(lib.exitcode.INVALID_ARG)
+
 
 def read_and_insert_bids(
     bids_dir,      data_dir,      verbose, createcand, createvisit,
-    idsvalidation, nobidsvalidation, type,    nocopy,  db
+    idsvalidation, nobidsvalidation, type,    nocopy,  db,
+    layout_cache_dir=None, jobs=1
 ):
     """
     Read the provided BIDS structure and import it into the database.
@@ -177,6 +205,10 @@ def read_and_insert_bids(
      :type nocopy           : bool
     :param db               : db object
      :type db               : object
+    :param layout_cache_dir : directory in which to persist the BIDS layout index
+     :type layout_cache_dir : str
+    :param jobs             : number of subjects to import in parallel
+     :type jobs             : int
 
     """
 
@@ -188,125 +220,197 @@ def read_and_insert_bids(
     if idsvalidation:
         validateids(bids_dir, db, verbose)
 
-    # load the BIDS directory
-    if nobidsvalidation:
-        bids_reader = BidsReader(bids_dir, verbose, False)
-    else:
-        bids_reader = BidsReader(bids_dir, verbose)
-    if not bids_reader.participants_info          \
-            or not bids_reader.cand_sessions_list \
-            or not bids_reader.cand_session_modalities_list:
-        message = '\n\tERROR: could not properly parse the following' \
-                  'BIDS directory:' + bids_dir + '\n'
-        print(message)
-        sys.exit(lib.exitcode.UNREADABLE_FILE)
+    # the import workers load the layout indexed by the main process rather
+    # than indexing the whole dataset again
+    tmp_layout_cache_dir = None
+    if jobs > 1 and not layout_cache_dir:
+        tmp_layout_cache_dir = tempfile.mkdtemp(prefix='bids_layout_')
+        layout_cache_dir = tmp_layout_cache_dir
 
-    loris_bids_root_dir = None
-    if not nocopy:
-        # create the LORIS_BIDS directory in data_dir based on Name and BIDS version
-        loris_bids_root_dir = create_loris_bids_directory(
-            bids_reader, data_dir, verbose
-        )
+    # the temporary layout index is removed even if the import exits early
+    try:
+        # load the BIDS directory
+        if nobidsvalidation:
+            bids_reader = BidsReader(bids_dir, verbose, False, layout_cache_dir)
+        else:
+            bids_reader = BidsReader(bids_dir, verbose, cache_dir=layout_cache_dir)
+        if not bids_reader.participants_info          \
+                or not bids_reader.cand_sessions_list \
+                or not bids_reader.cand_session_modalities_list:
+            message = '\n\tERROR: could not properly parse the following' \
+                      'BIDS directory:' + bids_dir + '\n'
+            print(message)
+            sys.exit(lib.exitcode.UNREADABLE_FILE)
+
+        loris_bids_root_dir = None
+        if not nocopy:
+            # create the LORIS_BIDS directory in data_dir based on Name and BIDS version
+            loris_bids_root_dir = create_loris_bids_directory(
+                bids_reader, data_dir, verbose
+            )
 
-    # Assumption all same project (for project-wide tags)
-    single_project_id = None
+        # Assumption all same project (for project-wide tags)
+        single_project_id = None
 
-    # loop through subjects
-    for bids_subject_info in bids_reader.participants_info:
+        # loop through subjects
+        for bids_subject_info in bids_reader.participants_info:
 
-        # greps BIDS information for the candidate
-        bids_id       = bids_subject_info['participant_id']
-        bids_sessions = bids_reader.cand_sessions_list[bids_id]
+            # greps BIDS information for the candidate
+            bids_id       = bids_subject_info['participant_id']
+            bids_sessions = bids_reader.cand_sessions_list[bids_id]
 
-        # greps BIDS candidate's info from LORIS (creates the candidate if it
-        # does not exist yet in LORIS and the createcand flag is set to true)
-        loris_cand_info = grep_or_create_candidate_db_info(
-            bids_reader, bids_id, db, createcand, verbose
-        )
+            # greps BIDS candidate's info from LORIS (creates the candidate if it
+            # does not exist yet in LORIS and the createcand flag is set to true)
+            loris_cand_info = grep_or_create_candidate_db_info(
+                bids_reader, bids_id, db, createcand, verbose
+            )
 
-        if not nocopy:
-            # create the candidate's directory in the LORIS BIDS import directory
-            lib.utilities.create_dir(loris_bids_root_dir + "sub-" + bids_id, verbose)
+            if not nocopy:
+                # create the candidate's directory in the LORIS BIDS import directory
+                lib.utilities.create_dir(loris_bids_root_dir + "sub-" + bids_id, verbose)
 
-        cand_id    = loris_cand_info['CandID']
-        center_id  = loris_cand_info['RegistrationCenterID']
-        project_id = loris_cand_info['RegistrationProjectID']
-        single_project_id = project_id
+            cand_id    = loris_cand_info['CandID']
+            center_id  = loris_cand_info['RegistrationCenterID']
+            project_id = loris_cand_info['RegistrationProjectID']
+            single_project_id = project_id
 
-        cohort_id = None
-        # TODO: change subproject -> cohort in participants.tsv?
-        if 'subproject' in bids_subject_info:
+            cohort_id = None
             # TODO: change subproject -> cohort in participants.tsv?
-            cohort = bids_subject_info['subproject']
-            cohort_info = db.pselect(
-                "SELECT CohortID FROM cohort WHERE title = %s",
-                [cohort, ]
+            if 'subproject' in bids_subject_info:
+                # TODO: change subproject -> cohort in participants.tsv?
+                cohort = bids_subject_info['subproject']
+                cohort_info = db.pselect(
+                    "SELECT CohortID FROM cohort WHERE title = %s",
+                    [cohort, ]
+                )
+                if len(cohort_info) > 0:
+                    cohort_id = cohort_info[0]['CohortID']
+
+            # greps BIDS session's info for the candidate from LORIS (creates the
+            # session if it does not exist yet in LORIS and the createvisit is set
+            # to true. If no visit in BIDS structure, then use default visit_label
+            # stored in the Config module)
+            grep_candidate_sessions_info(
+                bids_sessions, bids_id,    cand_id,       loris_bids_root_dir,
+                createvisit,   verbose,    db,            default_bids_vl,
+                center_id,     project_id, cohort_id,     nocopy
             )
-            if len(cohort_info) > 0:
-                cohort_id = cohort_info[0]['CohortID']
-
-        # greps BIDS session's info for the candidate from LORIS (creates the
-        # session if it does not exist yet in LORIS and the createvisit is set
-        # to true. If no visit in BIDS structure, then use default visit_label
-        # stored in the Config module)
-        grep_candidate_sessions_info(
-            bids_sessions, bids_id,    cand_id,       loris_bids_root_dir,
-            createvisit,   verbose,    db,            default_bids_vl,
-            center_id,     project_id, cohort_id,     nocopy
+
+        # Import root-level (dataset-wide) events.json
+        # Assumption: Single project for project-wide tags
+        bids_layout = bids_reader.bids_layout
+        root_event_metadata_file = bids_layout.get_nearest(
+            bids_dir,
+            return_type='tuple',
+            strict=False,
+            extension='json',
+            suffix='events',
+            all_=False,
+            subject=None,
+            session=None
         )
 
-    # Import root-level (dataset-wide) events.json
-    # Assumption: Single project for project-wide tags
-    bids_layout = bids_reader.bids_layout
-    root_event_metadata_file = bids_layout.get_nearest(
-        bids_dir,
-        return_type='tuple',
-        strict=False,
-        extension='json',
-        suffix='events',
-        all_=False,
-        subject=None,
-        session=None
-    )
+        dataset_tag_dict = {}
+        if not root_event_metadata_file:
+            message = '\nWARNING: no events metadata files (events.json) in ' \
+                      'root directory'
+            print(message)
+        else:
+            # copy the event file to the LORIS BIDS import directory
+            copy_file = str.replace(
+                root_event_metadata_file.path,
+                bids_layout.root,
+                ""
+            ).lstrip('/')
 
-    dataset_tag_dict = {}
-    if not root_event_metadata_file:
-        message = '\nWARNING: no events metadata files (events.json) in ' \
-                  'root directory'
-        print(message)
-    else:
-        # copy the event file to the LORIS BIDS import directory
-        copy_file = str.replace(
-            root_event_metadata_file.path,
-            bids_layout.root,
-            ""
-        ).lstrip('/')
+            if not nocopy:
+                event_metadata_path = loris_bids_root_dir + copy_file
+                lib.utilities.copy_file(root_event_metadata_file.path, event_metadata_path, verbose)
+
+            hed_union = get_hed_schema_index(db)
+
+            # load json data
+            with open(root_event_metadata_file.path) as metadata_file:
+                event_metadata = json.load(metadata_file)
+            blake2 = compute_file_blake2b_hash(root_event_metadata_file.path)
+            physio = lib.physiological.Physiological(db, verbose)
+            _, dataset_tag_dict = physio.insert_event_metadata(
+                event_metadata=event_metadata,
+                event_metadata_file=event_metadata_path,
+                physiological_file_id=None,
+                project_id=single_project_id,
+                blake2=blake2,
+                project_wide=True,
+                hed_union=hed_union
+            )
 
-        if not nocopy:
-            event_metadata_path = loris_bids_root_dir + copy_file
-            lib.utilities.copy_file(root_event_metadata_file.path, event_metadata_path, verbose)
-
-        # TODO: Move
-        hed_query = 'SELECT * FROM hed_schema_nodes WHERE 1'
-        hed_union = db.pselect(query=hed_query, args=())
-
-        # load json data
-        with open(root_event_metadata_file.path) as metadata_file:
-            event_metadata = json.load(metadata_file)
-        blake2 = compute_file_blake2b_hash(root_event_metadata_file.path)
-        physio = lib.physiological.Physiological(db, verbose)
-        _, dataset_tag_dict = physio.insert_event_metadata(
-            event_metadata=event_metadata,
-            event_metadata_file=event_metadata_path,
-            physiological_file_id=None,
-            project_id=single_project_id,
-            blake2=blake2,
-            project_wide=True,
-            hed_union=hed_union
+        # read list of modalities per session / candidate and register data,
+        # the candidates and sessions being all created at this point
+        subject_session_modalities = {}
+        for row in bids_reader.cand_session_modalities_list:
+            subject_session_modalities.setdefault(row['bids_sub_id'], []).append(row)
+
+        import_args = dict(
+            data_dir            = data_dir,
+            verbose             = verbose,
+            default_bids_vl     = default_bids_vl,
+            loris_bids_root_dir = loris_bids_root_dir,
+            dataset_tag_dict    = dataset_tag_dict,
+            dataset_type        = type,
+            nocopy              = nocopy
         )
+        if jobs > 1:
+            failures = import_subjects_in_pool(
+                subject_session_modalities, import_args, jobs,
+                db.config, bids_dir, not nobidsvalidation, layout_cache_dir
+            )
+        else:
+            failures = import_subjects(bids_reader, db, subject_session_modalities, import_args)
+    finally:
+        if tmp_layout_cache_dir:
+            shutil.rmtree(tmp_layout_cache_dir)
+
+    # disconnect from the database
+    db.disconnect()
+
+    if failures:
+        sys.exit(lib.exitcode.PROGRAM_EXECUTION_FAILURE)
 
-    # read list of modalities per session / candidate and register data
-    for row in bids_reader.cand_session_modalities_list:
+
+def import_subject_modalities(
+    bids_reader,         db,               session_modalities, data_dir, verbose, default_bids_vl,
+    loris_bids_root_dir, dataset_tag_dict, dataset_type,       nocopy
+):
+    """
+    Registers the files of each modality of the sessions of a subject.
+
+    :param bids_reader        : BIDS information handler object
+     :type bids_reader        : object
+    :param db                 : database handler object
+     :type db                 : object
+    :param session_modalities : rows of BidsReader.cand_session_modalities_list of the subject
+     :type session_modalities : list
+    :param data_dir           : LORIS data directory path (with a final /)
+     :type data_dir           : str
+    :param verbose            : if true, prints out information while executing
+     :type verbose            : bool
+    :param default_bids_vl    : default visit label of the sessions without BIDS session
+     :type default_bids_vl    : str
+    :param loris_bids_root_dir: LORIS BIDS import root directory
+     :type loris_bids_root_dir: str
+    :param dataset_tag_dict   : HED tags of the dataset-wide events.json
+     :type dataset_tag_dict   : dict
+    :param dataset_type       : raw | derivative. Type of the dataset
+     :type dataset_type       : str
+    :param nocopy             : if true, skip the assembly_bids dataset copy
+     :type nocopy             : bool
+
+    :return: number of modalities registered
+     :rtype: int
+    """
+
+    modality_count = 0
+    for row in session_modalities:
         bids_session = row['bids_ses_id']
         visit_label  = bids_session if bids_session else default_bids_vl
         loris_bids_visit_rel_dir    = 'sub-' + row['bids_sub_id'] + '/' + 'ses-' + visit_label
@@ -329,8 +433,9 @@ def read_and_insert_bids(
                     loris_bids_eeg_rel_dir = loris_bids_modality_rel_dir,
                     loris_bids_root_dir    = loris_bids_root_dir,
                     dataset_tag_dict       = dataset_tag_dict,
-                    dataset_type           = type
+                    dataset_type           = dataset_type
                 )
+                modality_count += 1
 
             elif modality in ['anat', 'dwi', 'fmap', 'func']:
                 Mri(
@@ -345,9 +450,196 @@ def read_and_insert_bids(
                     loris_bids_mri_rel_dir = loris_bids_modality_rel_dir,
                     loris_bids_root_dir    = loris_bids_root_dir
                 )
+                modality_count += 1
 
-    # disconnect from the database
-    db.disconnect()
+    return modality_count
+
+
+def import_subject(bids_reader, db, bids_sub_id, session_modalities, import_args):
+    """
+    Registers the modalities of the sessions of a subject and reports it.
+
+    :param bids_reader       : BIDS information handler object
+     :type bids_reader       : object
+    :param db                : database handler object
+     :type db                : object
+    :param bids_sub_id       : BIDS ID of the subject
+     :type bids_sub_id       : str
+    :param session_modalities: rows of BidsReader.cand_session_modalities_list of the subject
+     :type session_modalities: list
+    :param import_args       : other arguments of import_subject_modalities
+     :type import_args       : dict
+
+    :return: report of the subject import
+     :rtype: dict
+    """
+
+    start_time = time.monotonic()
+    modality_count = import_subject_modalities(bids_reader, db, session_modalities, **import_args)
+
+    return {
+        'bids_sub_id': bids_sub_id,
+        'sessions'   : len(session_modalities),
+        'modalities' : modality_count,
+        'duration'   : time.monotonic() - start_time,
+    }
+
+
+def import_subjects(bids_reader, db, subject_session_modalities, import_args):
+    """
+    Registers the modalities of the subjects one after the other and prints
+    a summary of the import of each subject. As before, the script exits on
+    the first subject that fails to be imported.
+
+    :param bids_reader               : BIDS information handler object
+     :type bids_reader               : object
+    :param db                        : database handler object
+     :type db                        : object
+    :param subject_session_modalities: session modalities rows of each subject
+     :type subject_session_modalities: dict
+    :param import_args               : other arguments of import_subject_modalities
+     :type import_args               : dict
+
+    :return: list of (BIDS subject ID, error) tuples of the subjects that could not be imported
+     :rtype: list
+    """
+
+    start_time = time.monotonic()
+    reports = []
+    for bids_sub_id, session_modalities in subject_session_modalities.items():
+        reports.append(import_subject(bids_reader, db, bids_sub_id, session_modalities, import_args))
+
+    print_import_summary(reports, [], len(subject_session_modalities), 1, time.monotonic() - start_time)
+    return []
+
+
+# database and BIDS reader of an import worker process, set by init_import_worker
+worker_db          = None
+worker_bids_reader = None
+
+
+def init_import_worker(db_config, verbose, bids_dir, validate, layout_cache_dir):
+    """
+    Initializes an import worker process with its own database connection and
+    BIDS reader, the layout being loaded from the index of the main process.
+
+    :param db_config       : LORIS database credentials
+     :type db_config       : DatabaseConfig
+    :param verbose         : if true, prints out information while executing
+     :type verbose         : bool
+    :param bids_dir        : path to the BIDS directory
+     :type bids_dir        : str
+    :param validate        : whether the BIDS layout was indexed with validation
+     :type validate        : bool
+    :param layout_cache_dir: directory of the BIDS layout index
+     :type layout_cache_dir: str
+    """
+
+    global worker_db, worker_bids_reader
+    worker_db = Database(db_config, verbose)
+    worker_db.connect()
+    worker_bids_reader = BidsReader(bids_dir, verbose, validate, layout_cache_dir)
+
+
+def import_subject_in_worker(bids_sub_id, session_modalities, import_args):
+    """
+    Registers the modalities of the sessions of a subject in an import worker
+    process. See import_subject.
+    """
+
+    return import_subject(worker_bids_reader, worker_db, bids_sub_id, session_modalities, import_args)
+
+
+def import_subjects_in_pool(
+    subject_session_modalities, import_args, jobs, db_config, bids_dir, validate, layout_cache_dir
+):
+    """
+    Registers the modalities of the subjects in a pool of jobs processes and
+    prints a summary of the import of each subject. A subject that fails to be
+    imported does not stop the import of the other subjects.
+
+    :param subject_session_modalities: session modalities rows of each subject
+     :type subject_session_modalities: dict
+    :param import_args               : other arguments of import_subject_modalities
+     :type import_args               : dict
+    :param jobs                      : number of subjects to import in parallel
+     :type jobs                      : int
+    :param db_config                 : LORIS database credentials
+     :type db_config                 : DatabaseConfig
+    :param bids_dir                  : path to the BIDS directory
+     :type bids_dir                  : str
+    :param validate                  : whether the BIDS layout was indexed with validation
+     :type validate                  : bool
+    :param layout_cache_dir          : directory of the BIDS layout index
+     :type layout_cache_dir          : str
+
+    :return: list of (BIDS subject ID, error) tuples of the subjects that could not be imported
+     :rtype: list
+    """
+
+    start_time = time.monotonic()
+    reports    = []
+    failures   = []
+
+    # spawn the worker processes rather than forking them so that they do not
+    # inherit the database connection of the main process
+    with ProcessPoolExecutor(
+        max_workers = jobs,
+        mp_context  = multiprocessing.get_context('spawn'),
+        initializer = init_import_worker,
+        initargs    = (db_config, import_args['verbose'], bids_dir, validate, layout_cache_dir)
+    ) as executor:
+        futures = {}
+        for bids_sub_id, session_modalities in subject_session_modalities.items():
+            future = executor.submit(import_subject_in_worker, bids_sub_id, session_modalities, import_args)
+            futures[future] = bids_sub_id
+
+        for count, future in enumerate(as_completed(futures), start=1):
+            bids_sub_id = futures[future]
+            try:
+                report = future.result()
+            except (Exception, SystemExit) as err:
+                # the import functions exit on error, which only ends the task in a worker
+                if isinstance(err, SystemExit):
+                    err = f'exited with code {err.code}'
+                failures.append((bids_sub_id, err))
+                print(f'[{count}/{len(futures)}] ERROR: failed to import sub-{bids_sub_id}: {err}')
+                continue
+
+            print(f'[{count}/{len(futures)}] Imported sub-{bids_sub_id}')
+            reports.append(report)
+
+    print_import_summary(reports, failures, len(subject_session_modalities), jobs, time.monotonic() - start_time)
+    return failures
+
+
+def print_import_summary(reports, failures, subject_count, jobs, duration):
+    """
+    Prints the report of the import of each subject.
+
+    :param reports      : reports of the subjects imported, as returned by import_subject
+     :type reports      : list
+    :param failures     : list of (BIDS subject ID, error) tuples of the subjects that could not be imported
+     :type failures     : list
+    :param subject_count: number of subjects to import
+     :type subject_count: int
+    :param jobs         : number of subjects imported in parallel
+     :type jobs         : int
+    :param duration     : duration of the import in seconds
+     :type duration     : float
+    """
+
+    print(f'\nImported {len(reports)} of {subject_count} subjects in {duration:.1f} s with {jobs} job(s)')
+    for report in sorted(reports, key=lambda report: report['bids_sub_id']):
+        print(
+            f'\tsub-{report["bids_sub_id"]}: {report["sessions"]} session(s),'
+            f' {report["modalities"]} modalities in {report["duration"]:.1f} s'
+        )
+
+    if failures:
+        print(f'{len(failures)} subject(s) could not be imported:')
+        for bids_sub_id, err in failures:
+            print(f'\tsub-{bids_sub_id}: {err}')
 
 
 def validateids(bids_dir, db, verbose):
@@ -10,6 +10,7 @@ from lib.database import Database
 from lib.database_lib.config import Config
 from lib.exitcode import INVALID_ARG
 from lib.lorisgetopt import LorisGetOpt
+from lib.util.archive import get_archive_manifest_path
 
 
 def main():
@@ -108,242 +109,227 @@ def validate_file_id(db, file_id):
 
 
 def delete_physiological_file_in_db(db, file_id):
-    print(f"\nDropping all DB entries for physiological file: {file_id}\n")
-    print("----------------------------\n")
+    """
+    Deletes the provided physiological file and all its associated entries in the db.
 
-    print("Delete physiological_event_parameter_category_level\n")
-    event_parameter_ids = db.pselect(
-        """
-        SELECT EventParameterID
-        FROM physiological_event_parameter
-        JOIN physiological_event_file USING(EventFileID)
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
+    :param db: database object from the database.py class
+     :type db: Database
+    :param file_id: file id
+     :type file_id: int
+    """
 
-    for event_parameter_id in event_parameter_ids:
-        db.update(
-            """
-            DELETE FROM physiological_event_parameter_category_level
-            WHERE EventParameterID = %s
-            """,
-            (event_parameter_id["EventParameterID"],)
-        )
+    delete_physiological_files_in_db(db, [file_id])
 
-    print("Delete physiological_event_parameter\n")
-    event_file_ids = db.pselect(
-        """
-        SELECT EventFileID
-        FROM physiological_event_file
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
 
-    for event_file_id in event_file_ids:
-        db.update(
-            """
-            DELETE FROM physiological_event_parameter
-            WHERE EventFileID = %s
-            """,
-            (event_file_id["EventFileID"],)
-        )
+def delete_physiological_files_in_db(db, file_ids):
+    """
+    Deletes the provided physiological files and all their associated entries
+    in the db. The entries of each dependent table are deleted with a single
+    statement for all the files, in dependency order, and all the deletions
+    are done in one transaction.
 
-    print("Delete physiological_channel\n")
-    db.update(
-        """
-        DELETE FROM physiological_channel
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
+    :param db: database object from the database.py class
+     :type db: Database
+    :param file_ids: file ids
+     :type file_ids: list
+    """
 
-    print("Delete physiological_electrode\n")
-    electrode_ids = db.pselect(
-        """
-        SELECT PhysiologicalElectrodeID
+    file_ids = list(file_ids)
+    if not file_ids:
+        return
+
+    print(f"\nDropping all DB entries for physiological files: {', '.join(map(str, file_ids))}\n")
+    print("----------------------------\n")
+
+    files_in = ', '.join(['%s'] * len(file_ids))
+
+    # the electrodes, coordinate systems and points of the files are selected
+    # before their relations to the files are deleted
+    electrode_ids = [row['PhysiologicalElectrodeID'] for row in db.pselect(
+        f"""
+        SELECT DISTINCT PhysiologicalElectrodeID
         FROM physiological_coord_system_electrode_rel
-        WHERE PhysiologicalFileID = %s
+        WHERE PhysiologicalFileID IN ({files_in})
         """,
-        (file_id,)
-    )
-
-    print("Delete physiological_coord_system_point_3d_rel\n")
-    # delete all couple from physiological_coord_system_point_3d_rel
-    # that are linked to the selected physiological file
-    coord_system_point_rel = db.pselect(
-        """
-        SELECT ppr.PhysiologicalCoordSystemID, ppr.Point3DID
-        FROM physiological_coord_system_point_3d_rel AS ppr
-            INNER JOIN physiological_coord_system AS p
-                USING (PhysiologicalCoordSystemID)
-            INNER JOIN physiological_coord_system_electrode_rel AS per
-                USING (PhysiologicalCoordSystemID)
-        WHERE per.PhysiologicalFileID = %s
+        tuple(file_ids)
+    )]
+    coord_system_ids = [row['PhysiologicalCoordSystemID'] for row in db.pselect(
+        f"""
+        SELECT DISTINCT PhysiologicalCoordSystemID
+        FROM physiological_coord_system_electrode_rel
+        WHERE PhysiologicalFileID IN ({files_in})
         """,
-        (file_id,)
-    )
-    for row in coord_system_point_rel:
+        tuple(file_ids)
+    )]
+    electrodes_in    = ', '.join(['%s'] * len(electrode_ids)) or 'NULL'
+    coord_systems_in = ', '.join(['%s'] * len(coord_system_ids)) or 'NULL'
+    point_3d_ids = []
+    if electrode_ids or coord_system_ids:
+        point_3d_ids = [row['Point3DID'] for row in db.pselect(
+            f"""
+            SELECT Point3DID
+            FROM physiological_electrode
+            WHERE PhysiologicalElectrodeID IN ({electrodes_in})
+            UNION
+            SELECT Point3DID
+            FROM physiological_coord_system_point_3d_rel
+            WHERE PhysiologicalCoordSystemID IN ({coord_systems_in})
+            """,
+            (*electrode_ids, *coord_system_ids)
+        )]
+
+    with db.transaction():
+        print("Delete physiological_event_parameter_category_level\n")
         db.update(
-            """
-            DELETE FROM physiological_coord_system_point_3d_rel
-            WHERE PhysiologicalCoordSystemID = %s
-            AND Point3DID = %s
+            f"""
+            DELETE category_level
+            FROM physiological_event_parameter_category_level AS category_level
+                JOIN physiological_event_parameter USING (EventParameterID)
+                JOIN physiological_event_file USING (EventFileID)
+            WHERE physiological_event_file.PhysiologicalFileID IN ({files_in})
             """,
-            (row["PhysiologicalCoordSystemID"], row["Point3DID"],)
+            tuple(file_ids)
         )
 
-    print("Delete point_3d\n")
-    # delete from point_3d not linked to any physiological_electrode
-    # and physiological_coord_system_point_3d_rel
-    point_3d_ids = db.pselect(
-        """
-        SELECT Point3DID
-        FROM point_3d
-        WHERE Point3DID NOT IN (
-            SELECT Point3DID FROM physiological_coord_system_point_3d_rel
-        ) AND Point3DID NOT IN (
-            SELECT Point3DID FROM physiological_electrode
-        )
-        """,
-        ()
-    )
-    for point_3d_id in point_3d_ids:
+        print("Delete physiological_event_parameter\n")
         db.update(
-            """
-            DELETE FROM point_3d
-            WHERE Point3DID = %s
+            f"""
+            DELETE event_parameter
+            FROM physiological_event_parameter AS event_parameter
+                JOIN physiological_event_file USING (EventFileID)
+            WHERE physiological_event_file.PhysiologicalFileID IN ({files_in})
             """,
-            (point_3d_id["Point3DID"],)
+            tuple(file_ids)
         )
 
-    print("Delete physiological_coord_system\n")
-    # delete physiological_coord_system if not linked to any other
-    # physiological_coord_system_electrode_rel
-    # or physiological_coord_system_point_3d_rel
-    coord_system_ids = db.pselect(
-        """
-        SELECT PhysiologicalCoordSystemID
-        FROM physiological_coord_system
-        WHERE PhysiologicalCoordSystemID NOT IN (
-            SELECT PhysiologicalCoordSystemID
-            FROM physiological_coord_system_point_3d_rel
-        ) AND PhysiologicalCoordSystemID NOT IN (
-            SELECT PhysiologicalCoordSystemID
-            FROM physiological_coord_system_electrode_rel
-        )
-        """,
-        ()
-    )
-    for coord_system_id in coord_system_ids:
+        print("Delete physiological_channel\n")
         db.update(
-            """
-            DELETE FROM physiological_coord_system
-            WHERE PhysiologicalCoordSystemID = %s
+            f"""
+            DELETE FROM physiological_channel
+            WHERE PhysiologicalFileID IN ({files_in})
             """,
-            (coord_system_id["PhysiologicalCoordSystemID"],)
+            tuple(file_ids)
         )
 
-    print("Delete physiological_coord_system_electrode_rel\n")
-    db.update(
-        """
-        DELETE FROM physiological_coord_system_electrode_rel
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
-
-    print("Delete physiological_electrode\n")
-    for electrode_id in electrode_ids:
+        if coord_system_ids:
+            print("Delete physiological_coord_system_point_3d_rel\n")
+            db.update(
+                f"""
+                DELETE FROM physiological_coord_system_point_3d_rel
+                WHERE PhysiologicalCoordSystemID IN ({coord_systems_in})
+                """,
+                tuple(coord_system_ids)
+            )
+
+        print("Delete physiological_coord_system_electrode_rel\n")
         db.update(
-            """
-            DELETE FROM physiological_electrode
-            WHERE PhysiologicalElectrodeID = %s
+            f"""
+            DELETE FROM physiological_coord_system_electrode_rel
+            WHERE PhysiologicalFileID IN ({files_in})
             """,
-            (electrode_id["PhysiologicalElectrodeID"],)
+            tuple(file_ids)
         )
 
-    print("Delete physiological_parameter_file\n")
-    db.update(
-        """
-        DELETE FROM physiological_parameter_file
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
-
-    print("Delete physiological_archive\n")
-    db.update(
-        """
-        DELETE FROM physiological_archive
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
-
-    print("Delete physiological_event_archive\n")
-    db.update(
-        """
-        DELETE FROM physiological_event_archive
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
-
-    print("Delete physiological_task_event_opt\n")
-    print("Delete physiological_task_event_hed_rel\n")
-    task_event_ids = db.pselect(
-        """
-        SELECT PhysiologicalTaskEventID
-        FROM physiological_task_event
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
+        if electrode_ids:
+            print("Delete physiological_electrode\n")
+            db.update(
+                f"""
+                DELETE FROM physiological_electrode
+                WHERE PhysiologicalElectrodeID IN ({electrodes_in})
+                """,
+                tuple(electrode_ids)
+            )
+
+        if point_3d_ids:
+            print("Delete point_3d\n")
+            # delete the points of the files that are not linked to any other
+            # physiological_electrode or physiological_coord_system_point_3d_rel
+            points_in = ', '.join(['%s'] * len(point_3d_ids))
+            db.update(
+                f"""
+                DELETE FROM point_3d
+                WHERE Point3DID IN ({points_in})
+                AND Point3DID NOT IN (
+                    SELECT Point3DID FROM physiological_coord_system_point_3d_rel
+                ) AND Point3DID NOT IN (
+                    SELECT Point3DID FROM physiological_electrode
+                )
+                """,
+                tuple(point_3d_ids)
+            )
+
+        if coord_system_ids:
+            print("Delete physiological_coord_system\n")
+            # delete the coordinate systems of the files that are not linked to any
+            # other physiological_coord_system_electrode_rel
+            # or physiological_coord_system_point_3d_rel
+            db.update(
+                f"""
+                DELETE FROM physiological_coord_system
+                WHERE PhysiologicalCoordSystemID IN ({coord_systems_in})
+                AND PhysiologicalCoordSystemID NOT IN (
+                    SELECT PhysiologicalCoordSystemID
+                    FROM physiological_coord_system_point_3d_rel
+                ) AND PhysiologicalCoordSystemID NOT IN (
+                    SELECT PhysiologicalCoordSystemID
+                    FROM physiological_coord_system_electrode_rel
+                )
+                """,
+                tuple(coord_system_ids)
+            )
+
+        for table in ('physiological_parameter_file', 'physiological_archive', 'physiological_event_archive'):
+            print(f"Delete {table}\n")
+            db.update(
+                f"""
+                DELETE FROM {table}
+                WHERE PhysiologicalFileID IN ({files_in})
+                """,
+                tuple(file_ids)
+            )
+
+        print("Delete physiological_task_event_opt\n")
+        db.update(
+            f"""
+            DELETE task_event_opt
+            FROM physiological_task_event_opt AS task_event_opt
+                JOIN physiological_task_event USING (PhysiologicalTaskEventID)
+            WHERE physiological_task_event.PhysiologicalFileID IN ({files_in})
+            """,
+            tuple(file_ids)
+        )
 
-    for task_event_id in task_event_ids:
+        print("Delete physiological_task_event_hed_rel\n")
+        # the tag pairs reference other rows of the table, unlink them so that
+        # the rows can be deleted in any order
         db.update(
-            """
-            DELETE FROM physiological_task_event_opt
-            WHERE PhysiologicalTaskEventID = %s
+            f"""
+            UPDATE physiological_task_event_hed_rel AS hed_rel
+                JOIN physiological_task_event USING (PhysiologicalTaskEventID)
+            SET hed_rel.PairRelID = NULL
+            WHERE physiological_task_event.PhysiologicalFileID IN ({files_in})
             """,
-            (task_event_id["PhysiologicalTaskEventID"],)
+            tuple(file_ids)
         )
         db.update(
-            """
-            DELETE FROM physiological_task_event_hed_rel
-            WHERE PhysiologicalTaskEventID = %s
+            f"""
+            DELETE hed_rel
+            FROM physiological_task_event_hed_rel AS hed_rel
+                JOIN physiological_task_event USING (PhysiologicalTaskEventID)
+            WHERE physiological_task_event.PhysiologicalFileID IN ({files_in})
             """,
-            (task_event_id["PhysiologicalTaskEventID"],)
+            tuple(file_ids)
         )
 
-    print("Delete physiological_task_event\n")
-    db.update(
-        """
-        DELETE FROM physiological_task_event
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
-
-    print("Delete physiological_event_file\n")
-    db.update(
-        """
-        DELETE FROM physiological_event_file
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
-
-    print("Delete physiological_file\n")
-    db.update(
-        """
-        DELETE FROM physiological_file
-        WHERE PhysiologicalFileID = %s
-        """,
-        (file_id,)
-    )
+        for table in ('physiological_task_event', 'physiological_event_file', 'physiological_file'):
+            print(f"Delete {table}\n")
+            db.update(
+                f"""
+                DELETE FROM {table}
+                WHERE PhysiologicalFileID IN ({files_in})
+                """,
+                tuple(file_ids)
+            )
 
 
 def delete_physiological_file(db, data_path, file_id, confirm, deleteondisk):
@@ -507,6 +493,18 @@ def delete_physiological_file(db, data_path, file_id, confirm, deleteondisk):
                 except Exception as e:
                     print(f"Caught exception: {e} \n")
 
+            # the archives are written along with a manifest of their hashes
+            for archive in archives + event_archives:
+                manifest_path = get_archive_manifest_path(os.path.join(data_path, archive['FilePath']))
+                if not os.path.exists(manifest_path):
+                    continue
+
+                print(f"Deleting file {manifest_path}\n")
+                try:
+                    os.remove(manifest_path)
+                except Exception as e:
+                    print(f"Caught exception: {e} \n")
+
             for chunk in chunks:
                 try:
                     shutil.rmtree(os.path.join(data_path, chunk['FilePath']))
@@ -2,15 +2,18 @@
 
 """Script that ingests EEG BIDS datasets"""
 
+import io
 import os
-import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from lib.database import Database
 from lib.database_lib.config import Config
 from lib.exitcode import INVALID_ARG, SUCCESS
 from lib.lorisgetopt import LorisGetOpt
-from scripts.delete_physiological_file import delete_physiological_file_in_db
+from scripts.bids_import import read_and_insert_bids
+from scripts.delete_physiological_file import delete_physiological_files_in_db
 
 
 def main():
@@ -27,6 +30,7 @@ def main():
         "options: \n"
         "\t-p, --profile            : Name of the python database config file in config\n"
         "\t-u, --upload_id          : ID of the upload (from electrophysiology_uploader) of the EEG dataset\n"
+        "\t-j, --jobs               : Number of EEG datasets ingested concurrently (default: 1)\n"
         "\t-v, --verbose            : If set, be verbose\n\n"
     )
 
@@ -37,6 +41,9 @@ def main():
         "upload_id": {
             "value": None, "required": False, "expect_arg": True, "short_opt": "u", "is_path": False
         },
+        "jobs": {
+            "value": 1, "required": False, "expect_arg": True, "short_opt": "j", "is_path": False
+        },
         "verbose": {
             "value": False, "required": False, "expect_arg": False, "short_opt": "v", "is_path": False
         },
@@ -50,7 +57,16 @@ def main():
     loris_getopt_obj = LorisGetOpt(usage, options_dict, script_name)
     verbose = loris_getopt_obj.options_dict['verbose']['value']
     upload_id = loris_getopt_obj.options_dict['upload_id']['value']
-    profile = loris_getopt_obj.options_dict['profile']['value']
+    jobs = loris_getopt_obj.options_dict['jobs']['value']
+
+    try:
+        jobs = int(jobs)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        print('ERROR: the value for --jobs option must be a positive integer')
+        print(usage)
+        sys.exit(INVALID_ARG)
 
     # ---------------------------------------------------------------------------------------------
     # Establish database connection
@@ -68,9 +84,12 @@ def main():
     # Get tmp dir from loris_getopt object
     # and create the log object (their basename being the name of the script run)
     # ---------------------------------------------------------------------------------------------
+    data_dir = config_db_obj.get_config("dataDirBasepath")
+    # making sure that there is a final / in data_dir
+    data_dir = data_dir if data_dir.endswith('/') else data_dir + "/"
+
     assembly_bids_path = config_db_obj.get_config("EEGAssemblyBIDS")
     if not assembly_bids_path:
-        data_dir = config_db_obj.get_config("dataDirBasepath")
         assembly_bids_path = os.path.join(data_dir, 'assembly_bids')
 
     # ---------------------------------------------------------------------------------------------
@@ -94,6 +113,8 @@ def main():
     # Ingestion
     # ---------------------------------------------------------------------------------------------
 
+    eeg_datasets_to_ingest = []
+    exit_code = None
     for eeg_dataset in eeg_dataset_list:
         uploadid = str(eeg_dataset['UploadID'])
 
@@ -106,7 +127,9 @@ def main():
 
         if not session_data:
             print(f'Session ID {eeg_dataset["SessionID"]} associated with UploadID {uploadid} does not exist.')
-            sys.exit(INVALID_ARG)
+            # the datasets found before this one are still ingested
+            exit_code = INVALID_ARG
+            break
 
         candid = session_data[0]['CandID']
         pscid = session_data[0]['PSCID']
@@ -142,46 +165,159 @@ def main():
             print(f'No BIDS dataset matching visit {visit} for candidate {pscid} {candid} found.')
             continue
 
+        # Assume eeg and raw data for now
+        eeg_path = os.path.join(path, 'eeg')
+        eeg_datasets_to_ingest.append((uploadid, eeg_dataset['SessionID'], eeg_path))
+
+    ingest_eeg_datasets(eeg_datasets_to_ingest, db, data_dir, verbose, jobs)
+
+    db.disconnect()
+
+    if exit_code is not None:
+        sys.exit(exit_code)
+
+
+def ingest_eeg_datasets(eeg_datasets, db, data_dir, verbose, jobs):
+    """
+    Ingests the EEG datasets in a queue of jobs threads and updates the status
+    of their upload as soon as each of them is ingested. The threads share the
+    modules, the database connection pool and the HED schema cache of the
+    process rather than starting a bids_import.py process for each dataset.
+
+    :param eeg_datasets: list of (UploadID, SessionID, EEG directory path) tuples
+     :type eeg_datasets: list
+    :param db          : database handler object, used to update the upload statuses
+     :type db          : object
+    :param data_dir    : LORIS data directory path (with a final /)
+     :type data_dir    : str
+    :param verbose     : if true, prints out information while executing
+     :type verbose     : bool
+    :param jobs        : number of EEG datasets ingested concurrently
+     :type jobs        : int
+    """
+
+    # the messages of each upload are written in its own log, which is printed
+    # when its ingestion is over, so that the logs of the concurrent uploads
+    # are not interleaved
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = UploadLogStream(stdout), UploadLogStream(stderr)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for uploadid, session_id, eeg_path in eeg_datasets:
+                log = io.StringIO()
+                future = executor.submit(ingest_eeg_dataset, db.config, session_id, eeg_path, data_dir, verbose, log)
+                futures[future] = (uploadid, log)
+
+            for future in as_completed(futures):
+                uploadid, log = futures[future]
+                if log.getvalue():
+                    print(f'EEG Dataset with uploadID {uploadid} ingestion log:\n' + log.getvalue())
+
+                try:
+                    future.result()
+                    succeeded = True
+                except SystemExit as err:
+                    # the BIDS import exits with a non-zero code on error
+                    succeeded = err.code in (None, 0)
+                    if not succeeded:
+                        print(f'ERROR: EEG Dataset with uploadID {uploadid} ingestion exited with code {err.code}')
+                except Exception as err:
+                    succeeded = False
+                    print(f'ERROR: EEG Dataset with uploadID {uploadid} ingestion failed: {err}')
+
+                if succeeded:
+                    db.update(
+                        "UPDATE electrophysiology_uploader SET Status = 'Complete' WHERE UploadID = %s",
+                        (uploadid,)
+                    )
+                    print('EEG Dataset with uploadID ' + uploadid + ' successfully ingested')
+                else:
+                    db.update(
+                        "UPDATE electrophysiology_uploader SET Status = 'Failed' WHERE UploadID = %s",
+                        (uploadid,)
+                    )
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+def ingest_eeg_dataset(db_config, session_id, eeg_path, data_dir, verbose, log):
+    """
+    Deletes the files of the previous uploads of a session and imports its EEG
+    dataset with the BIDS import, using a database handle of the shared pool.
+
+    :param db_config : LORIS database credentials
+     :type db_config : DatabaseConfig
+    :param session_id: ID of the session of the upload
+     :type session_id: int
+    :param eeg_path  : path to the EEG directory of the BIDS dataset of the session
+     :type eeg_path  : str
+    :param data_dir  : LORIS data directory path (with a final /)
+     :type data_dir  : str
+    :param verbose   : if true, prints out information while executing
+     :type verbose   : bool
+    :param log       : log of the upload, in which the messages of the thread are written
+     :type log       : io.StringIO
+    """
+
+    upload_log.buffer = log
+    db = Database(db_config, verbose)
+
+    try:
+        db.connect()
         # Get previous upload files
         previous_eeg_files = db.pselect(
             "SELECT PhysiologicalFileID FROM physiological_file WHERE SessionID = %s",
-            (eeg_dataset['SessionID'],)
+            (session_id,)
         )
         # Delete previous uploads
-        for previous_eeg_file in previous_eeg_files:
-            delete_physiological_file_in_db(db, previous_eeg_file['PhysiologicalFileID'])
+        delete_physiological_files_in_db(
+            db, [previous_eeg_file['PhysiologicalFileID'] for previous_eeg_file in previous_eeg_files]
+        )
 
-        # Assume eeg and raw data for now
-        eeg_path = os.path.join(path, 'eeg')
-        command = 'bids_import.py -p ' + profile + ' -d ' + eeg_path + ' --nobidsvalidation --nocopy --type raw'
+        # same as bids_import.py --nobidsvalidation --nocopy --type raw
+        read_and_insert_bids(
+            bids_dir         = eeg_path,
+            data_dir         = data_dir,
+            verbose          = verbose,
+            createcand       = False,
+            createvisit      = False,
+            idsvalidation    = False,
+            nobidsvalidation = True,
+            type             = 'raw',
+            nocopy           = True,
+            db               = db
+        )
+    finally:
+        # the BIDS import disconnects on success, but not when it exits on error
+        db.disconnect()
+        # the thread is reused for the next upload
+        upload_log.buffer = None
 
-        try:
-            result = subprocess.run(command, shell = True, capture_output=True)
 
-            if result.stdout:
-                print(result.stdout.decode('utf-8'))
+# log of the upload ingested by each thread, None outside of the ingestion threads
+upload_log = threading.local()
 
-            if result.stderr:
-                print(
-                    f'ERROR: EEG Dataset with uploadID {uploadid} ingestion log:\n ' + result.stderr.decode('utf-8')
-                )
 
-            if result.returncode == 0:
-                db.update(
-                    "UPDATE electrophysiology_uploader SET Status = 'Complete' WHERE UploadID = %s",
-                    (uploadid,)
-                )
-                print('EEG Dataset with uploadID ' + uploadid + ' successfully ingested')
+class UploadLogStream:
+    """
+    Standard output or error stream that writes the messages of an ingestion
+    thread in the log of its upload, and those of the other threads in the
+    original stream.
+    """
 
-                continue
+    def __init__(self, stream):
+        self.stream = stream
 
-        except OSError:
-            print('ERROR: error while executing bids_import.py')
+    def write(self, text):
+        return (getattr(upload_log, 'buffer', None) or self.stream).write(text)
 
-        db.update(
-            "UPDATE electrophysiology_uploader SET Status = 'Failed' WHERE UploadID = %s",
-            (uploadid,)
-        )
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
 
 
 if __name__ == "__main__":
@@ -3,13 +3,20 @@
 """Script to mass chunk electrophysiology datasets."""
 
 import getopt
+import multiprocessing
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import lib.exitcode
 from lib.config_file import load_config
 from lib.database import Database
 from lib.database_lib.config import Config
-from lib.physiological import Physiological
+from lib.physiological import Physiological, create_chunk_directory
+
+# number of chunked files registered in the database with a single insert
+REGISTRATION_BATCH_SIZE = 100
 
 
 def main():
@@ -17,25 +24,27 @@ def main():
     verbose     = False
     smallest_id = None
     largest_id  = None
+    jobs        = 1
 
     long_options = [
-        "help", "profile=", "smallest_id=", "largest_id=", "verbose"
+        "help", "profile=", "smallest_id=", "largest_id=", "jobs=", "verbose"
     ]
 
     usage = (
         '\n'
         'usage  : mass_electrophysiology_chunking.py -p <profile> -s <smallest_id> '
-                  '-l <largest_id>\n\n'
+                  '-l <largest_id> [-j <jobs>]\n\n'
         'options: \n'
         '\t-p, --profile    : name of the python database config file in the config'
                               ' directory\n'
         '\t-s, --smallest_id: smallest PhyiologicalFileID to chunk\n'
         '\t-l, --largest_id : largest PhysiologicalFileID to chunk\n'
+        '\t-j, --jobs       : number of files chunked in parallel (default: 1)\n'
         '\t-v, --verbose    : be verbose\n'
     )
 
     try:
-        opts, _ = getopt.getopt(sys.argv[1:], 'hp:s:l:v', long_options)
+        opts, _ = getopt.getopt(sys.argv[1:], 'hp:s:l:j:v', long_options)
     except getopt.GetoptError:
         print(usage)
         sys.exit(lib.exitcode.GETOPT_FAILURE)
@@ -50,23 +59,41 @@ def main():
             smallest_id = int(arg)
         elif opt in ('-l', '--largest_id'):
             largest_id = int(arg)
+        elif opt in ('-j', '--jobs'):
+            jobs = int(arg)
         elif opt in ('-v', '--verbose'):
             verbose = True
 
     # input error checking and load config_file file
     config_file = load_config(profile)
-    input_error_checking(smallest_id, largest_id, usage)
+    input_error_checking(smallest_id, largest_id, jobs, usage)
+
+    # database connection, shared by all the files to chunk
+    db = Database(config_file.mysql, verbose)
+    db.connect()
+
+    # grep config settings from the Config module
+    config_obj = Config(db, verbose)
+    data_dir   = config_obj.get_config('dataDirBasepath')
+
+    # making sure that there is a final / in data_dir
+    data_dir = data_dir if data_dir.endswith('/') else data_dir + "/"
+
+    # load the Physiological object
+    physiological = Physiological(db, verbose)
+
+    # chunk the electrophysiology datasets with a PhysiologicalFileID between
+    # smallest_id and largest_id that are not chunked yet
+    physio_files = physiological.get_unchunked_physio_files(smallest_id, largest_id)
+    failures = make_chunks(physio_files, physiological, data_dir, jobs)
+
+    db.disconnect()
 
-    # run chunking script on electrophysiology datasets with a PhysiologicalFileID
-    # between smallest_id and largest_id
-    if (smallest_id == largest_id):
-        make_chunks(smallest_id, config_file, verbose)
-    else:
-        for file_id in range(smallest_id, largest_id + 1):
-            make_chunks(file_id, config_file, verbose)
+    if failures:
+        sys.exit(lib.exitcode.CHUNK_CREATION_FAILURE)
 
 
-def input_error_checking(smallest_id, largest_id, usage):
+def input_error_checking(smallest_id, largest_id, jobs, usage):
     """
     Checks whether the required inputs are correctly set.
 
@@ -74,6 +101,8 @@ def input_error_checking(smallest_id, largest_id, usage):
      :type smallest_id: int
     :param largest_id : largest PhysiologicalFileID on which to run the chunking script
      :type largest_id : int
+    :param jobs       : number of files to chunk in parallel
+     :type jobs       : int
     :param usage      : script usage to be displayed when encountering an error
      :type usage      : str
     """
@@ -99,38 +128,87 @@ def input_error_checking(smallest_id, largest_id, usage):
         print(usage)
         sys.exit(lib.exitcode.INVALID_ARG)
 
+    if jobs < 1:
+        message = '\n\tERROR: the value for --jobs option must be a positive integer'
+        print(message)
+        print(usage)
+        sys.exit(lib.exitcode.INVALID_ARG)
+
 
-def make_chunks(physiological_file_id, config_file, verbose):
+def make_chunks(physio_files, physiological, data_dir, jobs):
     """
-    Call the function create_chunks_for_visualization of the Physiology class on
-    the PhysiologicalFileID provided as argument to this function.
-
-    :param physiological_file_id: PhysiologicalFileID of the file to chunk
-     :type physiological_file_id: int
-    :param config_file: path to the config file with database connection information
-     :type config_file: str
-    :param verbose    : flag for more printing if set
-     :type verbose    : bool
+    Chunk the physiological files provided as argument in a pool of jobs
+    processes, register the chunk directories in the database in batches and
+    print a summary of the run.
+
+    :param physio_files : physiological files to chunk, as returned by
+                          Physiological.get_unchunked_physio_files
+     :type physio_files : list
+    :param physiological: Physiological object used to register the chunks
+     :type physiological: Physiological
+    :param data_dir     : LORIS data directory path (with a final /)
+     :type data_dir     : str
+    :param jobs         : number of files to chunk in parallel
+     :type jobs         : int
+
+    :return: list of (PhysiologicalFileID, error) tuples of the files that could not be chunked
+     :rtype: list
     """
 
-    # database connection
-    db = Database(config_file.mysql, verbose)
-    db.connect()
-
-    # grep config settings from the Config module
-    config_obj = Config(db, verbose)
-    data_dir   = config_obj.get_config('dataDirBasepath')
-
-    # making sure that there is a final / in data_dir
-    data_dir = data_dir if data_dir.endswith('/') else data_dir + "/"
+    start_time     = time.monotonic()
+    chunked_files  = []
+    pending_files  = []
+    failures       = []
+    chunked_bytes  = 0
+
+    # spawn the worker processes rather than forking them so that they do not
+    # inherit the database connection of the main process
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {}
+        for physio_file in physio_files:
+            full_file_path = os.path.join(data_dir, physio_file['FilePath'])
+            chunk_root_dir = physiological.get_chunk_root_dir(physio_file['FilePath'], data_dir)
+            future = executor.submit(create_chunk_directory, physio_file['FileType'], full_file_path, chunk_root_dir)
+            futures[future] = physio_file
+
+        for count, future in enumerate(as_completed(futures), start=1):
+            physio_file = futures[future]
+            physio_file_id = physio_file['PhysiologicalFileID']
+            try:
+                chunk_path = future.result()
+            except Exception as err:
+                failures.append((physio_file_id, err))
+                print(f'[{count}/{len(futures)}] ERROR: failed to chunk physiological file ID {physio_file_id}: {err}')
+                continue
+
+            if not chunk_path or not os.path.isdir(chunk_path):
+                failures.append((physio_file_id, 'no chunk directory created'))
+                print(f'[{count}/{len(futures)}] ERROR: no chunks created for physiological file ID {physio_file_id}')
+                continue
+
+            print(f'[{count}/{len(futures)}] Chunked physiological file ID {physio_file_id}')
+            chunked_files.append(physio_file_id)
+            chunked_bytes += os.path.getsize(os.path.join(data_dir, physio_file['FilePath']))
+            pending_files.append((physio_file_id, physio_file['ProjectID'], chunk_path))
+            if len(pending_files) >= REGISTRATION_BATCH_SIZE:
+                physiological.insert_chunked_dataset_paths(pending_files, data_dir)
+                pending_files = []
+
+    physiological.insert_chunked_dataset_paths(pending_files, data_dir)
+
+    duration = time.monotonic() - start_time
+    print(
+        f'\nChunked {len(chunked_files)} of {len(physio_files)} physiological files in {duration:.1f} s'
+        f' with {jobs} job(s) ({len(chunked_files) / duration if duration else 0:.2f} files/s,'
+        f' {chunked_bytes / 2**20 / duration if duration else 0:.2f} MiB/s)'
+    )
 
-    # load the Physiological object
-    physiological = Physiological(db, verbose)
+    if failures:
+        print(f'{len(failures)} file(s) could not be chunked:')
+        for physio_file_id, err in failures:
+            print(f'\tPhysiologicalFileID {physio_file_id}: {err}')
 
-    # create the chunked dataset
-    if physiological.grep_file_path_from_file_id(physiological_file_id):
-        print('Chunking physiological file ID ' + str(physiological_file_id))
-        physiological.create_chunks_for_visualization(physiological_file_id, data_dir)
+    return failures
 
 
 if __name__ == "__main__":
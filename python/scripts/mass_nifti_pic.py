@@ -6,11 +6,15 @@ import getopt
 import re
 import sys
 
+from sqlalchemy.orm import joinedload
+
 import lib.exitcode
 import lib.utilities
 from lib.config import get_data_dir_path_config
 from lib.config_file import load_config
 from lib.database import Database
+from lib.db.models.file import DbFile
+from lib.db.models.session import DbSession
 from lib.db.queries.file import try_get_file_with_id
 from lib.env import Env
 from lib.imaging import Imaging
@@ -69,12 +73,18 @@ def main():
     tmp_dir_path = lib.utilities.create_processing_tmp_dir('mass_nifti_pic')
     env = make_env('mass_nifti_pic', {}, config_info, tmp_dir_path, verbose)
 
+    # database connection, shared by the pics of all the files
+    db = Database(config_info.mysql, verbose)
+    db.connect()
+
     # create pic for NIfTI files with a FileID between smallest_id and largest_id
     if (smallest_id == largest_id):
-        make_pic(env, smallest_id, config_info, force, verbose)
+        make_pic(env, db, smallest_id, force, verbose)
     else:
         for file_id in range(smallest_id, largest_id + 1):
-            make_pic(env, file_id, config_info, force, verbose)
+            make_pic(env, db, file_id, force, verbose)
+
+    db.disconnect()
 
 
 def input_error_checking(smallest_id, largest_id, usage):
@@ -111,15 +121,15 @@ def input_error_checking(smallest_id, largest_id, usage):
         sys.exit(lib.exitcode.INVALID_ARG)
 
 
-def make_pic(env: Env, file_id, config_file, force, verbose):
+def make_pic(env: Env, db, file_id, force, verbose):
     """
     Call the function create_imaging_pic of the Imaging class on
     the FileID provided as argument to this function.
 
+    :param db         : database handle
+     :type db         : Database
     :param file_id    : FileID of the file for which to create the pic
      :type file_id    : int
-    :param config_file: path to the config file with database connection information
-     :type config_file: str
     :param force      : if a pic is already present for the FileID, overwrite the pic in the filesystem with newly
                         generated pic
      :type force      : bool
@@ -127,17 +137,14 @@ def make_pic(env: Env, file_id, config_file, force, verbose):
      :type verbose    : bool
     """
 
-    # database connection
-    db = Database(config_file.mysql, verbose)
-    db.connect()
-
     data_dir_path = get_data_dir_path_config(env)
 
     # load the Imaging object
     imaging = Imaging(db, verbose)
 
     # grep the NIfTI file path
-    nifti_file = try_get_file_with_id(env.db, file_id)
+    # the session candidate is used to determine the pic directory
+    nifti_file = try_get_file_with_id(env.db, file_id, [joinedload(DbFile.session).joinedload(DbSession.candidate)])
     if nifti_file is None:
         print(f'WARNING: no file in the database with FileID = {file_id}')
         return
@@ -0,0 +1,170 @@
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import Session as Database
+from sqlalchemy.orm import joinedload, selectinload
+
+from lib.db.models.candidate import DbCandidate
+from lib.db.models.file import DbFile
+from lib.db.models.file_parameter import DbFileParameter
+from lib.db.models.parameter_type import DbParameterType
+from lib.db.models.session import DbSession
+from lib.db.queries.file import count_files_with_dicom_archive_id, get_files_with_ids, try_get_file_with_id
+from lib.db.queries.file_parameter import get_file_parameters_with_file_ids
+from tests.util.database import assert_max_sql_statements, create_test_database
+
+
+@dataclass
+class Setup:
+    db: Database
+    file_1_id: int
+    file_2_id: int
+    file_3_id: int
+
+
+@pytest.fixture
+def setup():
+    db = create_test_database()
+
+    candidate = DbCandidate(
+        cand_id                 = 111111,
+        psc_id                  = 'DCC001',
+        registration_site_id    = 1,
+        registration_project_id = 1,
+        active                  = True,
+        user_id                 = 'admin',
+        test_date               = datetime.now(),
+        entity_type             = 'human',
+    )
+
+    db.add(candidate)
+    db.flush()
+
+    session = DbSession(
+        candidate_id     = candidate.id,
+        site_id          = 1,
+        project_id       = 1,
+        visit_label      = 'V1',
+        submitted        = False,
+        current_stage    = 'Not Started',
+        active           = True,
+        user_id          = 'admin',
+        test_date        = datetime.now(),
+        hardcopy_request = '-',
+        mri_qc_status    = '',
+        mri_qc_pending   = False,
+        mri_caveat       = True,
+    )
+
+    db.add(session)
+    db.flush()
+
+    files: list[DbFile] = []
+    for i in range(3):
+        file = DbFile(
+            session_id          = session.id,
+            path                = Path(f'assembly_bids/sub-111111/ses-V1/anat/sub-111111_ses-V1_run-{i}_T1w.nii.gz'),
+            output_type         = 'native',
+            dicom_archive_id    = 1 if i < 2 else None,
+            inserted_by_user_id = 'admin',
+            insert_time         = datetime.now(),
+        )
+
+        db.add(file)
+        files.append(file)
+
+    json_parameter_type = DbParameterType(name = 'bids_json_file')
+    pic_parameter_type  = DbParameterType(name = 'check_pic_filename')
+
+    db.add(json_parameter_type)
+    db.add(pic_parameter_type)
+    db.flush()
+
+    for file in files:
+        db.add(DbFileParameter(
+            file_id     = file.id,
+            type_id     = json_parameter_type.id,
+            value       = str(file.path).replace('.nii.gz', '.json'),
+            insert_time = datetime.now(),
+        ))
+
+        db.add(DbFileParameter(
+            file_id     = file.id,
+            type_id     = pic_parameter_type.id,
+            value       = f'111111/{file.path.name}.png',
+            insert_time = datetime.now(),
+        ))
+
+    db.commit()
+
+    file_ids = [file.id for file in files]
+
+    # Start the tests with an empty identity map so that relationships are not already loaded.
+    db.expunge_all()
+
+    return Setup(db, file_ids[0], file_ids[1], file_ids[2])
+
+
+def test_try_get_file_with_id_eager_load(setup: Setup):
+    with assert_max_sql_statements(setup.db, 1):
+        file = try_get_file_with_id(
+            setup.db,
+            setup.file_1_id,
+            [joinedload(DbFile.session).joinedload(DbSession.candidate)],
+        )
+
+        assert file is not None
+        assert file.session.candidate.cand_id == 111111
+
+
+def test_get_files_with_ids(setup: Setup):
+    files = get_files_with_ids(setup.db, [setup.file_3_id, setup.file_1_id])
+    assert [file.id for file in files] == [setup.file_1_id, setup.file_3_id]
+
+
+def test_get_files_with_ids_eager_load(setup: Setup):
+    file_ids = [setup.file_1_id, setup.file_2_id, setup.file_3_id]
+    with assert_max_sql_statements(setup.db, 2):
+        files = get_files_with_ids(
+            setup.db,
+            file_ids,
+            [selectinload(DbFile.parameters).joinedload(DbFileParameter.type)],
+        )
+
+        parameter_names = {parameter.type.name for file in files for parameter in file.parameters}
+        assert parameter_names == {'bids_json_file', 'check_pic_filename'}
+
+
+def test_count_files_with_dicom_archive_id(setup: Setup):
+    with assert_max_sql_statements(setup.db, 1):
+        assert count_files_with_dicom_archive_id(setup.db, 1) == 2
+
+    assert count_files_with_dicom_archive_id(setup.db, 2) == 0
+
+
+def test_get_file_parameters_with_file_ids(setup: Setup):
+    with assert_max_sql_statements(setup.db, 1):
+        parameters = get_file_parameters_with_file_ids(setup.db, [setup.file_1_id, setup.file_2_id])
+        assert len(parameters) == 4
+        assert {parameter.type.name for parameter in parameters} == {'bids_json_file', 'check_pic_filename'}
+
+
+def test_get_file_parameters_with_file_ids_parameter_names(setup: Setup):
+    parameters = get_file_parameters_with_file_ids(
+        setup.db,
+        [setup.file_1_id, setup.file_2_id, setup.file_3_id],
+        ['check_pic_filename'],
+    )
+
+    assert [parameter.file_id for parameter in parameters] == [setup.file_1_id, setup.file_2_id, setup.file_3_id]
+
+
+def test_assert_max_sql_statements_fails(setup: Setup):
+    with pytest.raises(AssertionError):
+        with assert_max_sql_statements(setup.db, 1):
+            file = try_get_file_with_id(setup.db, setup.file_1_id)
+            assert file is not None
+            # Lazy loading the session and the candidate issues two additional statements.
+            assert file.session.candidate.cand_id == 111111
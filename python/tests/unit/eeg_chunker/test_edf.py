@@ -0,0 +1,244 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import mne
+import numpy as np
+import numpy.typing as npt
+import pytest
+from loris_eeg_chunker.chunking import write_chunk_directory  # type: ignore
+from loris_eeg_chunker.edf import EdfReader  # type: ignore
+from loris_eeg_chunker.encoding import decode_quantized_chunk  # type: ignore
+
+RECORD_COUNT = 5
+SAMPLES_PER_RECORD = 64
+RECORD_DURATION = 0.5
+
+
+@dataclass
+class Signal:
+    label: str
+    unit: str
+    physical_min: float
+    physical_max: float
+    digital_min: int
+    digital_max: int
+    # Digital samples of a data signal, or bytes of the records of an annotation signal.
+    samples: npt.NDArray[np.int32] | bytes
+
+
+def format_field(value: object, width: int) -> bytes:
+    return str(value).encode('latin-1').ljust(width)[:width]
+
+
+def write_edf_file(path: Path, signals: list[Signal], bdf: bool):
+    """
+    Write a continuous EDF+ or BDF file whose signals all have the same number of samples per
+    record.
+    """
+
+    sample_size = 3 if bdf else 2
+    header = b''.join([
+        b'\xffBIOSEMI' if bdf else format_field(0, 8),
+        format_field('X X X X', 80),
+        format_field('Startdate X X X X', 80),
+        format_field('01.01.20', 8),
+        format_field('12.00.00', 8),
+        format_field(256 * (len(signals) + 1), 8),
+        format_field('24BIT' if bdf else 'EDF+C', 44),
+        format_field(RECORD_COUNT, 8),
+        format_field(RECORD_DURATION, 8),
+        format_field(len(signals), 4),
+    ])
+
+    signal_fields: list[tuple[int, list[object]]] = [
+        (16, [signal.label for signal in signals]),
+        (80, ['' for _ in signals]),
+        (8,  [signal.unit for signal in signals]),
+        (8,  [signal.physical_min for signal in signals]),
+        (8,  [signal.physical_max for signal in signals]),
+        (8,  [signal.digital_min for signal in signals]),
+        (8,  [signal.digital_max for signal in signals]),
+        (80, ['' for _ in signals]),
+        (8,  [SAMPLES_PER_RECORD for _ in signals]),
+        (32, ['' for _ in signals]),
+    ]
+
+    for width, values in signal_fields:
+        header += b''.join(format_field(value, width) for value in values)
+
+    records = b''
+    for record in range(RECORD_COUNT):
+        for signal in signals:
+            if isinstance(signal.samples, bytes):
+                size = SAMPLES_PER_RECORD * sample_size
+                records += signal.samples[record * size:(record + 1) * size]
+                continue
+
+            samples = signal.samples[record * SAMPLES_PER_RECORD:(record + 1) * SAMPLES_PER_RECORD]
+            if bdf:
+                records += b''.join(int(sample).to_bytes(3, 'little', signed=True) for sample in samples)
+            else:
+                records += samples.astype('<i2').tobytes()
+
+    path.write_bytes(header + records)
+
+
+def create_annotations(sample_size: int) -> bytes:
+    """
+    Create the annotation signal of the records of an EDF+ file, which starts with the time-keeping
+    annotation of each record.
+    """
+
+    size = SAMPLES_PER_RECORD * sample_size
+    annotations = b''
+    for record in range(RECORD_COUNT):
+        text = f'+{record * RECORD_DURATION}\x14\x14\x00'
+        if record == 1:
+            text += '+0.6\x15 0.2\x14Stimulus\x14\x00'
+
+        annotations += text.encode().ljust(size, b'\0')
+
+    return annotations
+
+
+def create_signals(bdf: bool) -> list[Signal]:
+    rng = np.random.default_rng(0)
+    digital_max = 8388607 if bdf else 32767
+    sample_count = RECORD_COUNT * SAMPLES_PER_RECORD
+
+    def random_samples() -> npt.NDArray[np.int32]:
+        return rng.integers(-digital_max - 1, digital_max, sample_count, dtype=np.int32)
+
+    signals = [
+        Signal('Fp1', 'uV', -3200.0, 3200.0, -digital_max - 1, digital_max, random_samples()),
+        # Asymmetric ranges, whose scaling has an offset.
+        Signal('Fp2', 'mV', -1.0, 3.0, -digital_max - 1, digital_max, random_samples()),
+        Signal('Cz', 'uV', 0.0, 500.0, 0, 2000, rng.integers(0, 2000, sample_count, dtype=np.int32)),
+    ]
+
+    if bdf:
+        signals.append(Signal('Status', 'Boolean', -1.0, 1.0, -digital_max - 1, digital_max, random_samples()))
+    else:
+        signals.append(Signal('EDF Annotations', '', -1.0, 1.0, -32768, 32767, create_annotations(2)))
+
+    return signals
+
+
+def open_edf_reader(path: Path | str) -> Any:
+    return EdfReader(str(path))  # type: ignore
+
+
+def read_raw(path: Path | str) -> Any:
+    if Path(path).suffix == '.bdf':
+        return mne.io.read_raw_bdf(path, preload=True, verbose=False)  # type: ignore
+
+    return mne.io.read_raw_edf(path, preload=True, verbose=False)  # type: ignore
+
+
+@pytest.mark.parametrize('bdf', [False, True])
+def test_edf_reader_matches_mne(tmp_path: Path, bdf: bool):
+    path = tmp_path / ('recording.bdf' if bdf else 'recording.edf')
+    signals = create_signals(bdf)
+    write_edf_file(path, signals, bdf)
+
+    raw = read_raw(path)
+    reader = open_edf_reader(path)
+
+    data_signals = [signal for signal in signals if not isinstance(signal.samples, bytes)]
+    assert reader.ch_names == raw.ch_names == [signal.label for signal in data_signals]
+    assert reader.n_times == raw.n_times == RECORD_COUNT * SAMPLES_PER_RECORD
+    assert reader.info['sfreq'] == raw.info['sfreq'] == SAMPLES_PER_RECORD / RECORD_DURATION
+    np.testing.assert_allclose(reader.get_data(), raw.get_data(), rtol=1e-12, atol=0)
+
+    for signal in data_signals:
+        assert not isinstance(signal.samples, bytes)
+        gain, offset = reader.scaling(signal.label)
+        values = signal.samples * gain + offset
+        if signal.label == 'Status':
+            # Like MNE, the values of the stim channels are their trigger bits.
+            assert (gain, offset) == (1.0, 0.0)
+            values = signal.samples & (2 ** 17 - 1)
+
+        np.testing.assert_allclose(values, raw.get_data(picks=[signal.label])[0], rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize('bdf', [False, True])
+def test_edf_reader_channel_subset(tmp_path: Path, bdf: bool):
+    path = tmp_path / ('recording.bdf' if bdf else 'recording.edf')
+    write_edf_file(path, create_signals(bdf), bdf)
+
+    raw = read_raw(path)
+    channel_names = ['Cz', 'Status', 'Fp1'] if bdf else ['Cz', 'Fp1']
+    reader = open_edf_reader(path).pick(channel_names)
+
+    assert reader.ch_names == channel_names
+    # The sample ranges start and end in the middle of a record.
+    for start, stop in ((0, None), (10, 50), (37, 250), (100, 10_000)):
+        np.testing.assert_allclose(
+            reader.get_data(start=start, stop=stop),
+            raw.get_data(picks=channel_names, start=start, stop=stop),
+            rtol=1e-12,
+            atol=0,
+        )
+
+    np.testing.assert_allclose(
+        reader.get_data(picks='Fp1', start=5, stop=70),
+        raw.get_data(picks=['Fp1'], start=5, stop=70),
+        rtol=1e-12,
+        atol=0,
+    )
+
+
+def read_quantized_samples(chunk_dir: Path, channel_index: int, bits: int) -> npt.NDArray[np.float32]:
+    """
+    Read the integers of the quantized chunks of a channel of the finest level of a chunk directory,
+    padding included.
+    """
+
+    index = json.loads((chunk_dir / 'index.json').read_text())
+    level_index = len(index['shapes']) - 1
+    trace_dir = chunk_dir / 'raw' / str(level_index) / str(channel_index) / '0'
+    chunk_count = index['shapes'][level_index][2]
+    return np.concatenate([
+        decode_quantized_chunk((trace_dir / f'{i}.buf').read_bytes(), 1.0, 0.0, bits)  # type: ignore
+        for i in range(chunk_count)
+    ])
+
+
+@pytest.mark.parametrize('bdf', [False, True])
+def test_lossless_chunks_keep_edf_integers(tmp_path: Path, bdf: bool):
+    path = tmp_path / ('recording.bdf' if bdf else 'recording.edf')
+    signals = [signal for signal in create_signals(bdf) if not isinstance(signal.samples, bytes)]
+    write_edf_file(path, create_signals(bdf), bdf)
+    reader = open_edf_reader(path)
+
+    write_chunk_directory(
+        str(path), 100, open_edf_reader, from_channel_name='Fp1', destination=str(tmp_path),
+        lossless=True, verbose=False,
+    )
+
+    chunk_dir = tmp_path / 'recording.chunks'
+    index = json.loads((chunk_dir / 'index.json').read_text())
+    assert index['encoding']['bits'] == (24 if bdf else 16)
+    for channel_index, (signal, metadata) in enumerate(zip(signals, index['channelMetadata'])):
+        assert (metadata['scale'], metadata['offset']) == reader.scaling(signal.label)
+
+        samples = read_quantized_samples(chunk_dir, channel_index, index['encoding']['bits'])[:reader.n_times]
+        if signal.label == 'Status':
+            # The trigger bits of the stim channels are kept.
+            np.testing.assert_array_equal(samples, reader.get_data(picks='Status')[0])
+        else:
+            np.testing.assert_array_equal(samples, signal.samples)
+
+
+def test_lossless_chunks_require_edf_reader(tmp_path: Path):
+    path = tmp_path / 'recording.edf'
+    write_edf_file(path, create_signals(False), False)
+
+    with pytest.raises(ValueError, match='native EDF reader'):
+        write_chunk_directory(
+            str(path), 100, read_raw, from_channel_name='Fp1', destination=str(tmp_path),
+            lossless=True, verbose=False,
+        )
@@ -0,0 +1,149 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import mne
+import numpy as np
+import numpy.typing as npt
+import pytest
+from loris_eeg_chunker.chunking import write_chunk_directory  # type: ignore
+from loris_eeg_chunker.protocol_buffers.chunk_pb2 import FloatChunk  # type: ignore
+from loris_eeg_chunker.reader import ChunkDirectoryReader  # type: ignore
+
+CHUNK_SIZE = 100
+SFREQ = 250.0
+SECONDS = 95.3
+CHANNEL_NAMES = ['C1', 'C2', 'C3']
+
+
+def create_recording() -> mne.io.RawArray:
+    rng = np.random.default_rng(0)
+    times = np.arange(int(SECONDS * SFREQ)) / SFREQ
+    data = np.array([
+        np.sin(2 * np.pi * 0.3 * times),
+        np.sin(2 * np.pi * 7.0 * times) * 0.5 + 0.2,
+        rng.normal(0, 0.3, len(times)),
+    ]) * 1e-4
+    info = mne.create_info(CHANNEL_NAMES, SFREQ, 'eeg')  # type: ignore
+    return mne.io.RawArray(data, info, verbose=False)
+
+
+def write_recording(tmp_path: Path, name: str, **kwargs: Any) -> Path:
+    recording = create_recording()
+
+    def read_recording(path: str) -> mne.io.RawArray:
+        return recording
+
+    destination = tmp_path / name
+    write_chunk_directory(
+        'recording.edf', CHUNK_SIZE, read_recording, from_channel_name='C1',
+        destination=str(destination), verbose=False, **kwargs,
+    )
+
+    return destination / 'recording.chunks'
+
+
+def read_tree_levels(chunk_dir: Path) -> list[npt.NDArray[np.float32]]:
+    """
+    Read all the samples of the levels of a chunk directory written with the tree container and the
+    float encoding, padding included, from the coarsest to the finest level.
+    """
+
+    index = json.loads((chunk_dir / 'index.json').read_text())
+    levels: list[npt.NDArray[np.float32]] = []
+    for level_index, (channel_count, _, chunk_count, _) in enumerate(index['shapes']):
+        channels: list[npt.NDArray[np.float32]] = []
+        for channel_index in range(channel_count):
+            trace_dir = chunk_dir / 'raw' / str(level_index) / str(channel_index) / '0'
+            chunks = [read_float_chunk(trace_dir / f'{i}.buf') for i in range(chunk_count)]
+            channels.append(np.concatenate(chunks))
+
+        levels.append(np.array(channels))
+
+    return levels
+
+
+def read_float_chunk(path: Path) -> npt.NDArray[np.float32]:
+    chunk = FloatChunk.FromString(path.read_bytes())  # type: ignore
+    return np.array(chunk.samples, dtype=np.float32)  # type: ignore
+
+
+def open_reader(chunk_dir: Path) -> Any:
+    return ChunkDirectoryReader(str(chunk_dir), cache_size=4)  # type: ignore
+
+
+@pytest.fixture
+def expected_levels(tmp_path: Path) -> list[npt.NDArray[np.float32]]:
+    return read_tree_levels(write_recording(tmp_path, 'expected'))
+
+
+@pytest.mark.parametrize('options, tolerance', [
+    ({}, 0),
+    ({'packed': True}, 0),
+    ({'quantization_bits': 12}, 1),
+    ({'quantization_bits': 16, 'compression': 'zlib', 'packed': True}, 1),
+])
+def test_reader_returns_chunk_samples(
+    tmp_path: Path,
+    expected_levels: list[npt.NDArray[np.float32]],
+    options: dict[str, Any],
+    tolerance: int,
+):
+    chunk_dir = write_recording(tmp_path, 'chunks', **options)
+    index = json.loads((chunk_dir / 'index.json').read_text())
+    # The quantized samples are within one quantization step of the float samples.
+    atol = tolerance * max((channel.get('scale', 0) for channel in index['channelMetadata']), default=0)
+
+    with open_reader(chunk_dir) as reader:
+        # The number of valid samples of the last chunk of each level is read from the
+        # 'downsamplings' key of index.json.
+        assert len(reader.level_sizes) == len(expected_levels) == 3
+        assert reader.level_sizes[-1] == int(SECONDS * SFREQ)
+        for level_size, level in zip(reader.level_sizes, expected_levels):
+            assert level.shape[1] - CHUNK_SIZE < level_size <= level.shape[1]
+
+        used_levels: set[int] = set()
+        first_time, last_time = reader.time_interval
+        duration = last_time - first_time
+        windows = [
+            (first_time, last_time),
+            (first_time + duration * 0.1, first_time + duration * 0.6),
+            (first_time + duration * 0.45, first_time + duration * 0.46),
+            (last_time - 0.5, last_time + 10),
+        ]
+        for t_start, t_end in windows:
+            for max_points in (50, 1000, 100_000):
+                window: tuple[int, int, int] = reader.window(t_start, t_end, max_points)
+                level, start, stop = window
+                used_levels.add(level)
+
+                samples = reader.query(['C3', 0, 'C2'], t_start, t_end, max_points)
+                times = reader.times(t_start, t_end, max_points)
+
+                assert samples.shape == (3, stop - start) == (3, len(times))
+                assert stop <= reader.level_sizes[level]
+                expected = expected_levels[level][[2, 0, 1], start:stop]
+                np.testing.assert_allclose(samples, expected, rtol=0, atol=atol)
+
+        assert used_levels == {0, 1, 2}
+
+
+def test_reader_reuses_decoded_chunks(tmp_path: Path, expected_levels: list[npt.NDArray[np.float32]]):
+    chunk_dir = write_recording(tmp_path, 'chunks', packed=True)
+
+    with open_reader(chunk_dir) as reader:
+        first_time, last_time = reader.time_interval
+        samples = reader.query(['C1'], first_time, last_time, 100_000)
+        assert len(reader.cache) == 4
+
+        # A query on the last chunks of the finest level is served from the cache.
+        reader.packed_reader.close()
+        reader.packed_reader = None
+        t_start = last_time - 2 * CHUNK_SIZE / SFREQ
+        level, start, stop = reader.window(t_start, last_time, 100_000)
+        assert level == 2
+        np.testing.assert_array_equal(
+            reader.query(['C1'], t_start, last_time, 100_000),
+            samples[:, start:stop],
+        )
+        np.testing.assert_array_equal(samples[0], expected_levels[2][0, :samples.shape[1]])
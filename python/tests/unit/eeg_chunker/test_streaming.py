@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+
+import mne
+import numpy as np
+import numpy.typing as npt
+from loris_eeg_chunker.chunking import write_chunk_directory  # type: ignore
+from loris_eeg_chunker.protocol_buffers.chunk_pb2 import FloatChunk  # type: ignore
+from loris_eeg_chunker.streaming import write_streamed_chunk_directory  # type: ignore
+
+CHUNK_SIZE = 100
+SFREQ = 1000.0
+
+
+def create_recording(seconds: float) -> mne.io.RawArray:
+    """
+    Create a recording whose channels are sines of increasing frequency, the highest frequencies
+    being above the Nyquist frequency of the downsampled levels.
+    """
+
+    times = np.arange(int(seconds * SFREQ)) / SFREQ
+    data = np.array([np.sin(2 * np.pi * frequency * times) for frequency in (0.5, 3.0, 40.0, 200.0)]) * 1e-4
+    info = mne.create_info(['C1', 'C2', 'C3', 'C4'], SFREQ, 'eeg')  # type: ignore
+    return mne.io.RawArray(data, info, verbose=False)
+
+
+def read_levels(chunk_dir: Path) -> list[npt.NDArray[np.float32]]:
+    """
+    Read the samples of all the downsampling levels of a chunk directory, from the coarsest to the
+    finest level.
+    """
+
+    index = json.loads((chunk_dir / 'index.json').read_text())
+    levels: list[npt.NDArray[np.float32]] = []
+    for level_index, (channel_count, _, chunk_count, _) in enumerate(index['shapes']):
+        channels: list[npt.NDArray[np.float32]] = []
+        for channel_index in range(channel_count):
+            trace_dir = chunk_dir / 'raw' / str(level_index) / str(channel_index) / '0'
+            chunks = [read_chunk(trace_dir / f'{i}.buf') for i in range(chunk_count)]
+            channels.append(np.concatenate(chunks))
+
+        levels.append(np.array(channels))
+
+    return levels
+
+
+def read_chunk(path: Path) -> npt.NDArray[np.float32]:
+    chunk = FloatChunk.FromString(path.read_bytes())  # type: ignore
+    return np.array(chunk.samples, dtype=np.float32)  # type: ignore
+
+
+def write_levels(tmp_path: Path, name: str, seconds: float, max_seconds: float | None):
+    recording = create_recording(seconds)
+
+    def read_recording(path: str) -> mne.io.RawArray:
+        return recording
+
+    destination = tmp_path / name
+    if max_seconds is None:
+        write_chunk_directory(
+            'recording.edf', CHUNK_SIZE, read_recording, from_channel_name='C1',
+            destination=str(destination), verbose=False,
+        )
+    else:
+        write_streamed_chunk_directory(
+            'recording.edf', CHUNK_SIZE, read_recording, from_channel_name='C1',
+            destination=str(destination), max_seconds=max_seconds, verbose=False,
+        )
+
+    return read_levels(destination / 'recording.chunks')
+
+
+def test_streamed_levels_match_in_memory_levels(tmp_path: Path):
+    # The windows are not aligned with the decimation factors of the levels.
+    in_memory_levels = write_levels(tmp_path, 'in_memory', 53.7, None)
+    streamed_levels = write_levels(tmp_path, 'streamed', 53.7, 7.3)
+
+    assert len(in_memory_levels) == 3
+    assert [level.shape for level in streamed_levels] == [level.shape for level in in_memory_levels]
+    for in_memory_level, streamed_level in zip(in_memory_levels, streamed_levels):
+        np.testing.assert_allclose(streamed_level, in_memory_level, rtol=0, atol=1e-10)
+
+
+def test_streamed_levels_match_in_memory_levels_of_short_recording(tmp_path: Path):
+    # The recording is shorter than two chunks, so its coarsest level is upsampled.
+    in_memory_levels = write_levels(tmp_path, 'in_memory', 0.15, None)
+    streamed_levels = write_levels(tmp_path, 'streamed', 0.15, 0.04)
+
+    assert [level.shape for level in streamed_levels] == [level.shape for level in in_memory_levels]
+    for in_memory_level, streamed_level in zip(in_memory_levels, streamed_levels):
+        np.testing.assert_allclose(streamed_level, in_memory_level, rtol=0, atol=1e-10)
+
+
+def test_downsampled_levels_are_anti_aliased(tmp_path: Path):
+    # The 200 Hz sine is above the Nyquist frequency of the coarser levels, and is removed rather
+    # than folded into a lower frequency.
+    for level in write_levels(tmp_path, 'streamed', 53.7, 7.3)[:-1]:
+        assert np.abs(level[3][20:-20]).max() < 1e-6
+        assert np.abs(level[0][20:-20]).max() > 0.9e-4
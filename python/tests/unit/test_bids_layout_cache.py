@@ -0,0 +1,127 @@
+import json
+import re
+import shutil
+from pathlib import Path
+from typing import Any
+
+import pytest
+from bids import BIDSLayout
+
+from lib.bids_layout_cache import load_cached_bids_layout  # type: ignore
+
+IGNORE = ['code/', 'sourcedata/', 'log/', '.git']
+FORCE_INDEX = [re.compile(r"_annotations\.(tsv|json)$")]
+
+
+def write_subject(bids_dir: Path, subject: str, sampling_frequency: float):
+    eeg_dir = bids_dir / f'sub-{subject}' / 'ses-V1' / 'eeg'
+    eeg_dir.mkdir(parents=True)
+    prefix = f'sub-{subject}_ses-V1_task-rest'
+    (eeg_dir / f'{prefix}_eeg.edf').write_bytes(b'')
+    (eeg_dir / f'{prefix}_eeg.json').write_text(json.dumps({'SamplingFrequency': sampling_frequency}))
+    (eeg_dir / f'{prefix}_channels.tsv').write_text('name\ttype\tunits\nFp1\tEEG\tuV\n')
+    (eeg_dir / f'{prefix}_events.tsv').write_text('onset\tduration\n0.5\t0\n')
+    (eeg_dir / f'{prefix}_annotations.tsv').write_text('onset\tduration\tlabel\n1.0\t0\tblink\n')
+
+
+@pytest.fixture
+def bids_dir(tmp_path: Path) -> Path:
+    bids_dir = tmp_path / 'bids'
+    bids_dir.mkdir()
+    (bids_dir / 'dataset_description.json').write_text(json.dumps({'Name': 'Test', 'BIDSVersion': '1.8.0'}))
+    (bids_dir / 'participants.tsv').write_text('participant_id\nsub-01\nsub-02\n')
+    # top-level metadata inherited by the files of all the subjects
+    (bids_dir / 'task-rest_eeg.json').write_text(json.dumps({'TaskName': 'rest', 'PowerLineFrequency': 60}))
+    (bids_dir / 'code').mkdir()
+    (bids_dir / 'code' / 'convert.py').write_text('')
+    write_subject(bids_dir, '01', 250.0)
+    write_subject(bids_dir, '02', 500.0)
+
+    # derivatives, which are indexed along with the dataset
+    pipeline_dir = bids_dir / 'derivatives' / 'pipeline'
+    (pipeline_dir / 'sub-01' / 'ses-V1' / 'eeg').mkdir(parents=True)
+    (pipeline_dir / 'dataset_description.json').write_text(json.dumps({
+        'Name':        'Pipeline',
+        'BIDSVersion': '1.8.0',
+        'GeneratedBy': [{'Name': 'pipeline'}],
+    }))
+    (pipeline_dir / 'sub-01' / 'ses-V1' / 'eeg' / 'sub-01_ses-V1_task-rest_desc-clean_eeg.edf').write_bytes(b'')
+    return bids_dir
+
+
+def load_layout(bids_dir: Path, cache_dir: Path) -> Any:
+    return load_cached_bids_layout(  # type: ignore
+        str(bids_dir), str(cache_dir), False, IGNORE, FORCE_INDEX, verbose=True,
+    )
+
+
+def create_layout(bids_dir: Path) -> Any:
+    return BIDSLayout(  # type: ignore
+        root=str(bids_dir), derivatives=True, validate=False, ignore=IGNORE, force_index=FORCE_INDEX,
+    )
+
+
+def describe_layout(layout: Any) -> dict[str, Any]:
+    """
+    Describe the files of a layout with their entities, metadata and associations.
+    """
+
+    return {
+        bids_file.path: (
+            bids_file.get_entities(),
+            layout.get_metadata(bids_file.path),
+            sorted(associated_file.path for associated_file in bids_file.get_associations()),
+        )
+        for bids_file in layout.get()
+    }
+
+
+def test_refreshed_layout_matches_new_layout(tmp_path: Path, bids_dir: Path, capsys: pytest.CaptureFixture[str]):
+    cache_dir = tmp_path / 'cache'
+    load_layout(bids_dir, cache_dir)
+    assert 'Indexing the BIDS dataset' in capsys.readouterr().out
+
+    # edit the metadata of a subject, add a subject and delete another one
+    (bids_dir / 'sub-01' / 'ses-V1' / 'eeg' / 'sub-01_ses-V1_task-rest_eeg.json') \
+        .write_text(json.dumps({'SamplingFrequency': 1000.0, 'EEGReference': 'Cz'}))
+    write_subject(bids_dir, '03', 2000.0)
+    shutil.rmtree(bids_dir / 'sub-02')
+
+    layout = load_layout(bids_dir, cache_dir)
+    output = capsys.readouterr().out
+    assert 'Re-indexing 3 changed subjects' in output
+    # the index is refreshed rather than created again
+    assert 'Indexing the BIDS dataset' not in output
+
+    new_layout = create_layout(bids_dir)
+
+    assert layout.get_subjects() == new_layout.get_subjects() == ['01', '03']
+    description = describe_layout(layout)
+    assert description == describe_layout(new_layout)
+    assert description[str(bids_dir / 'sub-01' / 'ses-V1' / 'eeg' / 'sub-01_ses-V1_task-rest_eeg.edf')][1] == {
+        'SamplingFrequency':  1000.0,
+        'EEGReference':       'Cz',
+        'TaskName':           'rest',
+        'PowerLineFrequency': 60,
+    }
+
+    # the refreshed index is reused as is
+    assert describe_layout(load_layout(bids_dir, cache_dir)) == description
+    assert 'Reusing the BIDS layout index' in capsys.readouterr().out
+
+
+def test_changed_top_level_files_index_whole_dataset(
+    tmp_path: Path,
+    bids_dir: Path,
+    capsys: pytest.CaptureFixture[str],
+):
+    cache_dir = tmp_path / 'cache'
+    load_layout(bids_dir, cache_dir)
+    capsys.readouterr()
+
+    (bids_dir / 'task-rest_eeg.json').write_text(json.dumps({'TaskName': 'rest', 'PowerLineFrequency': 50}))
+
+    layout = load_layout(bids_dir, cache_dir)
+    assert 'Indexing the BIDS dataset' in capsys.readouterr().out
+    edf_path = bids_dir / 'sub-02' / 'ses-V1' / 'eeg' / 'sub-02_ses-V1_task-rest_eeg.edf'
+    assert layout.get_metadata(str(edf_path))['PowerLineFrequency'] == 50
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from lib.db.models.notification_spool import DbNotificationSpool
+from lib.env import Env, Notifier
+from lib.logging import flush_logs, log, log_error
+from tests.util.database import create_test_database
+
+
+@pytest.fixture
+def env(tmp_path: Path):
+    db = create_test_database()
+    env = Env(
+        db_engine   = db.get_bind().engine,
+        db          = db,
+        script_name = 'test_script',
+        config_info = None,
+        log_file    = str(tmp_path / 'test_script.log'),
+        verbose     = False,
+        cleanups    = [],
+    )
+
+    env.notifier = Notifier(Session(env.db_engine), 1, 'test_script.py', 1)
+    return env
+
+
+def get_notification_messages(env: Env) -> list[str | None]:
+    return list(env.db.execute(select(DbNotificationSpool.message)
+        .order_by(DbNotificationSpool.id)
+    ).scalars().all())
+
+
+def test_notifications_are_buffered(env: Env):
+    log(env, 'Message 1')
+    log(env, 'Message 2')
+
+    assert get_notification_messages(env) == []
+
+    flush_logs(env)
+
+    assert get_notification_messages(env) == ['Message 1', 'Message 2']
+
+
+def test_error_notification_flushes_pending_notifications(env: Env):
+    log(env, 'Message 1')
+    log_error(env, 'Message 2')
+
+    assert get_notification_messages(env) == ['Message 1', 'ERROR: Message 2']
+
+
+def test_log_file_is_kept_open(env: Env):
+    log(env, 'Message 1')
+    log_file_handle = env.log_file_handle
+    log(env, 'Message 2')
+
+    assert env.log_file_handle is log_file_handle
+    assert Path(env.log_file).read_text() == 'Message 1\nMessage 2\n'
+
+    flush_logs(env)
+
+    assert env.log_file_handle is None
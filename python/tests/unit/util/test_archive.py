@@ -0,0 +1,137 @@
+import json
+import os
+import tarfile
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+import lib.util.archive
+from lib.util.archive import (
+    get_archive_manifest_path,
+    get_unchanged_archive_hash,
+    read_archive_manifest,
+    write_archive,
+)
+from lib.util.crypto import compute_file_blake2b_hash
+from lib.utilities import create_archive  # type: ignore
+
+
+@pytest.fixture
+def file_paths(tmp_path: Path) -> list[str]:
+    files_dir = tmp_path / 'files'
+    files_dir.mkdir()
+    (files_dir / 'sub-01_T1w.nii').write_bytes(bytes(range(256)) * 64)
+    (files_dir / 'sub-01_T1w.json').write_text('{"RepetitionTime": 2.3}')
+    return [str(files_dir / 'sub-01_T1w.nii'), str(files_dir / 'sub-01_T1w.json')]
+
+
+def touch(file_path: str):
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_write_archive_returns_archive_hash(tmp_path: Path, file_paths: list[str]):
+    archive_path = str(tmp_path / 'archive.tar.gz')
+
+    archive_hash = write_archive(file_paths, archive_path)
+
+    assert archive_hash == compute_file_blake2b_hash(archive_path)
+    with tarfile.open(archive_path) as tar:
+        assert tar.getnames() == ['sub-01_T1w.nii', 'sub-01_T1w.json']
+
+    manifest = read_archive_manifest(archive_path)
+    assert manifest is not None
+    assert manifest['blake2b'] == archive_hash
+    assert [member['blake2b'] for member in manifest['members']] \
+        == [compute_file_blake2b_hash(file_path) for file_path in file_paths]
+
+
+def test_reproducible_archives_are_identical(tmp_path: Path, file_paths: list[str]):
+    archive_path_1 = str(tmp_path / 'archive_1.tar.gz')
+    archive_path_2 = str(tmp_path / 'archive_2.tar.gz')
+
+    archive_hash_1 = write_archive(file_paths, archive_path_1, reproducible=True)
+    touch(file_paths[0])
+    archive_hash_2 = write_archive(list(reversed(file_paths)), archive_path_2, reproducible=True)
+
+    assert archive_hash_1 == archive_hash_2
+    assert Path(archive_path_1).read_bytes() == Path(archive_path_2).read_bytes()
+
+
+def test_unchanged_archive_hash(tmp_path: Path, file_paths: list[str]):
+    archive_path = str(tmp_path / 'archive.tar.gz')
+    archive_hash = write_archive(file_paths, archive_path)
+
+    assert get_unchanged_archive_hash(file_paths, archive_path) == archive_hash
+    assert get_unchanged_archive_hash(file_paths[:1], archive_path) is None
+
+
+def test_unchanged_archive_hash_with_changed_member(tmp_path: Path, file_paths: list[str]):
+    archive_path = str(tmp_path / 'archive.tar.gz')
+    write_archive(file_paths, archive_path)
+
+    # Same size, different content.
+    Path(file_paths[1]).write_text('{"RepetitionTime": 2.4}')
+    touch(file_paths[1])
+
+    assert get_unchanged_archive_hash(file_paths, archive_path) is None
+
+
+def test_unchanged_archive_hash_with_touched_member(tmp_path: Path, file_paths: list[str]):
+    archive_path = str(tmp_path / 'archive.tar.gz')
+    archive_hash = write_archive(file_paths, archive_path)
+    touch(file_paths[0])
+
+    with mock.patch.object(
+        lib.util.archive,
+        'compute_file_blake2b_hash',
+        wraps=compute_file_blake2b_hash,
+    ) as compute_hash:
+        assert get_unchanged_archive_hash(file_paths, archive_path) == archive_hash
+        assert compute_hash.call_count == 1
+
+        # The manifest entry of the touched file is updated, so it is not read again.
+        assert get_unchanged_archive_hash(file_paths, archive_path) == archive_hash
+        assert compute_hash.call_count == 1
+
+    manifest = read_archive_manifest(archive_path)
+    assert manifest is not None
+    assert manifest['members'][0]['mtime_ns'] == os.stat(file_paths[0]).st_mtime_ns
+
+
+def test_create_archive_rebuilds_archive_with_mismatching_manifest(tmp_path: Path, file_paths: list[str]):
+    archive_path = str(tmp_path / 'archive.tar.gz')
+    write_archive(file_paths[:1], archive_path)
+
+    archive_hash = create_archive(file_paths, archive_path)
+
+    assert archive_hash == compute_file_blake2b_hash(archive_path)
+    with tarfile.open(archive_path) as tar:
+        assert tar.getnames() == ['sub-01_T1w.nii', 'sub-01_T1w.json']
+
+
+def test_create_archive_keeps_archive_without_manifest(tmp_path: Path, file_paths: list[str]):
+    archive_path = str(tmp_path / 'archive.tar.gz')
+    with tarfile.open(archive_path, 'w:gz') as tar:
+        tar.add(file_paths[0], arcname='sub-01_T1w.nii')
+
+    data = Path(archive_path).read_bytes()
+
+    archive_hash = create_archive(file_paths, archive_path)
+
+    assert archive_hash == compute_file_blake2b_hash(archive_path)
+    assert Path(archive_path).read_bytes() == data
+    assert not os.path.exists(get_archive_manifest_path(archive_path))
+
+
+def test_create_archive_reuses_unchanged_archive(tmp_path: Path, file_paths: list[str]):
+    archive_path = str(tmp_path / 'archive.tar.gz')
+    archive_hash = write_archive(file_paths, archive_path)
+    manifest = json.loads(Path(get_archive_manifest_path(archive_path)).read_text())
+
+    with mock.patch.object(lib.util.archive, 'write_archive') as write:
+        assert create_archive(file_paths, archive_path) == archive_hash
+        write.assert_not_called()
+
+    assert json.loads(Path(get_archive_manifest_path(archive_path)).read_text()) == manifest
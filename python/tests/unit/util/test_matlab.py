@@ -0,0 +1,187 @@
+import struct
+from pathlib import Path
+from typing import Any
+
+import h5py
+import numpy as np
+import scipy.io
+
+from lib.util.matlab import MI_MATRIX, MI_UINT16, patch_mat_file_strings
+
+MAT5_HEADER = b'MATLAB 5.0 MAT-file'.ljust(116) + bytes(8) + b'\x00\x01IM'
+MAT73_HEADER = b'MATLAB 7.3 MAT-file'.ljust(116) + bytes(8) + b'\x00\x02IM'
+
+
+def write_mat_file(path: Path, variables: dict[str, Any], compress: bool = False):
+    scipy.io.savemat(path, variables, do_compression=compress)  # type: ignore
+
+
+def read_mat_file(path: Path) -> dict[str, Any]:
+    return scipy.io.loadmat(path, squeeze_me=True)  # type: ignore
+
+
+def pack_mat_element(type: int, data: bytes) -> bytes:
+    return struct.pack('<2I', type, len(data)) + data + bytes(-len(data) % 8)
+
+
+def pack_uint16_char_matrix(name: str, value: str, dims: tuple[int, int]) -> bytes:
+    """
+    Pack a character array whose characters are stored as 16 bits integers, which MATLAB writes
+    but scipy does not.
+    """
+
+    return pack_mat_element(MI_MATRIX, (
+        pack_mat_element(6, struct.pack('<2I', 4, 0))
+        + pack_mat_element(5, struct.pack('<2i', *dims))
+        + pack_mat_element(1, name.encode())
+        + pack_mat_element(MI_UINT16, struct.pack(f'<{len(value)}H', *map(ord, value)))
+    ))
+
+
+def write_mat73_file(path: Path, values: dict[str, str]):
+    with h5py.File(path, 'w', userblock_size=512) as file:
+        for name, value in values.items():
+            dataset = file.create_dataset(name, data=np.array([[ord(char)] for char in value], dtype=np.uint16))  # type: ignore
+            dataset.attrs['MATLAB_class'] = np.bytes_(b'char')
+            dataset.attrs['MATLAB_int_decode'] = np.int32(2)
+
+        file.create_dataset('data', data=np.arange(12.0).reshape(3, 4))  # type: ignore
+
+    with open(path, 'r+b') as file:
+        file.write(MAT73_HEADER)
+
+
+def read_mat73_string(path: Path, name: str) -> str:
+    with h5py.File(path) as file:
+        dataset = file[name]
+        assert isinstance(dataset, h5py.Dataset)
+        return ''.join(map(chr, dataset[()].ravel()))  # type: ignore
+
+
+def test_patch_regular_data_elements(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    write_mat_file(path, {'filename': 'sub-01_task-rest_eeg.set', 'nbchan': 64})
+    size = path.stat().st_size
+
+    assert patch_mat_file_strings(path.as_posix(), {'filename': 'sub-02_task-rest_eeg.set'})
+
+    variables = read_mat_file(path)
+    assert variables['filename'] == 'sub-02_task-rest_eeg.set'
+    assert variables['nbchan'] == 64
+    assert path.stat().st_size == size
+
+
+def test_patch_shorter_value_in_same_aligned_space(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    write_mat_file(path, {'filename': 'sub-01_task-rest_eeg.set'})
+
+    assert patch_mat_file_strings(path.as_posix(), {'filename': 'sub-1_task-rest_eeg.set'})
+
+    assert read_mat_file(path)['filename'] == 'sub-1_task-rest_eeg.set'
+
+
+def test_patch_small_data_elements(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    write_mat_file(path, {'setname': 'ab', 'filepath': 'abcd'})
+
+    assert patch_mat_file_strings(path.as_posix(), {'setname': 'xyz', 'filepath': 'x'})
+
+    variables = read_mat_file(path)
+    assert variables['setname'] == 'xyz'
+    assert variables['filepath'] == 'x'
+
+
+def test_value_that_does_not_fit_is_not_patched(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    write_mat_file(path, {'setname': 'ab', 'filename': 'sub-01_task-rest_eeg.set'})
+    data = path.read_bytes()
+
+    # The first value fits, but the file is left untouched since the second one does not.
+    assert not patch_mat_file_strings(path.as_posix(), {
+        'setname': 'xy',
+        'filename': 'sub-01_ses-V1_task-rest_eeg.set',
+    })
+
+    assert path.read_bytes() == data
+
+
+def test_patch_uint16_characters(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    path.write_bytes(MAT5_HEADER + pack_uint16_char_matrix('filename', 'sub-01_task-rest_eeg.set', (1, 24)))
+
+    assert patch_mat_file_strings(path.as_posix(), {'filename': 'sub-2_task-rest_eeg.set'})
+    assert read_mat_file(path)['filename'] == 'sub-2_task-rest_eeg.set'
+
+    # 16 characters would fit in 24 bytes, but take 32 bytes with 2 bytes per character.
+    assert not patch_mat_file_strings(path.as_posix(), {'filename': 'sub-2_task-r.set'})
+
+
+def test_patch_column_character_arrays(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    path.write_bytes(MAT5_HEADER + pack_uint16_char_matrix('setname', 'abcd', (4, 1)))
+
+    assert patch_mat_file_strings(path.as_posix(), {'setname': 'xyz'})
+
+    setname = scipy.io.loadmat(path)['setname']  # type: ignore
+    assert setname.shape == (3,)  # type: ignore
+    assert ''.join(setname) == 'xyz'  # type: ignore
+
+
+def test_compressed_variables_are_not_patched(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    write_mat_file(path, {'filename': 'sub-01_task-rest_eeg.set', 'setname': 'sub-01'}, compress=True)
+    data = path.read_bytes()
+
+    # The compressed variables that are not patched are skipped.
+    assert patch_mat_file_strings(path.as_posix(), {'datfile': 'sub-02_task-rest_eeg.fdt'})
+    assert not patch_mat_file_strings(path.as_posix(), {'filename': 'sub-02_task-rest_eeg.set'})
+
+    assert path.read_bytes() == data
+
+
+def test_patch_struct_fields(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    write_mat_file(path, {'EEG': {
+        'setname':  'sub-01_task-rest_eeg',
+        'filename': 'sub-01_task-rest_eeg.set',
+        'nbchan':   64,
+        'data':     'sub-01_task-rest_eeg.fdt',
+    }})
+
+    assert patch_mat_file_strings(path.as_posix(), {
+        'EEG.filename': 'sub-02_task-rest_eeg.set',
+        'EEG.data':     'sub-02_task-rest_eeg.fdt',
+    })
+
+    eeg = read_mat_file(path)['EEG']
+    assert eeg['setname'] == 'sub-01_task-rest_eeg'
+    assert eeg['filename'] == 'sub-02_task-rest_eeg.set'
+    assert eeg['nbchan'] == 64
+    assert eeg['data'] == 'sub-02_task-rest_eeg.fdt'
+
+
+def test_patch_mat73_datasets(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    write_mat73_file(path, {'filename': 'sub-01_task-rest_eeg.set', 'setname': 'sub-01_task-rest_eeg'})
+
+    assert patch_mat_file_strings(path.as_posix(), {
+        'filename': 'sub-02_task-rest_eeg.set',
+        'setname':  'sub-01_ses-V1_task-rest_eeg',
+        'datfile':  'sub-01_task-rest_eeg.fdt',
+    })
+
+    assert read_mat73_string(path, 'filename') == 'sub-02_task-rest_eeg.set'
+    # The dataset whose length changes is replaced with the same attributes.
+    assert read_mat73_string(path, 'setname') == 'sub-01_ses-V1_task-rest_eeg'
+    with h5py.File(path) as file:
+        assert file['setname'].attrs['MATLAB_class'] == b'char'
+        assert 'datfile' not in file
+
+    assert path.read_bytes()[:128] == MAT73_HEADER
+
+
+def test_mat73_header_without_hdf5_file_is_not_patched(tmp_path: Path):
+    path = tmp_path / 'dataset.set'
+    path.write_bytes(MAT73_HEADER + bytes(1024))
+
+    assert not patch_mat_file_strings(path.as_posix(), {'filename': 'sub-02_task-rest_eeg.set'})
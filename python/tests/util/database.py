@@ -1,4 +1,8 @@
-from sqlalchemy import create_engine
+from collections.abc import Generator
+from contextlib import contextmanager
+from typing import Any
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session
 
 from lib.config_file import load_config
@@ -33,3 +37,29 @@ def get_integration_database_session():
     """
 
     return Session(get_integration_database_engine())
+
+
+@contextmanager
+def assert_max_sql_statements(db: Session, max_count: int) -> Generator[list[str]]:
+    """
+    Context manager that fails the test if the code executed in its body issues more than a given
+    number of SQL statements on the database session. The list of executed statements is yielded
+    so that tests can inspect it.
+    """
+
+    engine = db.get_bind()
+    statements: list[str] = []
+
+    def count_statement(connection: Any, cursor: Any, statement: str, *args: Any):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count_statement)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', count_statement)
+
+    assert len(statements) <= max_count, (
+        f"Expected at most {max_count} SQL statements, but {len(statements)} were executed:\n"
+        + '\n'.join(statements)
+    )